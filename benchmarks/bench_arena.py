@@ -0,0 +1,42 @@
+import gc
+import tracemalloc
+from collections.abc import Callable
+
+from bench_json import generate
+from L3.parse import read_program
+from util.arena import Arena
+
+
+def retained[T](build: Callable[[], T]) -> tuple[T, int]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def build(source: str) -> Arena:
+    arena = Arena()
+    arena.add(read_program(source))
+    return arena
+
+
+def main() -> None:
+    source = generate(20_000)
+
+    program, model_bytes = retained(lambda: read_program(source))
+    # the arena is built from a fresh parse, so that its names table holds its own strings rather than sharing
+    # them with `program`, and is counted in full
+    arena, arena_bytes = retained(lambda: build(source))
+    nodes = len(arena)
+
+    print(f"{nodes} nodes")
+    print(f"pydantic: {model_bytes / nodes:8.1f} bytes/node")
+    print(f"   arena: {arena_bytes / nodes:8.1f} bytes/node ({model_bytes / arena_bytes:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
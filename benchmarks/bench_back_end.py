@@ -0,0 +1,53 @@
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from bench_incremental import generate
+from L1.to_python import to_ast_program
+from L2.cps_convert import cps_convert_program
+from L2.cps_to_python import cps_to_python_program
+from L2.syntax import Program
+from L3.front_end import front_end_program
+from L3.parse import read_program
+from util.sequential_name_generator import SequentialNameGenerator
+
+
+def best(function: Callable[[], Any]) -> float:
+    return min(timeit.repeat(function, number=1, repeat=3))
+
+
+def peak(function: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def separately(program: Program) -> str:
+    return to_ast_program(cps_convert_program(program, SequentialNameGenerator()))
+
+
+def fused(program: Program) -> str:
+    return cps_to_python_program(program, SequentialNameGenerator())
+
+
+def main() -> None:
+    print(f"{'functions':>10} {'separate':>12} {'fused':>12} {'speedup':>8} {'separate peak':>14} {'fused peak':>12}")
+    for functions in [100, 1_000, 4_000]:
+        _, program = front_end_program(read_program(generate(functions)))
+        assert fused(program) == separately(program)
+
+        times = best(lambda: separately(program)), best(lambda: fused(program))
+        peaks = peak(lambda: separately(program)), peak(lambda: fused(program))
+        print(
+            f"{functions:>10} {times[0] * 1e3:10.1f}ms {times[1] * 1e3:10.1f}ms {times[0] / times[1]:7.2f}x"
+            f" {peaks[0] / 2**20:11.1f}MiB {peaks[1] / 2**20:9.1f}MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import timeit
+from pathlib import Path
+
+from bench_json import generate
+from L1.syntax import Program as L1Program
+from L2.cps_convert import cps_convert_program
+from L3.eliminate_letrec import eliminate_letrec_program
+from L3.main import compile_program
+from L3.parse import read_program
+from L3.pipeline import Options
+from L3.syntax import Program
+from L3.uniqify import uniqify_program
+from util.construct import enable_validation
+
+EXAMPLES = Path(__file__).parents[1] / "packages" / "L3" / "examples"
+
+
+def rewrite(program: Program) -> L1Program:
+    # only the passes that build new nodes, without parsing, checking and Python code generation
+    fresh, program = uniqify_program(program)
+    return cps_convert_program(eliminate_letrec_program(program), fresh)
+
+
+def pipeline(program: Program) -> str:
+    return compile_program(program, Options())
+
+
+def main() -> None:
+    examples = [read_program(path.read_bytes()) for path in sorted(EXAMPLES.glob("*.l3"))]
+    large = read_program(generate(2_000))
+
+    # the large program only goes through the rewriting passes: its CPS output nests one Python function per call,
+    # deeper than ast.unparse can recurse
+    for name, programs, stages, number in [
+        ("examples", examples, [("rewrite", rewrite), ("compile", pipeline)], 200),
+        ("large", [large], [("rewrite", rewrite)], 3),
+    ]:
+        for stage, function in stages:
+            for validate in [True, False]:
+                enable_validation(validate)
+                seconds = min(
+                    timeit.repeat(
+                        lambda: [function(program) for program in programs],
+                        number=number,
+                        repeat=5,
+                    )
+                )
+                label = "validated" if validate else "trusted"
+                print(f"{name:>8} {stage:>7} {label:>9}: {seconds / number * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
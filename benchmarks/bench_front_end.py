@@ -0,0 +1,54 @@
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from bench_incremental import generate
+from L3.check import diagnose_program
+from L3.eliminate_letrec import eliminate_letrec_program
+from L3.front_end import front_end_program
+from L3.parse import read_program
+from L3.syntax import Program
+from L3.uniqify import uniqify_program
+
+
+def best(function: Callable[[], Any]) -> float:
+    return min(timeit.repeat(function, number=1, repeat=3))
+
+
+def peak(function: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def separately(program: Program) -> Any:
+    assert not diagnose_program(program)
+    _, renamed = uniqify_program(program)
+    return eliminate_letrec_program(renamed)
+
+
+def fused(program: Program) -> Any:
+    return front_end_program(program)[1]
+
+
+def main() -> None:
+    print(f"{'functions':>10} {'separate':>12} {'fused':>12} {'speedup':>8} {'separate peak':>14} {'fused peak':>12}")
+    for functions in [100, 1_000, 4_000]:
+        program = read_program(generate(functions))
+        assert fused(program) == separately(program)
+
+        times = best(lambda: separately(program)), best(lambda: fused(program))
+        peaks = peak(lambda: separately(program)), peak(lambda: fused(program))
+        print(
+            f"{functions:>10} {times[0] * 1e3:10.1f}ms {times[1] * 1e3:10.1f}ms {times[0] / times[1]:7.2f}x"
+            f" {peaks[0] / 2**20:11.1f}MiB {peaks[1] / 2**20:9.1f}MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
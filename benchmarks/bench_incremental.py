@@ -0,0 +1,51 @@
+import timeit
+
+from L3.incremental import IncrementalCompiler
+from L3.main import compile_program
+from L3.parse import read_document, read_program, reread_document
+from L3.pipeline import Options
+
+
+def generate(functions: int, edited: int | None = None) -> str:
+    # a letrec of small recursive functions, the shape of a typical hand-written program; `edited` changes one of them
+    values = " ".join(
+        f"(f{i} (\\ (y) (if (< y {i}) (+ y {1_000 if i == edited else i}) (f{max(i - 1, 0)} (- y 1)))))"
+        for i in range(functions)
+    )
+    return f"(l3 (a) (letrec ({values}) (f{functions - 1} a)))"
+
+
+def main() -> None:
+    for functions in [100, 1_000]:
+        sources = [generate(functions, edited) for edited in [None, functions // 2]]
+        programs = [read_program(source) for source in sources]
+
+        read = min(timeit.repeat(lambda: read_program(sources[1]), number=1, repeat=3))
+        full = min(timeit.repeat(lambda: compile_program(programs[1], Options()), number=1, repeat=3))
+
+        cold = min(timeit.repeat(lambda: IncrementalCompiler().compile(programs[0]), number=1, repeat=3))
+
+        # an edit rereads only the function it changes, so hash-consing the result skips every other node; optimizing
+        # and unparsing the whole module is most of what is left
+        document = read_document(sources[0])
+        offset = document.source.index(f"(+ y {functions // 2})".encode()) + len("(+ y ")
+        edit = (offset, offset + len(str(functions // 2)), "1000")
+        reread = min(timeit.repeat(lambda: reread_document(document, *edit), number=1, repeat=3))
+
+        edits: list[float] = []
+        for _ in range(3):
+            compiler = IncrementalCompiler()
+            compiler.compile(document.program)
+            edits.append(timeit.timeit(lambda: compiler.compile(reread_document(document, *edit).program), number=1))
+        recomputed = sum(memo.misses for memo in compiler.memos.values())
+
+        print(f"{functions} functions:")
+        print(f"{'full read':>20}: {read * 1e3:10.1f} ms")
+        print(f"{'reread (edit)':>20}: {reread * 1e3:10.1f} ms")
+        print(f"{'full compile':>20}: {full * 1e3:10.1f} ms")
+        print(f"{'incremental (cold)':>20}: {cold * 1e3:10.1f} ms")
+        print(f"{'incremental (edit)':>20}: {min(edits) * 1e3:10.1f} ms ({recomputed} subtrees recomputed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import timeit
+
+from L3.parse import parse_program, parse_program_json, read_program
+
+
+def generate(bindings: int) -> str:
+    # wide rather than deep: pydantic's JSON validation is itself recursion-limited
+    values = " ".join(
+        f"(x{i} (+ {i} (if (< a {i}) (load a 0) (begin (store a 0 {i}) ((\\ (y) (* y y)) a)))))"
+        for i in range(bindings)
+    )
+    return f"(l3 (a) (let ({values}) (begin {' '.join(f'x{i}' for i in range(bindings))})))"
+
+
+def main() -> None:
+    for bindings in [1_000, 20_000]:
+        source = generate(bindings)
+        data = read_program(source).model_dump_json().encode()
+
+        print(f"{bindings} bindings: {len(source) / 1e6:.2f} MB surface, {len(data) / 1e6:.2f} MB json")
+
+        for name, function, argument in [
+            ("lark", parse_program, source),
+            ("reader", read_program, source),
+            ("json", parse_program_json, data),
+        ]:
+            seconds = min(timeit.repeat(lambda: function(argument), number=1, repeat=3))
+            print(f"{name:>16}: {seconds * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import timeit
+from pathlib import Path
+from typing import Any
+
+from L3.parse import read_program
+from L3.pipeline import Options, run_passes
+from L3.profiling import count_nodes
+
+EXAMPLES = Path(__file__).parents[1] / "packages" / "L3" / "examples"
+
+# a loop over let-bound configuration constants, the shape the optimizer is for
+CONSTANTS = """
+(l3 (n)
+  (let ((width 8) (height 4) (debug 0))
+    (let ((area (* width height)) (scale width))
+      (letrec ((loop (\\ (i acc)
+                       (if (< i n)
+                           (loop (+ i 1) (+ acc (if (== debug 1) (* i 1000) (* area scale))))
+                           acc))))
+        (loop 0 0)))))
+"""
+
+# small helpers called from a loop, the shape the inliner is for
+HELPERS = """
+(l3 (n)
+  (let ((square (\\ (x) (* x x)))
+        (add (\\ (x y) (+ x y)))
+        (step (\\ (i) (+ i 1))))
+    (letrec ((loop (\\ (i acc)
+                     (if (< i n)
+                         (loop (step i) (add acc (square i)))
+                         acc))))
+      (loop 0 0))))
+"""
+
+# the same helpers bound by letrec, so that each is a heap cell the loop loads from, the shape scalar replacement is for
+CELLS = """
+(l3 (n)
+  (letrec ((square (\\ (x) (* x x)))
+           (add (\\ (x y) (+ x y)))
+           (step (\\ (i) (+ i 1)))
+           (loop (\\ (i acc)
+                   (if (< i n)
+                       (loop (step i) (add acc (square i)))
+                       acc))))
+    (loop 0 0)))
+"""
+
+# example -> arguments large enough to time
+ARGUMENTS = {
+    "add_complex": [5, 3],
+    "add_simple": [5, 3],
+    "cells": [100],
+    "constants": [100],
+    "fact": [30],
+    "fib": [10],
+    "helpers": [100],
+    "sum": [100],
+}
+
+
+def main() -> None:
+    sources = {path.stem: path.read_text() for path in sorted(EXAMPLES.glob("*.l3"))} | {
+        "constants": CONSTANTS,
+        "helpers": HELPERS,
+        "cells": CELLS,
+    }
+    levels = [0, 1, 2, 3]
+
+    print(f"{'program':>12} {'level':>5} {'l2 nodes':>9} {'python':>8} {'run':>10}")
+    for name, source in sources.items():
+        program = read_program(source)
+        for level in levels:
+            l2 = run_passes(program, Options(level=level, emit="l2"))
+            module = run_passes(program, Options(level=level))
+            namespace: dict[str, Any] = {}
+            exec(module, namespace)
+            arguments = ARGUMENTS[name]
+            seconds = min(timeit.repeat(lambda: namespace["l1"](*arguments), number=200, repeat=5)) / 200
+            print(f"{name:>12} {f'-O{level}':>5} {count_nodes(l2):>9} {len(module):>7}B {seconds * 1e6:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
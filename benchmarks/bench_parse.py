@@ -0,0 +1,48 @@
+import timeit
+from pathlib import Path
+
+import L3
+from L3.parse import AstTransformer, parse_program, read_program
+from lark import Lark
+
+EXAMPLES = Path(__file__).parents[1] / "packages" / "L3" / "examples"
+GRAMMAR = Path(L3.__file__).with_name("L3.lark")
+
+
+def parse_program_uncached(source: str) -> object:
+    # the original front end: re-read the grammar, build an Earley parser, then transform the tree
+    grammar = GRAMMAR.read_text()
+    tree = Lark(grammar, start="program").parse(source)  # pyright: ignore[reportUnknownMemberType]
+    return AstTransformer().transform(tree)
+
+
+def generate(bindings: int) -> str:
+    # a wide, moderately nested program in the shape our generators emit
+    body = "x0"
+    for i in reversed(range(bindings)):
+        body = f"(let ((x{i} (+ {i} (if (< {i} 2) 1 (begin (store a 0 {i}) (load a 0)))))) {body})"
+    return f"(l3 (a) {body})"
+
+
+def main() -> None:
+    sources = [path.read_text() for path in sorted(EXAMPLES.glob("*.l3"))]
+    number = 20
+
+    for name, function in [
+        ("uncached earley", parse_program_uncached),
+        ("cached lalr", parse_program),
+        ("reader", read_program),
+    ]:
+        seconds = timeit.timeit(lambda: [function(source) for source in sources], number=number)
+        print(f"{name:>16}: {seconds / (number * len(sources)) * 1e6:10.1f} us/program")
+
+    large = generate(20_000)
+    print(f"large program: {len(large) / 1e6:.1f} MB")
+
+    for name, function in [("cached lalr", parse_program), ("reader", read_program)]:
+        seconds = timeit.timeit(lambda: function(large), number=1)
+        print(f"{name:>16}: {seconds:10.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+from bench_incremental import generate
+from L3.parse import read_program
+from L3.pipeline import Language, Options, load_ir, run_passes
+from util.serialize import dumps
+
+
+def best(function: Callable[[], Any]) -> float:
+    return min(timeit.repeat(function, number=1, repeat=3))
+
+
+def main() -> None:
+    program = read_program(generate(1_000))
+
+    with TemporaryDirectory() as directory:
+        languages: list[Language] = ["l3", "l2", "l1", "l0"]
+        for language in languages:
+            ir = run_passes(program, Options(emit=language))
+            cls = type(ir)
+            path = Path(directory) / f"{language}.ir"
+            path.write_bytes(dumps(ir))
+
+            print(f"{language}:")
+            # pydantic's JSON serializer stalls on the chains of statements that L1 and L0 nest one `then` inside the
+            # next, from about 50 functions on here, so those are only written in the binary format
+            if language in {"l3", "l2"}:
+                data = ir.model_dump_json()
+                print(f"{'json size':>20}: {len(data) / 1e6:10.2f} MB")
+                print(f"{'json dump':>20}: {best(ir.model_dump_json) * 1e3:10.1f} ms")
+                print(f"{'json load':>20}: {best(lambda: cls.model_validate_json(data)) * 1e3:10.1f} ms")
+
+            print(f"{'binary size':>20}: {path.stat().st_size / 1e6:10.2f} MB")
+            print(f"{'binary dump':>20}: {best(lambda: dumps(ir)) * 1e3:10.1f} ms")
+            print(f"{'binary load':>20}: {best(lambda: load_ir(path)) * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
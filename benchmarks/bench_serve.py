@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+EXAMPLES = Path(__file__).parents[1] / "packages" / "L3" / "examples"
+
+L3 = [sys.executable, "-c", "from L3.main import main; main()"]
+
+
+def compile_all(inputs: list[Path], options: list[str]) -> float:
+    # one `l3` process per input, as a build system would run it
+    start = time.perf_counter()
+    for input in inputs:
+        subprocess.run([*L3, *options, str(input)], check=True)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        inputs: list[Path] = []
+        for index in range(10):
+            for example in sorted(EXAMPLES.glob("*.l3")):
+                input = Path(directory) / f"{example.stem}_{index}.l3"
+                input.write_text(example.read_text())
+                inputs.append(input)
+
+        socket = Path(directory) / "l3.sock"
+        server = subprocess.Popen([*L3, "serve", "--socket", str(socket)])
+        try:
+            while not socket.exists():
+                time.sleep(0.01)
+
+            print(f"{len(inputs)} compiles:")
+            for name, options in [("standalone", ["--no-server"]), ("through server", ["--socket", str(socket)])]:
+                seconds = compile_all(inputs, options)
+                print(f"{name:>16}: {seconds:8.2f} s ({seconds / len(inputs) * 1e3:.1f} ms each)")
+
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
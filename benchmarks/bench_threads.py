@@ -0,0 +1,43 @@
+import os
+import sys
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from bench_incremental import generate
+from L3.check import diagnose_program
+from L3.eliminate_letrec import eliminate_letrec_program
+from L3.parse import read_program
+from L3.uniqify import uniqify_program
+from util.parallel import set_workers
+
+
+def best(function: Callable[[], Any]) -> float:
+    return min(timeit.repeat(function, number=1, repeat=3))
+
+
+def main() -> None:
+    # the passes only overlap on a free-threaded build (python3.14t); under the GIL the threads just take turns
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"gil: {'enabled' if gil else 'disabled'}, cpus: {os.cpu_count()}")
+
+    program = read_program(generate(4_000))
+    _, renamed = uniqify_program(program)
+    expected = eliminate_letrec_program(renamed)
+
+    print(f"{'workers':>8} {'check':>10} {'letrec':>10}")
+    baseline: tuple[float, float] | None = None
+    for workers in [1, 2, 4, 8]:
+        set_workers(workers)
+        assert eliminate_letrec_program(renamed) == expected
+        times = best(lambda: diagnose_program(program)), best(lambda: eliminate_letrec_program(renamed))
+        baseline = baseline or times
+        print(
+            f"{workers:>8} {times[0] * 1e3:8.1f}ms {times[1] * 1e3:8.1f}ms"
+            f"   speedup {baseline[0] / times[0]:4.2f}x {baseline[1] / times[1]:4.2f}x"
+        )
+    set_workers(1)
+
+
+if __name__ == "__main__":
+    main()
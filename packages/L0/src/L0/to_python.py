@@ -1,8 +1,8 @@
 import ast
 from ast import stmt
-from functools import partial
 
 from util.encode import encode
+from util.traverse import Dispatch, Step, run
 
 from .syntax import (
     Address,
@@ -29,154 +29,170 @@ def store(name: str) -> ast.Name:
     return ast.Name(id=encode(name), ctx=ast.Store())
 
 
+# a handler emits the Python statements for one L0 statement and hands back the statement that follows it, so that
+# a chain of `then`s becomes one flat block without copying it at every link
+type Emitted = tuple[list[stmt], Statement | None]
+
+_statement = Dispatch[Emitted]()
+
+
+def _block(statement: Statement | None) -> Step[list[stmt]]:
+    block: list[stmt] = []
+    while statement is not None:
+        statements, statement = yield _statement(statement)
+        block.extend(statements)
+    return block
+
+
+@_statement.register(Copy)
+def _copy(term: Copy) -> Step[Emitted]:
+    return [ast.Assign(targets=[store(term.destination)], value=load(term.source))], term.then
+
+
+@_statement.register(Immediate)
+def _immediate(term: Immediate) -> Step[Emitted]:
+    return [ast.Assign(targets=[store(term.destination)], value=ast.Constant(value=term.value))], term.then
+
+
+@_statement.register(Primitive)
+def _primitive(term: Primitive) -> Step[Emitted]:
+    match term.operator:
+        case "+":
+            op = ast.Add()
+
+        case "-":
+            op = ast.Sub()
+
+        case "*":  # pragma: no branch
+            op = ast.Mult()
+
+    return [
+        ast.Assign(
+            targets=[store(term.destination)],
+            value=ast.BinOp(
+                left=load(term.left),
+                op=op,
+                right=load(term.right),
+            ),
+        ),
+    ], term.then
+
+
+@_statement.register(Branch)
+def _branch(term: Branch) -> Step[Emitted]:
+    match term.operator:
+        case "<":
+            op = ast.Lt()
+
+        case "==":  # pragma: no branch
+            op = ast.Eq()
+
+    return [
+        ast.If(
+            test=ast.Compare(
+                left=load(term.left),
+                ops=[op],
+                comparators=[load(term.right)],
+            ),
+            body=(yield _block(term.then)),
+            orelse=(yield _block(term.otherwise)),
+        ),
+    ], None
+
+
+@_statement.register(Allocate)
+def _allocate(term: Allocate) -> Step[Emitted]:
+    return [
+        ast.Assign(
+            targets=[store(term.destination)],
+            value=ast.List(
+                elts=[ast.Constant(None) for _ in range(term.count)],
+                ctx=ast.Load(),
+            ),
+        ),
+    ], term.then
+
+
+@_statement.register(Load)
+def _load(term: Load) -> Step[Emitted]:
+    return [
+        ast.Assign(
+            targets=[store(term.destination)],
+            value=ast.Subscript(
+                value=load(term.base),
+                slice=ast.Constant(term.index),
+                ctx=ast.Load(),
+            ),
+        ),
+    ], term.then
+
+
+@_statement.register(Store)
+def _store(term: Store) -> Step[Emitted]:
+    return [
+        ast.Assign(
+            targets=[
+                ast.Subscript(
+                    value=store(term.base),
+                    slice=ast.Constant(term.index),
+                    ctx=ast.Store(),
+                )
+            ],
+            value=load(term.value),
+        ),
+    ], term.then
+
+
+@_statement.register(Address)
+def _address(term: Address) -> Step[Emitted]:
+    return [ast.Assign(targets=[store(term.destination)], value=load(term.name))], term.then
+
+
+@_statement.register(Call)
+def _call(term: Call) -> Step[Emitted]:
+    return [
+        ast.Return(
+            value=ast.Call(
+                func=load(term.target),
+                args=[load(argument) for argument in term.arguments],
+            )
+        )
+    ], None
+
+
+@_statement.register(Halt)
+def _halt(term: Halt) -> Step[Emitted]:
+    return [
+        ast.Return(value=load(term.value)),
+    ], None
+
+
 def to_ast_statement(
     term: Statement,
 ) -> list[ast.stmt]:
-    _statement: partial[list[stmt]] = partial(to_ast_statement)
-
-    match term:
-        case Copy(destination=destination, source=source, then=then):
-            return [
-                ast.Assign(targets=[store(destination)], value=load(source)),
-                *_statement(then),
-            ]
-
-        case Immediate(destination=destination, value=value, then=then):
-            return [
-                ast.Assign(targets=[store(destination)], value=ast.Constant(value=value)),
-                *_statement(then),
-            ]
-
-        case Primitive(destination=destination, operator=operator, left=left, right=right, then=then):
-            match operator:
-                case "+":
-                    op = ast.Add()
-
-                case "-":
-                    op = ast.Sub()
-
-                case "*":  # pragma: no branch
-                    op = ast.Mult()
-
-            return [
-                ast.Assign(
-                    targets=[store(destination)],
-                    value=ast.BinOp(
-                        left=load(left),
-                        op=op,
-                        right=load(right),
-                    ),
-                ),
-                *_statement(then),
-            ]
-
-        case Branch(operator=operator, left=left, right=right, then=then, otherwise=otherwise):
-            match operator:
-                case "<":
-                    op = ast.Lt()
-
-                case "==":  # pragma: no branch
-                    op = ast.Eq()
-
-            return [
-                ast.If(
-                    test=ast.Compare(
-                        left=load(left),
-                        ops=[op],
-                        comparators=[load(right)],
-                    ),
-                    body=_statement(then),
-                    orelse=_statement(otherwise),
-                ),
-            ]
-
-        case Allocate(destination=destination, count=count, then=then):
-            return [
-                ast.Assign(
-                    targets=[store(destination)],
-                    value=ast.List(
-                        elts=[ast.Constant(None) for _ in range(count)],
-                        ctx=ast.Load(),
-                    ),
-                ),
-                *_statement(then),
-            ]
-
-        case Load(destination=destination, base=base, index=index, then=then):
-            return [
-                ast.Assign(
-                    targets=[store(destination)],
-                    value=ast.Subscript(
-                        value=load(base),
-                        slice=ast.Constant(index),
-                        ctx=ast.Load(),
-                    ),
-                ),
-                *_statement(then),
-            ]
-
-        case Store(base=base, index=index, value=value, then=then):
-            return [
-                ast.Assign(
-                    targets=[
-                        ast.Subscript(
-                            value=store(base),
-                            slice=ast.Constant(index),
-                            ctx=ast.Store(),
-                        )
-                    ],
-                    value=load(value),
-                ),
-                *_statement(then),
-            ]
-
-        case Address(destination=destination, name=name, then=then):
-            return [
-                ast.Assign(targets=[store(destination)], value=load(name)),
-                *_statement(then),
-            ]
-
-        case Call(target=target, arguments=arguments):
-            return [
-                ast.Return(
-                    value=ast.Call(
-                        func=load(target),
-                        args=[load(argument) for argument in arguments],
-                    )
-                )
-            ]
-
-        case Halt(value=value):  # pragma: no branch
-            return [
-                ast.Return(value=load(value)),
-            ]
+    return run(_block(term))
 
 
 def to_ast_procedure(procedure: Procedure) -> ast.stmt:
-    _statement: partial[list[stmt]] = partial(to_ast_statement)
-
     match procedure:
         case Procedure(name=name, parameters=parameters, body=body):  # pragma: no branch
             return ast.FunctionDef(
                 name=name,
                 args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in parameters]),
-                body=_statement(body),
+                body=to_ast_statement(body),
             )
 
 
 def to_ast_program(
     program: Program,
 ) -> str:
-    _procedure = partial(to_ast_procedure)
-    _statement = partial(to_ast_statement)
-
     match program:
         case Program(procedures=procedures):  # pragma: no branch
             l0 = next(procedure for procedure in procedures if procedure.name == "l0")
 
             module = ast.Module(
                 body=[
-                    *[_procedure(procedure) for procedure in procedures],
+                    *[to_ast_procedure(procedure) for procedure in procedures],
                     ast.If(
                         test=ast.Compare(
                             left=ast.Name(id="__name__", ctx=ast.Load()),
@@ -0,0 +1,146 @@
+import ast
+
+import pytest
+from L0.syntax import (
+    Address,
+    Allocate,
+    Branch,
+    Call,
+    Copy,
+    Halt,
+    Immediate,
+    Load,
+    Primitive,
+    Procedure,
+    Program,
+    Statement,
+    Store,
+)
+from L0.to_python import to_ast_program, to_ast_statement
+
+
+@pytest.mark.parametrize(
+    ("statement", "expected"),
+    [
+        pytest.param(
+            Copy(destination="x", source="y", then=Halt(value="x")),
+            "x = y\nreturn x",
+            id="copy",
+        ),
+        pytest.param(
+            Immediate(destination="x", value=42, then=Halt(value="x")),
+            "x = 42\nreturn x",
+            id="immediate",
+        ),
+        pytest.param(
+            Primitive(destination="z", operator="+", left="x", right="y", then=Halt(value="z")),
+            "z = x + y\nreturn z",
+            id="add",
+        ),
+        pytest.param(
+            Primitive(destination="z", operator="-", left="x", right="y", then=Halt(value="z")),
+            "z = x - y\nreturn z",
+            id="subtract",
+        ),
+        pytest.param(
+            Primitive(destination="z", operator="*", left="x", right="y", then=Halt(value="z")),
+            "z = x * y\nreturn z",
+            id="multiply",
+        ),
+        pytest.param(
+            Branch(operator="<", left="x", right="y", then=Halt(value="x"), otherwise=Halt(value="y")),
+            "if x < y:\n    return x\nelse:\n    return y",
+            id="less",
+        ),
+        pytest.param(
+            Branch(operator="==", left="x", right="y", then=Halt(value="x"), otherwise=Halt(value="y")),
+            "if x == y:\n    return x\nelse:\n    return y",
+            id="equal",
+        ),
+        pytest.param(
+            Allocate(destination="x", count=2, then=Halt(value="x")),
+            "x = [None, None]\nreturn x",
+            id="allocate",
+        ),
+        pytest.param(
+            Load(destination="y", base="x", index=1, then=Halt(value="y")),
+            "y = x[1]\nreturn y",
+            id="load",
+        ),
+        pytest.param(
+            Store(base="x", index=1, value="y", then=Halt(value="x")),
+            "x[1] = y\nreturn x",
+            id="store",
+        ),
+        pytest.param(
+            Address(destination="f", name="g", then=Halt(value="f")),
+            "f = g\nreturn f",
+            id="address",
+        ),
+        pytest.param(
+            Call(target="f", arguments=["x", "y"]),
+            "return f(x, y)",
+            id="call",
+        ),
+        pytest.param(
+            Halt(value="x"),
+            "return x",
+            id="halt",
+        ),
+    ],
+)
+def test_to_ast_statement(statement: Statement, expected: str):
+    module = ast.Module(body=to_ast_statement(statement), type_ignores=[])
+
+    assert ast.unparse(ast.fix_missing_locations(module)) == expected
+
+
+def test_to_ast_program():
+    program = Program(
+        procedures=[
+            Procedure(name="f", parameters=["x"], body=Halt(value="x")),
+            Procedure(
+                name="l0",
+                parameters=["x"],
+                body=Address(destination="g", name="f", then=Call(target="g", arguments=["x"])),
+            ),
+        ]
+    )
+
+    expected = "\n".join(
+        [
+            "def f(x):",
+            "    return x",
+            "",
+            "def l0(x):",
+            "    g = f",
+            "    return g(x)",
+            "if __name__ == '__main__':",
+            "    import sys",
+            "    print(l0(int(sys.argv[1])))",
+        ]
+    )
+
+    assert to_ast_program(program) == expected
+
+
+def test_to_ast_statement_deep():
+    statement: Statement = Halt(value="x")
+    for _ in range(10_000):
+        statement = Copy(
+            destination="x",
+            source="y",
+            then=Branch(operator="<", left="x", right="y", then=statement, otherwise=Halt(value="y")),
+        )
+
+    actual = to_ast_statement(statement)
+
+    depth = 0
+    while len(actual) == 2:
+        assign, branch = actual
+        assert isinstance(assign, ast.Assign)
+        assert isinstance(branch, ast.If)
+        actual, depth = branch.body, depth + 1
+
+    assert depth == 10_000
+    assert isinstance(actual[0], ast.Return)
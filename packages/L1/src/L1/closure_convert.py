@@ -0,0 +1,166 @@
+from collections.abc import Callable
+
+from L0 import syntax as L0
+from util.construct import construct
+from util.traverse import Dispatch, Step, run
+
+from L1 import syntax as L1
+
+type Fresh = Callable[[str], str]
+
+# Every Abstract becomes a top-level procedure that takes its closure as an extra first parameter, and the Abstract
+# itself allocates that closure: a record of the procedure's address followed by the values of the function's free
+# variables, in sorted order, which the procedure loads back on entry. An Apply loads the address from the closure
+# and calls it with the closure and the arguments. A handler converts the statement's continuation first and returns
+# the converted statement along with its free variables.
+
+type Converted = tuple[L0.Statement, frozenset[L1.Identifier]]
+
+_statement = Dispatch[Converted]()
+
+
+@_statement.register(L1.Copy)
+def _copy(statement: L1.Copy, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, free = yield _statement(statement.then, procedures, fresh)
+    return (
+        construct(L0.Copy, destination=statement.destination, source=statement.source, then=then),
+        free - {statement.destination} | {statement.source},
+    )
+
+
+@_statement.register(L1.Abstract)
+def _abstract(statement: L1.Abstract, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    body, body_free = yield _statement(statement.body, procedures, fresh)
+    captured = sorted(body_free - set(statement.parameters))
+
+    environment = fresh("env")
+    code = fresh("code")
+    for index, name in reversed([*enumerate(captured, start=1)]):
+        body = construct(L0.Load, destination=name, base=environment, index=index, then=body)
+    procedures.append(
+        construct(L0.Procedure, name=code, parameters=[environment, *statement.parameters], body=body),
+    )
+
+    then, free = yield _statement(statement.then, procedures, fresh)
+    for index, name in reversed([*enumerate(captured, start=1)]):
+        then = construct(L0.Store, base=statement.destination, index=index, value=name, then=then)
+    address = fresh("t")
+    then = construct(
+        L0.Address,
+        destination=address,
+        name=code,
+        then=construct(L0.Store, base=statement.destination, index=0, value=address, then=then),
+    )
+    return (
+        construct(L0.Allocate, destination=statement.destination, count=len(captured) + 1, then=then),
+        free - {statement.destination} | set(captured),
+    )
+
+
+@_statement.register(L1.Apply)
+def _apply(statement: L1.Apply, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    code = fresh("t")
+    return (
+        construct(
+            L0.Load,
+            destination=code,
+            base=statement.target,
+            index=0,
+            then=construct(L0.Call, target=code, arguments=[statement.target, *statement.arguments]),
+        ),
+        frozenset([statement.target, *statement.arguments]),
+    )
+
+
+@_statement.register(L1.Immediate)
+def _immediate(statement: L1.Immediate, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, free = yield _statement(statement.then, procedures, fresh)
+    return (
+        construct(L0.Immediate, destination=statement.destination, value=statement.value, then=then),
+        free - {statement.destination},
+    )
+
+
+@_statement.register(L1.Primitive)
+def _primitive(statement: L1.Primitive, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, free = yield _statement(statement.then, procedures, fresh)
+    return (
+        construct(
+            L0.Primitive,
+            destination=statement.destination,
+            operator=statement.operator,
+            left=statement.left,
+            right=statement.right,
+            then=then,
+        ),
+        free - {statement.destination} | {statement.left, statement.right},
+    )
+
+
+@_statement.register(L1.Branch)
+def _branch(statement: L1.Branch, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, then_free = yield _statement(statement.then, procedures, fresh)
+    otherwise, otherwise_free = yield _statement(statement.otherwise, procedures, fresh)
+    return (
+        construct(
+            L0.Branch,
+            operator=statement.operator,
+            left=statement.left,
+            right=statement.right,
+            then=then,
+            otherwise=otherwise,
+        ),
+        then_free | otherwise_free | {statement.left, statement.right},
+    )
+
+
+@_statement.register(L1.Allocate)
+def _allocate(statement: L1.Allocate, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, free = yield _statement(statement.then, procedures, fresh)
+    return (
+        construct(L0.Allocate, destination=statement.destination, count=statement.count, then=then),
+        free - {statement.destination},
+    )
+
+
+@_statement.register(L1.Load)
+def _load(statement: L1.Load, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, free = yield _statement(statement.then, procedures, fresh)
+    return (
+        construct(
+            L0.Load,
+            destination=statement.destination,
+            base=statement.base,
+            index=statement.index,
+            then=then,
+        ),
+        free - {statement.destination} | {statement.base},
+    )
+
+
+@_statement.register(L1.Store)
+def _store(statement: L1.Store, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    then, free = yield _statement(statement.then, procedures, fresh)
+    return (
+        construct(L0.Store, base=statement.base, index=statement.index, value=statement.value, then=then),
+        free | {statement.base, statement.value},
+    )
+
+
+@_statement.register(L1.Halt)
+def _halt(statement: L1.Halt, procedures: list[L0.Procedure], fresh: Fresh) -> Step[Converted]:
+    return construct(L0.Halt, value=statement.value), frozenset([statement.value])
+
+
+def closure_convert_program(
+    program: L1.Program,
+    fresh: Fresh,
+) -> L0.Program:
+    match program:
+        case L1.Program(parameters=parameters, body=body):  # pragma: no branch
+            procedures: list[L0.Procedure] = []
+            body, _ = run(_statement(body, procedures, fresh))
+            return construct(
+                L0.Program,
+                procedures=[construct(L0.Procedure, name="l0", parameters=parameters, body=body), *procedures],
+            )
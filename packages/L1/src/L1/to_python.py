@@ -1,7 +1,8 @@
 import ast
-from functools import partial
+from collections.abc import Sequence
 
 from util.encode import encode
+from util.traverse import Dispatch, Step, run
 
 from .syntax import (
     Abstract,
@@ -10,6 +11,7 @@ from .syntax import (
     Branch,
     Copy,
     Halt,
+    Identifier,
     Immediate,
     Load,
     Primitive,
@@ -27,176 +29,209 @@ def store(name: str) -> ast.Name:
     return ast.Name(id=encode(name), ctx=ast.Store())
 
 
-def to_ast_statement(
-    statement: Statement,
-) -> list[ast.stmt]:
-    _statement = partial(to_ast_statement)
-
-    match statement:
-        case Copy(destination=destination, source=source, then=then):
-            return [
-                ast.Assign(targets=[store(destination)], value=load(source)),
-                *_statement(then),
-            ]
-
-        case Abstract(destination=destination, parameters=parameters, body=body, then=then):
-            return [
-                ast.FunctionDef(
-                    name=encode(destination),
-                    args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in parameters]),
-                    body=_statement(body),
-                ),
-                *_statement(then),
-            ]
-
-        case Apply(target=target, arguments=arguments):
-            return [
-                ast.Return(
-                    ast.Call(
-                        func=load(target),
-                        args=[load(argument) for argument in arguments],
-                    )
-                )
-            ]
+# a handler emits the Python statements for one L1 statement and hands back the statement that follows it, so that
+# a chain of `then`s becomes one flat block without copying it at every link
+type Emitted = tuple[list[ast.stmt], Statement | None]
 
-        case Immediate(destination=destination, value=value, then=then):
-            return [
-                ast.Assign(targets=[store(destination)], value=ast.Constant(value=value)),
-                *_statement(then),
-            ]
+_statement = Dispatch[Emitted]()
 
-        case Primitive(destination=destination, operator=operator, left=left, right=right, then=then):
-            match operator:
-                case "+":
-                    op = ast.Add()
 
-                case "-":
-                    op = ast.Sub()
+def _block(statement: Statement | None) -> Step[list[ast.stmt]]:
+    block: list[ast.stmt] = []
+    while statement is not None:
+        statements, statement = yield _statement(statement)
+        block.extend(statements)
+    return block
 
-                case "*":  # pragma: no branch
-                    op = ast.Mult()
 
-            return [
-                ast.Assign(
-                    targets=[store(destination)],
-                    value=ast.BinOp(left=load(left), op=op, right=load(right)),
-                ),
-                *_statement(then),
-            ]
-
-        case Branch(operator=operator, left=left, right=right, then=then, otherwise=otherwise):
-            match operator:
-                case "<":
-                    op = ast.Lt()
-
-                case "==":  # pragma: no branch
-                    op = ast.Eq()
-
-            return [
-                ast.If(
-                    ast.Compare(left=load(left), ops=[op], comparators=[load(right)]),
-                    body=_statement(then),
-                    orelse=_statement(otherwise),
-                ),
-            ]
-
-        case Allocate(destination=destination, count=count, then=then):
-            return [
-                ast.Assign(
-                    targets=[store(destination)],
-                    value=ast.List(
-                        elts=[ast.Constant(None) for _ in range(count)],
-                        ctx=ast.Load(),
-                    ),
-                ),
-                *_statement(then),
-            ]
-
-        case Load(destination=destination, base=base, index=index, then=then):
-            return [
-                ast.Assign(
-                    targets=[store(destination)],
-                    value=ast.Subscript(
-                        value=load(base),
-                        slice=ast.Constant(index),
-                        ctx=ast.Load(),
-                    ),
-                ),
-                *_statement(then),
-            ]
-
-        case Store(base=base, index=index, value=value, then=then):
-            return [
-                ast.Assign(
-                    targets=[
-                        ast.Subscript(
-                            value=load(base),
-                            slice=ast.Constant(index),
-                            ctx=ast.Store(),
-                        )
-                    ],
-                    value=load(value),
-                ),
-                *_statement(then),
-            ]
+@_statement.register(Copy)
+def _copy(statement: Copy) -> Step[Emitted]:
+    return [ast.Assign(targets=[store(statement.destination)], value=load(statement.source))], statement.then
 
-        case Halt(value=value):  # pragma: no branch
-            return [
-                ast.Return(value=load(value)),
-            ]
 
+@_statement.register(Abstract)
+def _abstract(statement: Abstract) -> Step[Emitted]:
+    return [
+        ast.FunctionDef(
+            name=encode(statement.destination),
+            args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in statement.parameters]),
+            body=(yield _block(statement.body)),
+        ),
+    ], statement.then
 
-def to_ast_program(
-    program: Program,
+
+@_statement.register(Apply)
+def _apply(statement: Apply) -> Step[Emitted]:
+    return [
+        ast.Return(
+            ast.Call(
+                func=load(statement.target),
+                args=[load(argument) for argument in statement.arguments],
+            )
+        )
+    ], None
+
+
+@_statement.register(Immediate)
+def _immediate(statement: Immediate) -> Step[Emitted]:
+    return [
+        ast.Assign(targets=[store(statement.destination)], value=ast.Constant(value=statement.value)),
+    ], statement.then
+
+
+@_statement.register(Primitive)
+def _primitive(statement: Primitive) -> Step[Emitted]:
+    match statement.operator:
+        case "+":
+            op = ast.Add()
+
+        case "-":
+            op = ast.Sub()
+
+        case "*":  # pragma: no branch
+            op = ast.Mult()
+
+    return [
+        ast.Assign(
+            targets=[store(statement.destination)],
+            value=ast.BinOp(left=load(statement.left), op=op, right=load(statement.right)),
+        ),
+    ], statement.then
+
+
+@_statement.register(Branch)
+def _branch(statement: Branch) -> Step[Emitted]:
+    match statement.operator:
+        case "<":
+            op = ast.Lt()
+
+        case "==":  # pragma: no branch
+            op = ast.Eq()
+
+    return [
+        ast.If(
+            ast.Compare(left=load(statement.left), ops=[op], comparators=[load(statement.right)]),
+            body=(yield _block(statement.then)),
+            orelse=(yield _block(statement.otherwise)),
+        ),
+    ], None
+
+
+@_statement.register(Allocate)
+def _allocate(statement: Allocate) -> Step[Emitted]:
+    return [
+        ast.Assign(
+            targets=[store(statement.destination)],
+            value=ast.List(
+                elts=[ast.Constant(None) for _ in range(statement.count)],
+                ctx=ast.Load(),
+            ),
+        ),
+    ], statement.then
+
+
+@_statement.register(Load)
+def _load(statement: Load) -> Step[Emitted]:
+    return [
+        ast.Assign(
+            targets=[store(statement.destination)],
+            value=ast.Subscript(
+                value=load(statement.base),
+                slice=ast.Constant(statement.index),
+                ctx=ast.Load(),
+            ),
+        ),
+    ], statement.then
+
+
+@_statement.register(Store)
+def _store(statement: Store) -> Step[Emitted]:
+    return [
+        ast.Assign(
+            targets=[
+                ast.Subscript(
+                    value=load(statement.base),
+                    slice=ast.Constant(statement.index),
+                    ctx=ast.Store(),
+                )
+            ],
+            value=load(statement.value),
+        ),
+    ], statement.then
+
+
+@_statement.register(Halt)
+def _halt(statement: Halt) -> Step[Emitted]:
+    return [
+        ast.Return(value=load(statement.value)),
+    ], None
+
+
+def to_ast_statement(
+    statement: Statement,
+) -> list[ast.stmt]:
+    return run(_block(statement))
+
+
+def to_module(
+    parameters: Sequence[Identifier],
+    body: list[ast.stmt],
 ) -> str:
-    match program:
-        case Program(parameters=parameters, body=body):  # pragma: no branch
-            module = ast.Module(
+    # the function l1, with the given body, and a main block that calls it with the integers on the command line
+    module = ast.Module(
+        body=[
+            ast.FunctionDef(
+                name="l1",
+                args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in parameters]),
+                body=body,
+            ),
+            ast.If(
+                test=ast.Compare(
+                    left=ast.Name(id="__name__", ctx=ast.Load()),
+                    ops=[ast.Eq()],
+                    comparators=[ast.Constant(value="__main__")],
+                ),
                 body=[
-                    ast.FunctionDef(
-                        name="l1",
-                        args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in parameters]),
-                        body=to_ast_statement(body),
-                    ),
-                    ast.If(
-                        test=ast.Compare(
-                            left=ast.Name(id="__name__", ctx=ast.Load()),
-                            ops=[ast.Eq()],
-                            comparators=[ast.Constant(value="__main__")],
-                        ),
-                        body=[
-                            ast.Import(names=[ast.alias(name="sys", asname=None)]),
-                            ast.Expr(
-                                value=ast.Call(
-                                    func=ast.Name(id="print", ctx=ast.Load()),
+                    ast.Import(names=[ast.alias(name="sys", asname=None)]),
+                    ast.Expr(
+                        value=ast.Call(
+                            func=ast.Name(id="print", ctx=ast.Load()),
+                            args=[
+                                ast.Call(
+                                    func=ast.Name(id="l1", ctx=ast.Load()),
                                     args=[
                                         ast.Call(
-                                            func=ast.Name(id="l1", ctx=ast.Load()),
+                                            func=ast.Name(id="int", ctx=ast.Load()),
                                             args=[
-                                                ast.Call(
-                                                    func=ast.Name(id="int", ctx=ast.Load()),
-                                                    args=[
-                                                        ast.Subscript(
-                                                            value=ast.Attribute(
-                                                                value=ast.Name(id="sys", ctx=ast.Load()),
-                                                                attr="argv",
-                                                                ctx=ast.Load(),
-                                                            ),
-                                                            slice=ast.Constant(value=i + 1),
-                                                        )
-                                                    ],
+                                                ast.Subscript(
+                                                    value=ast.Attribute(
+                                                        value=ast.Name(id="sys", ctx=ast.Load()),
+                                                        attr="argv",
+                                                        ctx=ast.Load(),
+                                                    ),
+                                                    slice=ast.Constant(value=i + 1),
                                                 )
-                                                for i, _ in enumerate(parameters)
                                             ],
                                         )
+                                        for i, _ in enumerate(parameters)
                                     ],
                                 )
-                            ),
-                        ],
+                            ],
+                        )
                     ),
-                ]
-            )
+                ],
+            ),
+        ]
+    )
+
+    ast.fix_missing_locations(module)
+
+    return ast.unparse(module)
 
-            ast.fix_missing_locations(module)
 
-            return ast.unparse(module)
+def to_ast_program(
+    program: Program,
+) -> str:
+    match program:
+        case Program(parameters=parameters, body=body):  # pragma: no branch
+            return to_module(parameters, to_ast_statement(body))
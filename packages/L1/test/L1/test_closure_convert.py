@@ -0,0 +1,128 @@
+from typing import Any
+
+import pytest
+from L0 import syntax as L0
+from L0.to_python import to_ast_program as l0_to_python
+from L1 import syntax as L1
+from L1.closure_convert import closure_convert_program
+from L1.to_python import to_ast_program as l1_to_python
+from util.sequential_name_generator import SequentialNameGenerator
+
+
+def test_closure_convert_program():
+    program = L1.Program(
+        parameters=["x"],
+        body=L1.Abstract(
+            destination="f",
+            parameters=["y"],
+            body=L1.Primitive(destination="z", operator="+", left="x", right="y", then=L1.Halt(value="z")),
+            then=L1.Apply(target="f", arguments=["x"]),
+        ),
+    )
+
+    actual = closure_convert_program(program, SequentialNameGenerator())
+
+    expected = L0.Program(
+        procedures=[
+            L0.Procedure(
+                name="l0",
+                parameters=["x"],
+                body=L0.Allocate(
+                    destination="f",
+                    count=2,
+                    then=L0.Address(
+                        destination="t1",
+                        name="code0",
+                        then=L0.Store(
+                            base="f",
+                            index=0,
+                            value="t1",
+                            then=L0.Store(
+                                base="f",
+                                index=1,
+                                value="x",
+                                then=L0.Load(
+                                    destination="t0",
+                                    base="f",
+                                    index=0,
+                                    then=L0.Call(target="t0", arguments=["f", "x"]),
+                                ),
+                            ),
+                        ),
+                    ),
+                ),
+            ),
+            L0.Procedure(
+                name="code0",
+                parameters=["env0", "y"],
+                body=L0.Load(
+                    destination="x",
+                    base="env0",
+                    index=1,
+                    then=L0.Primitive(destination="z", operator="+", left="x", right="y", then=L0.Halt(value="z")),
+                ),
+            ),
+        ],
+    )
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("argument", [-5, 5])
+def test_closure_convert_program_runs(argument: int):
+    # every kind of statement, with a function that captures a variable bound by a Copy
+    program = L1.Program(
+        parameters=["x"],
+        body=L1.Immediate(
+            destination="one",
+            value=1,
+            then=L1.Abstract(
+                destination="f",
+                parameters=["y", "k"],
+                body=L1.Primitive(
+                    destination="s",
+                    operator="+",
+                    left="y",
+                    right="one",
+                    then=L1.Apply(target="k", arguments=["s"]),
+                ),
+                then=L1.Allocate(
+                    destination="cell",
+                    count=1,
+                    then=L1.Store(
+                        base="cell",
+                        index=0,
+                        value="x",
+                        then=L1.Load(
+                            destination="v",
+                            base="cell",
+                            index=0,
+                            then=L1.Copy(
+                                destination="w",
+                                source="v",
+                                then=L1.Abstract(
+                                    destination="return",
+                                    parameters=["r"],
+                                    body=L1.Branch(
+                                        operator="<",
+                                        left="r",
+                                        right="one",
+                                        then=L1.Halt(value="r"),
+                                        otherwise=L1.Halt(value="w"),
+                                    ),
+                                    then=L1.Apply(target="f", arguments=["w", "return"]),
+                                ),
+                            ),
+                        ),
+                    ),
+                ),
+            ),
+        ),
+    )
+
+    l1: dict[str, Any] = {}
+    exec(l1_to_python(program), l1)
+    l0: dict[str, Any] = {}
+    exec(l0_to_python(closure_convert_program(program, SequentialNameGenerator())), l0)
+
+    assert l0["l0"](argument) == l1["l1"](argument)
@@ -1,82 +1,212 @@
 from collections.abc import Callable, Sequence
-from functools import partial
 
 from L1 import syntax as L1
+from util.construct import construct
+from util.traverse import Dispatch, Step, run
 
 from L2 import syntax as L2
 
+type Fresh = Callable[[str], str]
 
-def cps_convert_term(
-    term: L2.Term,
-    k: Callable[[L1.Identifier], L1.Statement],
-    fresh: Callable[[str], str],
-) -> L1.Statement:
-    _term = partial(cps_convert_term, fresh=fresh)
-    _terms = partial(cps_convert_terms, fresh=fresh)
+# continuations return steps too, so that the conversion they resume runs on the engine's stack rather than Python's
+type Continuation = Callable[[L1.Identifier], Step[L1.Statement]]
 
-    match term:
-        case L2.Let(bindings=bindings, body=body):
-            pass
+type Continuations = Callable[[Sequence[L1.Identifier]], Step[L1.Statement]]
 
-        case L2.Reference(name=name):
-            pass
 
-        case L2.Abstract(parameters=parameters, body=body):
-            pass
+class Return:
+    # the continuation of a function body or a branch arm, which passes the value on to the named L1 function; unlike
+    # other continuations, what it does is determined by that name, so conversions under it can be memoized
 
-        case L2.Apply(target=target, arguments=arguments):
-            pass
+    __slots__ = ("target",)
 
-        case L2.Immediate(value=value):
-            pass
+    def __init__(self, target: L1.Identifier) -> None:
+        self.target = target
 
-        case L2.Primitive(operator=operator, left=left, right=right):
-            pass
+    def __call__(self, value: L1.Identifier) -> L1.Statement:
+        return construct(L1.Apply, target=self.target, arguments=[value])
 
-        case L2.Branch(operator=operator, left=left, right=right, consequent=consequent, otherwise=otherwise):
-            pass
 
-        case L2.Allocate(count=count):
-            pass
+_term = Dispatch[L1.Statement]()
 
-        case L2.Load(base=base, index=index):
-            pass
 
-        case L2.Store(base=base, index=index, value=value):
-            pass
+def _terms(terms: Sequence[L2.Term], k: Continuations, fresh: Fresh) -> Step[L1.Statement]:
+    # converts the terms left to right and passes all of their names to k; every continuation is invoked exactly
+    # once, so the names can be collected in one shared list
+    names: list[L1.Identifier] = []
 
-        case L2.Begin(effects=effects, value=value):  # pragma: no branch
-            pass
+    def convert(index: int) -> Step[L1.Statement]:
+        if index == len(terms):
+            return (yield k(names))
 
+        def bind(name: L1.Identifier) -> Step[L1.Statement]:
+            names.append(name)
+            return convert(index + 1)
 
-def cps_convert_terms(
-    terms: Sequence[L2.Term],
-    k: Callable[[Sequence[L1.Identifier]], L1.Statement],
-    fresh: Callable[[str], str],
-) -> L1.Statement:
-    _term = partial(cps_convert_term, fresh=fresh)
-    _terms = partial(cps_convert_terms, fresh=fresh)
+        return (yield _term(terms[index], bind, fresh))
+
+    return convert(0)
+
+
+@_term.register(L2.Let)
+def _let(term: L2.Let, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    def bind(values: Sequence[L1.Identifier]) -> Step[L1.Statement]:
+        result = yield _term(term.body, k, fresh)
+        for (name, _), value in reversed([*zip(term.bindings, values)]):
+            result = construct(L1.Copy, destination=name, source=value, then=result)
+        return result
+
+    return _terms([value for _, value in term.bindings], bind, fresh)
+
+
+@_term.register(L2.Reference)
+def _reference(term: L2.Reference, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    return k(term.name)
+
+
+@_term.register(L2.Abstract)
+def _abstract(term: L2.Abstract, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    t = fresh("t")
+    k_ = fresh("k")
+    return construct(
+        L1.Abstract,
+        destination=t,
+        parameters=[*term.parameters, k_],
+        body=(yield _term(term.body, Return(k_), fresh)),
+        then=(yield k(t)),
+    )
+
+
+@_term.register(L2.Apply)
+def _apply(term: L2.Apply, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    k_ = fresh("k")
+    t = fresh("t")
+
+    def apply(target: L1.Identifier) -> Step[L1.Statement]:
+        return _terms(
+            term.arguments,
+            lambda arguments: construct(L1.Apply, target=target, arguments=[*arguments, k_]),
+            fresh,
+        )
 
-    match terms:
-        case []:
-            return k([])
+    return construct(
+        L1.Abstract,
+        destination=k_,
+        parameters=[t],
+        body=(yield k(t)),
+        then=(yield _term(term.target, apply, fresh)),
+    )
 
-        case [first, *rest]:
-            return _term(first, lambda first: _terms(rest, lambda rest: k([first, *rest])))
 
-        case _:  # pragma: no cover
-            raise ValueError(terms)
+@_term.register(L2.Immediate)
+def _immediate(term: L2.Immediate, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    t = fresh("t")
+    return construct(L1.Immediate, destination=t, value=term.value, then=(yield k(t)))
+
+
+@_term.register(L2.Primitive)
+def _primitive(term: L2.Primitive, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    def primitive(operands: Sequence[L1.Identifier]) -> Step[L1.Statement]:
+        t = fresh("t")
+        left, right = operands
+        return construct(
+            L1.Primitive,
+            destination=t,
+            operator=term.operator,
+            left=left,
+            right=right,
+            then=(yield k(t)),
+        )
+
+    return _terms([term.left, term.right], primitive, fresh)
+
+
+@_term.register(L2.Branch)
+def _branch(term: L2.Branch, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    j = fresh("j")
+    t = fresh("t")
+    join = Return(j)
+
+    def branch(operands: Sequence[L1.Identifier]) -> Step[L1.Statement]:
+        left, right = operands
+        return construct(
+            L1.Branch,
+            operator=term.operator,
+            left=left,
+            right=right,
+            then=(yield _term(term.consequent, join, fresh)),
+            otherwise=(yield _term(term.otherwise, join, fresh)),
+        )
+
+    return construct(
+        L1.Abstract,
+        destination=j,
+        parameters=[t],
+        body=(yield k(t)),
+        then=(yield _terms([term.left, term.right], branch, fresh)),
+    )
+
+
+@_term.register(L2.Allocate)
+def _allocate(term: L2.Allocate, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    t = fresh("t")
+    return construct(L1.Allocate, destination=t, count=term.count, then=(yield k(t)))
+
+
+@_term.register(L2.Load)
+def _load(term: L2.Load, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    def load(base: L1.Identifier) -> Step[L1.Statement]:
+        t = fresh("t")
+        return construct(L1.Load, destination=t, base=base, index=term.index, then=(yield k(t)))
+
+    return (yield _term(term.base, load, fresh))
+
+
+@_term.register(L2.Store)
+def _store(term: L2.Store, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    def store(operands: Sequence[L1.Identifier]) -> Step[L1.Statement]:
+        t = fresh("t")
+        base, value = operands
+        return construct(
+            L1.Store,
+            base=base,
+            index=term.index,
+            value=value,
+            then=construct(L1.Immediate, destination=t, value=0, then=(yield k(t))),
+        )
+
+    return _terms([term.base, term.value], store, fresh)
+
+
+@_term.register(L2.Begin)
+def _begin(term: L2.Begin, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+    return _terms(term.effects, lambda _: _term(term.value, k, fresh), fresh)
+
+
+def cps_convert_term(
+    term: L2.Term,
+    k: Continuation,
+    fresh: Fresh,
+) -> L1.Statement:
+    return run(_term(term, k, fresh))
+
+
+def cps_convert_terms(
+    terms: Sequence[L2.Term],
+    k: Continuations,
+    fresh: Fresh,
+) -> L1.Statement:
+    return run(_terms(terms, k, fresh))
 
 
 def cps_convert_program(
     program: L2.Program,
-    fresh: Callable[[str], str],
+    fresh: Fresh,
 ) -> L1.Program:
-    _term = partial(cps_convert_term, fresh=fresh)
-
     match program:
         case L2.Program(parameters=parameters, body=body):  # pragma: no branch
-            return L1.Program(
+            return construct(
+                L1.Program,
                 parameters=parameters,
-                body=_term(body, lambda value: L1.Halt(value=value)),
+                body=cps_convert_term(body, lambda value: construct(L1.Halt, value=value), fresh),
             )
@@ -0,0 +1,231 @@
+import ast
+from collections.abc import Callable, Sequence
+
+from L1.syntax import Identifier
+from L1.to_python import load, store, to_module
+from util.encode import encode
+from util.traverse import Dispatch, Step, run
+
+from L2 import syntax as L2
+
+# cps_convert followed by L1.to_python, without the L1 tree in between: each handler converts a term the way
+# cps_convert does, but where that builds an L1 statement, this appends the Python statements L1.to_python would emit
+# for it to `block`, the body being built. A continuation is given the block its code goes into, which is a new one
+# for the body of a function or the arm of an if. Names are drawn from `fresh` in the order cps_convert draws them,
+# so the module is the one the two passes would give.
+
+type Fresh = Callable[[str], str]
+
+type Block = list[ast.stmt]
+
+type Continuation = Callable[[Identifier, Block], Step[None]]
+
+type Continuations = Callable[[Sequence[Identifier], Block], Step[None]]
+
+
+class Return:
+    # the continuation of a function body or a branch arm, which passes the value on to the named function
+
+    __slots__ = ("target",)
+
+    def __init__(self, target: Identifier) -> None:
+        self.target = target
+
+    def __call__(self, value: Identifier, block: Block) -> None:
+        block.append(ast.Return(ast.Call(func=load(self.target), args=[load(value)])))
+
+
+def _halt(value: Identifier, block: Block) -> None:
+    block.append(ast.Return(value=load(value)))
+
+
+def _function(name: Identifier, parameters: Sequence[Identifier], body: Block) -> ast.stmt:
+    return ast.FunctionDef(
+        name=encode(name),
+        args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in parameters]),
+        body=body,
+    )
+
+
+def _assign(destination: Identifier, value: ast.expr) -> ast.stmt:
+    return ast.Assign(targets=[store(destination)], value=value)
+
+
+_term = Dispatch[None]()
+
+
+def _terms(terms: Sequence[L2.Term], k: Continuations, block: Block, fresh: Fresh) -> Step[None]:
+    # converts the terms left to right and passes all of their names to k, along with the block it goes into
+    names: list[Identifier] = []
+
+    def convert(index: int, block: Block) -> Step[None]:
+        if index == len(terms):
+            return (yield k(names, block))
+
+        def bind(name: Identifier, block: Block) -> Step[None]:
+            names.append(name)
+            return convert(index + 1, block)
+
+        return (yield _term(terms[index], bind, block, fresh))
+
+    return convert(0, block)
+
+
+@_term.register(L2.Let)
+def _let(term: L2.Let, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    def bind(values: Sequence[Identifier], block: Block) -> Step[None]:
+        block.extend(_assign(name, load(value)) for (name, _), value in zip(term.bindings, values))
+        return (yield _term(term.body, k, block, fresh))
+
+    return _terms([value for _, value in term.bindings], bind, block, fresh)
+
+
+@_term.register(L2.Reference)
+def _reference(term: L2.Reference, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    return k(term.name, block)
+
+
+@_term.register(L2.Abstract)
+def _abstract(term: L2.Abstract, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    t = fresh("t")
+    k_ = fresh("k")
+    body: Block = []
+    yield _term(term.body, Return(k_), body, fresh)
+    block.append(_function(t, [*term.parameters, k_], body))
+    return (yield k(t, block))
+
+
+@_term.register(L2.Apply)
+def _apply(term: L2.Apply, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    k_ = fresh("k")
+    t = fresh("t")
+
+    def call(arguments: Sequence[Identifier], block: Block, target: Identifier) -> None:
+        block.append(ast.Return(ast.Call(func=load(target), args=[load(argument) for argument in [*arguments, k_]])))
+
+    def apply(target: Identifier, block: Block) -> Step[None]:
+        return _terms(term.arguments, lambda arguments, block: call(arguments, block, target), block, fresh)
+
+    body: Block = []
+    yield k(t, body)
+    block.append(_function(k_, [t], body))
+    return (yield _term(term.target, apply, block, fresh))
+
+
+@_term.register(L2.Immediate)
+def _immediate(term: L2.Immediate, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    t = fresh("t")
+    block.append(_assign(t, ast.Constant(value=term.value)))
+    return (yield k(t, block))
+
+
+@_term.register(L2.Primitive)
+def _primitive(term: L2.Primitive, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    match term.operator:
+        case "+":
+            op = ast.Add()
+
+        case "-":
+            op = ast.Sub()
+
+        case "*":  # pragma: no branch
+            op = ast.Mult()
+
+    def primitive(operands: Sequence[Identifier], block: Block) -> Step[None]:
+        t = fresh("t")
+        left, right = operands
+        block.append(_assign(t, ast.BinOp(left=load(left), op=op, right=load(right))))
+        return (yield k(t, block))
+
+    return _terms([term.left, term.right], primitive, block, fresh)
+
+
+@_term.register(L2.Branch)
+def _branch(term: L2.Branch, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    match term.operator:
+        case "<":
+            op = ast.Lt()
+
+        case "==":  # pragma: no branch
+            op = ast.Eq()
+
+    j = fresh("j")
+    t = fresh("t")
+    join = Return(j)
+
+    def branch(operands: Sequence[Identifier], block: Block) -> Step[None]:
+        left, right = operands
+        then: Block = []
+        otherwise: Block = []
+        yield _term(term.consequent, join, then, fresh)
+        yield _term(term.otherwise, join, otherwise, fresh)
+        block.append(
+            ast.If(
+                ast.Compare(left=load(left), ops=[op], comparators=[load(right)]),
+                body=then,
+                orelse=otherwise,
+            )
+        )
+
+    body: Block = []
+    yield k(t, body)
+    block.append(_function(j, [t], body))
+    return (yield _terms([term.left, term.right], branch, block, fresh))
+
+
+@_term.register(L2.Allocate)
+def _allocate(term: L2.Allocate, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    t = fresh("t")
+    block.append(_assign(t, ast.List(elts=[ast.Constant(None) for _ in range(term.count)], ctx=ast.Load())))
+    return (yield k(t, block))
+
+
+@_term.register(L2.Load)
+def _load(term: L2.Load, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    def load_(base: Identifier, block: Block) -> Step[None]:
+        t = fresh("t")
+        block.append(_assign(t, ast.Subscript(value=load(base), slice=ast.Constant(term.index), ctx=ast.Load())))
+        return (yield k(t, block))
+
+    return (yield _term(term.base, load_, block, fresh))
+
+
+@_term.register(L2.Store)
+def _store(term: L2.Store, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    def store_(operands: Sequence[Identifier], block: Block) -> Step[None]:
+        t = fresh("t")
+        base, value = operands
+        block.append(
+            ast.Assign(
+                targets=[ast.Subscript(value=load(base), slice=ast.Constant(term.index), ctx=ast.Store())],
+                value=load(value),
+            )
+        )
+        block.append(_assign(t, ast.Constant(value=0)))
+        return (yield k(t, block))
+
+    return _terms([term.base, term.value], store_, block, fresh)
+
+
+@_term.register(L2.Begin)
+def _begin(term: L2.Begin, k: Continuation, block: Block, fresh: Fresh) -> Step[None]:
+    return _terms(term.effects, lambda _, block: _term(term.value, k, block, fresh), block, fresh)
+
+
+def cps_to_python_term(
+    term: L2.Term,
+    k: Continuation,
+    fresh: Fresh,
+) -> Block:
+    block: Block = []
+    run(_term(term, k, block, fresh))
+    return block
+
+
+def cps_to_python_program(
+    program: L2.Program,
+    fresh: Fresh,
+) -> str:
+    match program:
+        case L2.Program(parameters=parameters, body=body):  # pragma: no branch
+            return to_module(parameters, cps_to_python_term(body, _halt, fresh))
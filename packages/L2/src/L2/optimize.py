@@ -1,7 +1,489 @@
-from .syntax import Program
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from typing import NamedTuple
+
+from util.construct import construct, replace
+from util.scope import Scope
+from util.traverse import Dispatch, Step, run, sequence
+
+from .syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
+    Identifier,
+    Immediate,
+    Let,
+    Load,
+    Primitive,
+    Program,
+    Reference,
+    Store,
+    Term,
+)
+
+# Constant folding, constant and copy propagation and dead-code elimination, repeated until a round changes nothing.
+# A round rewrites the program in one traversal: a Let whose value is an Immediate or a Reference substitutes it into
+# its body, a Primitive or Branch on Immediates is folded, and a binding that is no longer referenced, or an effect of
+# a Begin, is dropped when evaluating it has no effect. Whether a binding is still referenced is read from a count of
+# the references to each name, taken at the start of the round and kept up to date as references are substituted or
+# dropped, so that a binding made dead by a rewrite further in goes in the same round; the next round picks up what
+# that exposes further out. Names are those uniqify made unique, so substituting a Reference cannot capture it.
+# Unchanged subtrees are kept by `replace`, which is how a round that changed nothing is recognised.
+
+# a rewritten term, along with whether evaluating it is free of effects
+type Optimized = tuple[Term, bool]
+
+type Environment = Scope[Identifier, Term | None]
+
+_term = Dispatch[Optimized]()
+
+
+def _subterms(term: Term) -> Iterator[Term]:
+    # every node of term, in no particular order
+    stack: list[Term] = [term]
+    while stack:
+        term = stack.pop()
+        yield term
+        match term:
+            case Let(bindings=bindings, body=body):
+                stack.extend(value for _, value in bindings)
+                stack.append(body)
+
+            case Abstract(body=body) | Load(base=body):
+                stack.append(body)
+
+            case Apply(target=target, arguments=arguments):
+                stack.append(target)
+                stack.extend(arguments)
+
+            case Primitive(left=left, right=right):
+                stack.extend([left, right])
+
+            case Branch(left=left, right=right, consequent=consequent, otherwise=otherwise):
+                stack.extend([left, right, consequent, otherwise])
+
+            case Store(base=base, value=value):
+                stack.extend([base, value])
+
+            case Begin(effects=effects, value=value):
+                stack.extend(effects)
+                stack.append(value)
+
+            case _:
+                pass
+
+
+def _references(term: Term) -> Iterator[Identifier]:
+    return (subterm.name for subterm in _subterms(term) if isinstance(subterm, Reference))
+
+
+def _forget(term: Term, uses: Counter[Identifier]) -> None:
+    # term is dropped, along with its references
+    uses.subtract(_references(term))
+
+
+@_term.register(Let)
+def _let(term: Let, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    values: list[Optimized] = yield sequence(_term(value, env, uses) for _, value in term.bindings)
+
+    with env.bind(
+        (name, value if isinstance(value, Immediate | Reference) else None)
+        for (name, _), (value, _) in zip(term.bindings, values)
+    ):
+        body, pure = yield _term(term.body, env, uses)
+
+    bindings: list[tuple[Identifier, Term]] = []
+    for (name, _), (value, value_pure) in zip(term.bindings, values):
+        if value_pure and uses[name] == 0:
+            _forget(value, uses)
+            continue
+
+        bindings.append((name, value))
+        pure = pure and value_pure
+
+    if not bindings:
+        return body, pure
+    return replace(term, bindings=bindings, body=body), pure
+
+
+@_term.register(Reference)
+def _reference(term: Reference, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    value = env.get(term.name)
+    if value is None:
+        return term, True
+
+    uses[term.name] -= 1
+    if isinstance(value, Reference):
+        uses[value.name] += 1
+    return value, True
+
+
+@_term.register(Abstract)
+def _abstract(term: Abstract, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    with env.bind((parameter, None) for parameter in term.parameters):
+        body, _ = yield _term(term.body, env, uses)
+
+    return replace(term, body=body), True
+
+
+@_term.register(Apply)
+def _apply(term: Apply, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    target, _ = yield _term(term.target, env, uses)
+    arguments: list[Optimized] = yield sequence(_term(argument, env, uses) for argument in term.arguments)
+    return replace(term, target=target, arguments=[argument for argument, _ in arguments]), False
+
+
+@_term.register(Immediate, Allocate)
+def _leaf(term: Immediate | Allocate, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    return term, True
+
+
+@_term.register(Primitive)
+def _primitive(term: Primitive, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    left, left_pure = yield _term(term.left, env, uses)
+    right, right_pure = yield _term(term.right, env, uses)
+
+    match term.operator, left, right:
+        case "+", Immediate(value=a), Immediate(value=b):
+            return construct(Immediate, value=a + b), True
+
+        case "-", Immediate(value=a), Immediate(value=b):
+            return construct(Immediate, value=a - b), True
+
+        case "*", Immediate(value=a), Immediate(value=b):
+            return construct(Immediate, value=a * b), True
+
+        case _:
+            return replace(term, left=left, right=right), left_pure and right_pure
+
+
+@_term.register(Branch)
+def _branch(term: Branch, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    left, left_pure = yield _term(term.left, env, uses)
+    right, right_pure = yield _term(term.right, env, uses)
+
+    match term.operator, left, right:
+        case "<", Immediate(value=a), Immediate(value=b):
+            taken, dropped = (term.consequent, term.otherwise) if a < b else (term.otherwise, term.consequent)
+
+        case "==", Immediate(value=a), Immediate(value=b):
+            taken, dropped = (term.consequent, term.otherwise) if a == b else (term.otherwise, term.consequent)
+
+        case _:
+            consequent, consequent_pure = yield _term(term.consequent, env, uses)
+            otherwise, otherwise_pure = yield _term(term.otherwise, env, uses)
+            return (
+                replace(term, left=left, right=right, consequent=consequent, otherwise=otherwise),
+                left_pure and right_pure and consequent_pure and otherwise_pure,
+            )
+
+    _forget(dropped, uses)
+    return (yield _term(taken, env, uses))
+
+
+@_term.register(Load)
+def _load(term: Load, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    base, pure = yield _term(term.base, env, uses)
+    return replace(term, base=base), pure
+
+
+@_term.register(Store)
+def _store(term: Store, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    base, _ = yield _term(term.base, env, uses)
+    value, _ = yield _term(term.value, env, uses)
+    return replace(term, base=base, value=value), False
+
+
+@_term.register(Begin)
+def _begin(term: Begin, env: Environment, uses: Counter[Identifier]) -> Step[Optimized]:
+    effects: list[Term] = []
+    for effect, pure in (yield sequence(_term(effect, env, uses) for effect in term.effects)):
+        if pure:
+            _forget(effect, uses)
+        else:
+            effects.append(effect)
+
+    value, pure = yield _term(term.value, env, uses)
+
+    if not effects:
+        return value, pure
+    return replace(term, effects=effects, value=value), False
+
+
+def optimize_term(
+    term: Term,
+    uses: Counter[Identifier],
+) -> Term:
+    # one round; uses counts the references to each name in term
+    optimized, _ = run(_term(term, Scope[Identifier, Term | None](), uses))
+    return optimized
 
 
 def optimize_program(
     program: Program,
 ) -> Program:
+    while True:
+        match program:
+            case Program(body=body):  # pragma: no branch
+                optimized = replace(program, body=optimize_term(body, Counter(_references(body))))
+
+        if optimized is program:
+            return program
+        program = optimized
+
+
+# Inlining, at -O2. An Abstract that is applied directly is beta-reduced: its parameters are bound to the arguments by
+# a Let around its body. A call to an Abstract bound by a Let gets the Abstract in place of the reference: the original
+# if this is its only reference, or a copy with fresh binders if it is small enough to copy, by the cost model. The
+# binding is then left unused, and the optimizer drops it. Arguments are evaluated before the body either way, in
+# their order, and the Abstract itself has no effect, so effects happen in the order they did. Each round inlines
+# what it finds and then optimizes, which exposes more: a copied argument becomes a Let-bound Abstract in turn. Rounds
+# repeat until nothing changes, or for at most the number the cost model allows, since a term that applies an Abstract
+# to itself can be inlined forever.
+
+type Fresh = Callable[[str], str]
+
+
+class CostModel(NamedTuple):
+    # the size of a term is the sum of the costs of its nodes; a Let-bound Abstract is copied into each of its call
+    # sites while its size is at most `threshold`, and moved into the only one whatever its size
+    threshold: int = 16
+    rounds: int = 8
+    apply: int = 3
+    abstract: int = 2
+    other: int = 1
+
+    def size(self, term: Term) -> int:
+        total = 0
+        for subterm in _subterms(term):
+            match subterm:
+                case Apply():
+                    total += self.apply
+
+                case Abstract():
+                    total += self.abstract
+
+                case _:
+                    total += self.other
+        return total
+
+
+class _Inlining(NamedTuple):
+    fresh: Fresh
+    costs: CostModel
+
+
+# the Let-bound Abstracts in scope, with their sizes
+type Inlinable = Scope[Identifier, tuple[Abstract, int] | None]
+
+_inline = Dispatch[Term]()
+
+
+@_inline.register(Let)
+def _inline_let(term: Let, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    values: list[Term] = yield sequence(_inline(value, env, uses, inlining) for _, value in term.bindings)
+
+    with env.bind(
+        (name, (value, inlining.costs.size(value)) if isinstance(value, Abstract) else None)
+        for (name, _), value in zip(term.bindings, values)
+    ):
+        body = yield _inline(term.body, env, uses, inlining)
+
+    return replace(term, bindings=[(name, value) for (name, _), value in zip(term.bindings, values)], body=body)
+
+
+@_inline.register(Reference, Immediate, Allocate)
+def _inline_leaf(
+    term: Reference | Immediate | Allocate, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining
+) -> Step[Term]:
+    return term
+
+
+@_inline.register(Abstract)
+def _inline_abstract(term: Abstract, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    with env.bind((parameter, None) for parameter in term.parameters):
+        return replace(term, body=(yield _inline(term.body, env, uses, inlining)))
+
+
+@_inline.register(Apply)
+def _inline_apply(term: Apply, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    target = yield _inline(term.target, env, uses, inlining)
+    arguments: list[Term] = yield sequence(_inline(argument, env, uses, inlining) for argument in term.arguments)
+
+    if isinstance(target, Reference) and (bound := env.get(target.name)) is not None:
+        abstract, size = bound
+        if len(abstract.parameters) == len(arguments) and (uses[target.name] == 1 or size <= inlining.costs.threshold):
+            if uses[target.name] > 1:
+                abstract = yield _copy(abstract, Scope[Identifier, Identifier](), inlining.fresh)
+                uses.update(_references(abstract))
+            uses[target.name] -= 1
+            target = abstract
+
+    if not isinstance(target, Abstract) or len(target.parameters) != len(arguments):
+        return replace(term, target=target, arguments=arguments)
+    if not arguments:
+        return target.body
+    return construct(Let, bindings=[*zip(target.parameters, arguments)], body=target.body)
+
+
+@_inline.register(Primitive)
+def _inline_primitive(term: Primitive, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _inline(term.left, env, uses, inlining)),
+        right=(yield _inline(term.right, env, uses, inlining)),
+    )
+
+
+@_inline.register(Branch)
+def _inline_branch(term: Branch, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _inline(term.left, env, uses, inlining)),
+        right=(yield _inline(term.right, env, uses, inlining)),
+        consequent=(yield _inline(term.consequent, env, uses, inlining)),
+        otherwise=(yield _inline(term.otherwise, env, uses, inlining)),
+    )
+
+
+@_inline.register(Load)
+def _inline_load(term: Load, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    return replace(term, base=(yield _inline(term.base, env, uses, inlining)))
+
+
+@_inline.register(Store)
+def _inline_store(term: Store, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    return replace(
+        term,
+        base=(yield _inline(term.base, env, uses, inlining)),
+        value=(yield _inline(term.value, env, uses, inlining)),
+    )
+
+
+@_inline.register(Begin)
+def _inline_begin(term: Begin, env: Inlinable, uses: Counter[Identifier], inlining: _Inlining) -> Step[Term]:
+    return replace(
+        term,
+        effects=(yield sequence(_inline(effect, env, uses, inlining) for effect in term.effects)),
+        value=(yield _inline(term.value, env, uses, inlining)),
+    )
+
+
+# a copy of a term with a fresh name for each of its binders, so that names stay unique once it is inlined
+_copy = Dispatch[Term]()
+
+
+def _rename(names: Iterable[Identifier], fresh: Fresh) -> dict[Identifier, Identifier]:
+    # a fresh name from the family uniqify drew the old one from
+    return {name: fresh(name.rstrip("0123456789") or name) for name in names}
+
+
+@_copy.register(Let)
+def _copy_let(term: Let, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    local = _rename((name for name, _ in term.bindings), fresh)
+    values = yield sequence(_copy(value, renaming, fresh) for _, value in term.bindings)
+
+    with renaming.bind(local.items()):
+        body = yield _copy(term.body, renaming, fresh)
+
+    return construct(Let, bindings=[(local[name], value) for (name, _), value in zip(term.bindings, values)], body=body)
+
+
+@_copy.register(Reference)
+def _copy_reference(term: Reference, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(term, name=renaming.get(term.name, term.name))
+
+
+@_copy.register(Abstract)
+def _copy_abstract(term: Abstract, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    local = _rename(term.parameters, fresh)
+
+    with renaming.bind(local.items()):
+        body = yield _copy(term.body, renaming, fresh)
+
+    return construct(Abstract, parameters=[local[parameter] for parameter in term.parameters], body=body)
+
+
+@_copy.register(Apply)
+def _copy_apply(term: Apply, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        target=(yield _copy(term.target, renaming, fresh)),
+        arguments=(yield sequence(_copy(argument, renaming, fresh) for argument in term.arguments)),
+    )
+
+
+@_copy.register(Immediate, Allocate)
+def _copy_leaf(term: Immediate | Allocate, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return term
+
+
+@_copy.register(Primitive)
+def _copy_primitive(term: Primitive, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _copy(term.left, renaming, fresh)),
+        right=(yield _copy(term.right, renaming, fresh)),
+    )
+
+
+@_copy.register(Branch)
+def _copy_branch(term: Branch, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _copy(term.left, renaming, fresh)),
+        right=(yield _copy(term.right, renaming, fresh)),
+        consequent=(yield _copy(term.consequent, renaming, fresh)),
+        otherwise=(yield _copy(term.otherwise, renaming, fresh)),
+    )
+
+
+@_copy.register(Load)
+def _copy_load(term: Load, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(term, base=(yield _copy(term.base, renaming, fresh)))
+
+
+@_copy.register(Store)
+def _copy_store(term: Store, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        base=(yield _copy(term.base, renaming, fresh)),
+        value=(yield _copy(term.value, renaming, fresh)),
+    )
+
+
+@_copy.register(Begin)
+def _copy_begin(term: Begin, renaming: Scope[Identifier, Identifier], fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        effects=(yield sequence(_copy(effect, renaming, fresh) for effect in term.effects)),
+        value=(yield _copy(term.value, renaming, fresh)),
+    )
+
+
+def inline_term(
+    term: Term,
+    uses: Counter[Identifier],
+    fresh: Fresh,
+    costs: CostModel = CostModel(),
+) -> Term:
+    # one round, without the optimizer; uses counts the references to each name in term
+    return run(_inline(term, Scope[Identifier, tuple[Abstract, int] | None](), uses, _Inlining(fresh, costs)))
+
+
+def inline_program(
+    program: Program,
+    fresh: Fresh,
+    costs: CostModel = CostModel(),
+) -> Program:
+    for _ in range(costs.rounds):
+        match program:
+            case Program(body=body):  # pragma: no branch
+                inlined = replace(program, body=inline_term(body, Counter(_references(body)), fresh, costs))
+
+        if inlined is program:
+            break
+        program = optimize_program(inlined)
     return program
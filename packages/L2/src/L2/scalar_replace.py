@@ -0,0 +1,280 @@
+from collections import Counter
+from collections.abc import Callable
+from typing import NamedTuple
+
+from util.construct import construct, replace
+from util.traverse import Dispatch, Step, run, sequence
+
+from .optimize import optimize_program
+from .syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
+    Identifier,
+    Immediate,
+    Let,
+    Load,
+    Primitive,
+    Program,
+    Reference,
+    Store,
+    Term,
+)
+
+# Store-to-load forwarding and scalar replacement, at -O3. A cell is a Let-bound Allocate that doesn't escape: it is
+# only ever the base of a Load or Store, at an index within it, and it is never stored to from inside an Abstract in
+# its scope, so its slots change only as the Let body runs. A traversal in evaluation order tracks what each slot of a
+# cell holds, as an Immediate or a Reference: a Store of either records it, and a Load of a slot whose contents are
+# known becomes them. A Store of any other value in a Begin is split, binding the value to a fresh name first, so that
+# the name can be recorded. A Branch keeps what both arms agree on, and an Abstract, which may run any time later,
+# only sees the slots that are stored once, and so can't change again. A cell that has no Loads left is removed along
+# with its Stores, which leaves the values stored to Let bindings that the optimizer cleans up. Rounds repeat until
+# nothing changes. A cell that holds a recursive function is loaded inside the function, before it is stored, so it
+# stays; the calls outside it are forwarded.
+
+type Fresh = Callable[[str], str]
+
+type Slot = tuple[Identifier, int]
+
+# the contents of the slots known at a point of the traversal
+type Known = dict[Slot, Term]
+
+
+class _Cells(NamedTuple):
+    # the cells in the program, the slots of theirs stored exactly once and the cells that are never loaded
+    cells: set[Identifier]
+    single: set[Slot]
+    unloaded: set[Identifier]
+
+
+class _Replacing(NamedTuple):
+    cells: _Cells
+    fresh: Fresh
+    # the names whose scope has been left, which a Load can no longer become
+    gone: set[Identifier]
+
+
+def _cells(term: Term) -> _Cells:
+    # the number of Abstracts each node is nested in, against that of the Let binding each Allocate
+    bound: dict[Identifier, tuple[int, int]] = {}
+    references = Counter[Identifier]()
+    bases = Counter[Identifier]()
+    loads = Counter[Identifier]()
+    stores = Counter[Slot]()
+    # the cell, index and, for a Store, depth of each access
+    accesses: list[tuple[Identifier, int, int | None]] = []
+
+    stack: list[tuple[Term, int]] = [(term, 0)]
+    while stack:
+        term, depth = stack.pop()
+        match term:
+            case Let(bindings=bindings, body=body):
+                for name, value in bindings:
+                    if isinstance(value, Allocate):
+                        bound[name] = (value.count, depth)
+                    stack.append((value, depth))
+                stack.append((body, depth))
+
+            case Reference(name=name):
+                references[name] += 1
+
+            case Abstract(body=body):
+                stack.append((body, depth + 1))
+
+            case Apply(target=target, arguments=arguments):
+                stack.append((target, depth))
+                stack.extend((argument, depth) for argument in arguments)
+
+            case Primitive(left=left, right=right):
+                stack.extend([(left, depth), (right, depth)])
+
+            case Branch(left=left, right=right, consequent=consequent, otherwise=otherwise):
+                stack.extend([(left, depth), (right, depth), (consequent, depth), (otherwise, depth)])
+
+            case Load(base=base, index=index):
+                if isinstance(base, Reference):
+                    bases[base.name] += 1
+                    loads[base.name] += 1
+                    accesses.append((base.name, index, None))
+                stack.append((base, depth))
+
+            case Store(base=base, index=index, value=value):
+                if isinstance(base, Reference):
+                    bases[base.name] += 1
+                    stores[base.name, index] += 1
+                    accesses.append((base.name, index, depth))
+                stack.extend([(base, depth), (value, depth)])
+
+            case Begin(effects=effects, value=value):
+                stack.extend((effect, depth) for effect in effects)
+                stack.append((value, depth))
+
+            case _:
+                pass
+
+    escaping: set[Identifier] = set()
+    for name, index, depth in accesses:
+        if name in bound:
+            count, binding = bound[name]
+            # a Load may be anywhere, a Store only outside the Abstracts in the cell's scope
+            if index >= count or depth not in (None, binding):
+                escaping.add(name)
+
+    cells = {name for name in bound if references[name] == bases[name] and name not in escaping}
+    return _Cells(
+        cells,
+        {slot for slot, count in stores.items() if count == 1 and slot[0] in cells},
+        {name for name in cells if not loads[name]},
+    )
+
+
+_term = Dispatch[Term]()
+
+
+@_term.register(Let)
+def _let(term: Let, known: Known, replacing: _Replacing) -> Step[Term]:
+    values = yield sequence(_term(value, known, replacing) for _, value in term.bindings)
+    body = yield _term(term.body, known, replacing)
+    replacing.gone.update(name for name, _ in term.bindings)
+
+    bindings = [
+        (name, value) for (name, _), value in zip(term.bindings, values) if name not in replacing.cells.unloaded
+    ]
+    if not bindings:
+        return body
+    return replace(term, bindings=bindings, body=body)
+
+
+@_term.register(Reference, Immediate, Allocate)
+def _leaf(term: Reference | Immediate | Allocate, known: Known, replacing: _Replacing) -> Step[Term]:
+    return term
+
+
+@_term.register(Abstract)
+def _abstract(term: Abstract, known: Known, replacing: _Replacing) -> Step[Term]:
+    # the slots that are stored once keep what they hold now by the time the body runs
+    settled = {slot: value for slot, value in known.items() if slot in replacing.cells.single}
+    return replace(term, body=(yield _term(term.body, settled, replacing)))
+
+
+@_term.register(Apply)
+def _apply(term: Apply, known: Known, replacing: _Replacing) -> Step[Term]:
+    return replace(
+        term,
+        target=(yield _term(term.target, known, replacing)),
+        arguments=(yield sequence(_term(argument, known, replacing) for argument in term.arguments)),
+    )
+
+
+@_term.register(Primitive)
+def _primitive(term: Primitive, known: Known, replacing: _Replacing) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _term(term.left, known, replacing)),
+        right=(yield _term(term.right, known, replacing)),
+    )
+
+
+@_term.register(Branch)
+def _branch(term: Branch, known: Known, replacing: _Replacing) -> Step[Term]:
+    left = yield _term(term.left, known, replacing)
+    right = yield _term(term.right, known, replacing)
+    taken = dict(known)
+    consequent = yield _term(term.consequent, taken, replacing)
+    otherwise = yield _term(term.otherwise, known, replacing)
+
+    for slot, value in list(known.items()):
+        if taken.get(slot) != value:
+            del known[slot]
+
+    return replace(term, left=left, right=right, consequent=consequent, otherwise=otherwise)
+
+
+@_term.register(Load)
+def _load(term: Load, known: Known, replacing: _Replacing) -> Step[Term]:
+    base = yield _term(term.base, known, replacing)
+    if isinstance(base, Reference) and (value := known.get((base.name, term.index))) is not None:
+        if not isinstance(value, Reference) or value.name not in replacing.gone:
+            return value
+    return replace(term, base=base)
+
+
+@_term.register(Store)
+def _store(term: Store, known: Known, replacing: _Replacing) -> Step[Term]:
+    base = yield _term(term.base, known, replacing)
+    value = yield _term(term.value, known, replacing)
+
+    if not isinstance(base, Reference) or base.name not in replacing.cells.cells:
+        return replace(term, base=base, value=value)
+
+    slot = (base.name, term.index)
+    if isinstance(value, Reference | Immediate):
+        known[slot] = value
+    else:
+        known.pop(slot, None)
+
+    if base.name in replacing.cells.unloaded:
+        # the value a Store evaluates to
+        return construct(Begin, effects=[value], value=construct(Immediate, value=0))
+    return replace(term, base=base, value=value)
+
+
+def _split(term: Begin, replacing: _Replacing) -> Term | None:
+    # the Begin with its first Store of a value that can't be recorded bound to a fresh name, if it has one
+    for index, effect in enumerate(term.effects):
+        match effect:
+            case Store(base=Reference(name=cell), value=value) if (
+                cell in replacing.cells.cells
+                and cell not in replacing.cells.unloaded
+                and not isinstance(value, Reference | Immediate)
+            ):
+                name = replacing.fresh(cell.rstrip("0123456789") or cell)
+                rest = construct(
+                    Begin,
+                    effects=[replace(effect, value=construct(Reference, name=name)), *term.effects[index + 1 :]],
+                    value=term.value,
+                )
+                let = construct(Let, bindings=[(name, value)], body=rest)
+                if index == 0:
+                    return let
+                return construct(Begin, effects=term.effects[:index], value=let)
+
+            case _:
+                pass
+    return None
+
+
+@_term.register(Begin)
+def _begin(term: Begin, known: Known, replacing: _Replacing) -> Step[Term]:
+    if (split := _split(term, replacing)) is not None:
+        return (yield _term(split, known, replacing))
+
+    return replace(
+        term,
+        effects=(yield sequence(_term(effect, known, replacing) for effect in term.effects)),
+        value=(yield _term(term.value, known, replacing)),
+    )
+
+
+def scalar_replace_term(
+    term: Term,
+    fresh: Fresh,
+) -> Term:
+    # one round, without the optimizer
+    return run(_term(term, {}, _Replacing(_cells(term), fresh, set())))
+
+
+def scalar_replace_program(
+    program: Program,
+    fresh: Fresh,
+) -> Program:
+    while True:
+        match program:
+            case Program(body=body):  # pragma: no branch
+                replaced = replace(program, body=scalar_replace_term(body, fresh))
+
+        if replaced is program:
+            return program
+        program = optimize_program(replaced)
@@ -1,7 +1,7 @@
 import ast
-from functools import partial
 
 from util.encode import encode
+from util.traverse import Dispatch, Step, run, sequence
 
 from .syntax import (
     Abstract,
@@ -20,113 +20,138 @@ from .syntax import (
 )
 
 
-def to_ast_term(
-    term: Term,
-) -> ast.expr:
-    _term = partial(to_ast_term)
-
-    match term:
-        case Let(bindings=bindings, body=body):
-            return ast.Subscript(
-                value=ast.Tuple(
-                    elts=[
-                        *[
-                            ast.NamedExpr(target=ast.Name(id=encode(name), ctx=ast.Store()), value=_term(value))
-                            for name, value in bindings
-                        ],
-                        _term(body),
-                    ],
-                    ctx=ast.Load(),
-                ),
-                slice=ast.Constant(-1),
-                ctx=ast.Load(),
-            )
+_term = Dispatch[ast.expr]()
 
-        case Reference(name=name):
-            return ast.Name(id=encode(name), ctx=ast.Load())
 
-        case Abstract(parameters=parameters, body=body):
-            return ast.Lambda(
-                args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in parameters]),
-                body=_term(body),
-            )
+@_term.register(Let)
+def _let(term: Let) -> Step[ast.expr]:
+    values = yield sequence(_term(value) for _, value in term.bindings)
+    return ast.Subscript(
+        value=ast.Tuple(
+            elts=[
+                *[
+                    ast.NamedExpr(target=ast.Name(id=encode(name), ctx=ast.Store()), value=value)
+                    for (name, _), value in zip(term.bindings, values)
+                ],
+                (yield _term(term.body)),
+            ],
+            ctx=ast.Load(),
+        ),
+        slice=ast.Constant(-1),
+        ctx=ast.Load(),
+    )
 
-        case Apply(target=target, arguments=arguments):
-            return ast.Call(
-                func=_term(target),
-                args=[_term(argument) for argument in arguments],
-            )
 
-        case Immediate(value=value):
-            return ast.Constant(value=value)
+@_term.register(Reference)
+def _reference(term: Reference) -> Step[ast.expr]:
+    return ast.Name(id=encode(term.name), ctx=ast.Load())
 
-        case Primitive(operator=operator, left=left, right=right):
-            match operator:
-                case "+":
-                    op = ast.Add()
 
-                case "-":
-                    op = ast.Sub()
+@_term.register(Abstract)
+def _abstract(term: Abstract) -> Step[ast.expr]:
+    return ast.Lambda(
+        args=ast.arguments(args=[ast.arg(arg=parameter) for parameter in term.parameters]),
+        body=(yield _term(term.body)),
+    )
 
-                case "*":  # pragma: no branch
-                    op = ast.Mult()
 
-            return ast.BinOp(left=_term(left), op=op, right=_term(right))
+@_term.register(Apply)
+def _apply(term: Apply) -> Step[ast.expr]:
+    return ast.Call(
+        func=(yield _term(term.target)),
+        args=(yield sequence(_term(argument) for argument in term.arguments)),
+    )
 
-        case Branch(operator=operator, left=left, right=right, consequent=consequent, otherwise=otherwise):
-            match operator:
-                case "<":
-                    op = ast.Lt()
 
-                case "==":  # pragma: no branch
-                    op = ast.Eq()
+@_term.register(Immediate)
+def _immediate(term: Immediate) -> Step[ast.expr]:
+    return ast.Constant(value=term.value)
 
-            return ast.IfExp(
-                test=ast.Compare(left=_term(left), ops=[op], comparators=[_term(right)]),
-                body=_term(consequent),
-                orelse=_term(otherwise),
-            )
 
-        case Allocate(count=count):
-            return ast.List(
-                elts=[ast.Constant(None) for _ in range(count)],
-                ctx=ast.Load(),
-            )
+@_term.register(Primitive)
+def _primitive(term: Primitive) -> Step[ast.expr]:
+    match term.operator:
+        case "+":
+            op = ast.Add()
 
-        case Load(base=base, index=index):
-            return ast.Call(
-                func=ast.Attribute(value=_term(base), attr="__getitem__", ctx=ast.Load()),
-                args=[ast.Constant(value=index)],
-            )
+        case "-":
+            op = ast.Sub()
 
-        case Store(base=base, index=index, value=value):
-            return ast.Subscript(
-                value=ast.Tuple(
-                    elts=[
-                        ast.Call(
-                            func=ast.Attribute(value=_term(base), attr="__setitem__", ctx=ast.Load()),
-                            args=[ast.Constant(value=index), _term(value)],
-                        ),
-                        ast.Constant(value=0),
-                    ],
-                    ctx=ast.Load(),
-                ),
-                slice=ast.Constant(-1),
-                ctx=ast.Load(),
-            )
+        case "*":  # pragma: no branch
+            op = ast.Mult()
+
+    return ast.BinOp(left=(yield _term(term.left)), op=op, right=(yield _term(term.right)))
 
-        case Begin(effects=effects, value=value):  # pragma: no branch
-            return ast.Subscript(
-                value=ast.Tuple(
-                    elts=[
-                        *[_term(effect) for effect in effects],
-                        _term(value),
-                    ],
-                    ctx=ast.Load(),
+
+@_term.register(Branch)
+def _branch(term: Branch) -> Step[ast.expr]:
+    match term.operator:
+        case "<":
+            op = ast.Lt()
+
+        case "==":  # pragma: no branch
+            op = ast.Eq()
+
+    return ast.IfExp(
+        test=ast.Compare(left=(yield _term(term.left)), ops=[op], comparators=[(yield _term(term.right))]),
+        body=(yield _term(term.consequent)),
+        orelse=(yield _term(term.otherwise)),
+    )
+
+
+@_term.register(Allocate)
+def _allocate(term: Allocate) -> Step[ast.expr]:
+    return ast.List(
+        elts=[ast.Constant(None) for _ in range(term.count)],
+        ctx=ast.Load(),
+    )
+
+
+@_term.register(Load)
+def _load(term: Load) -> Step[ast.expr]:
+    return ast.Call(
+        func=ast.Attribute(value=(yield _term(term.base)), attr="__getitem__", ctx=ast.Load()),
+        args=[ast.Constant(value=term.index)],
+    )
+
+
+@_term.register(Store)
+def _store(term: Store) -> Step[ast.expr]:
+    return ast.Subscript(
+        value=ast.Tuple(
+            elts=[
+                ast.Call(
+                    func=ast.Attribute(value=(yield _term(term.base)), attr="__setitem__", ctx=ast.Load()),
+                    args=[ast.Constant(value=term.index), (yield _term(term.value))],
                 ),
-                slice=ast.Constant(-1),
-                ctx=ast.Load(),
-            )
+                ast.Constant(value=0),
+            ],
+            ctx=ast.Load(),
+        ),
+        slice=ast.Constant(-1),
+        ctx=ast.Load(),
+    )
+
+
+@_term.register(Begin)
+def _begin(term: Begin) -> Step[ast.expr]:
+    return ast.Subscript(
+        value=ast.Tuple(
+            elts=[
+                *(yield sequence(_term(effect) for effect in term.effects)),
+                (yield _term(term.value)),
+            ],
+            ctx=ast.Load(),
+        ),
+        slice=ast.Constant(-1),
+        ctx=ast.Load(),
+    )
+
+
+def to_ast_term(
+    term: Term,
+) -> ast.expr:
+    return run(_term(term))
 
 
 def to_ast_program(
@@ -1,6 +1,6 @@
 from L1 import syntax as L1
 from L2 import syntax as L2
-from L2.cps_convert import cps_convert_program, cps_convert_term
+from L2.cps_convert import cps_convert_program, cps_convert_term, cps_convert_terms
 from util.sequential_name_generator import SequentialNameGenerator
 
 
@@ -245,3 +245,34 @@ def test_cps_convert_program():
     )
 
     assert actual == expected
+
+
+def test_cps_convert_terms():
+    terms = [L2.Reference(name="x"), L2.Immediate(value=1)]
+
+    fresh = SequentialNameGenerator()
+    actual = cps_convert_terms(terms, lambda names: L1.Apply(target="f", arguments=[*names]), fresh)
+
+    expected = L1.Immediate(
+        destination="t0",
+        value=1,
+        then=L1.Apply(target="f", arguments=["x", "t0"]),
+    )
+
+    assert actual == expected
+
+
+def test_cps_convert_program_deep():
+    body: L2.Term = L2.Reference(name="x")
+    for _ in range(10_000):
+        body = L2.Primitive(operator="+", left=body, right=L2.Immediate(value=1))
+
+    fresh = SequentialNameGenerator()
+    actual = cps_convert_program(L2.Program(parameters=["x"], body=body), fresh)
+
+    statement = actual.body
+    count = 0
+    while not isinstance(statement, L1.Halt):
+        statement, count = statement.then, count + 1
+
+    assert count == 20_000
@@ -0,0 +1,90 @@
+import ast
+
+from L1.syntax import Identifier
+from L1.to_python import to_ast_program
+from L2 import syntax as L2
+from L2.cps_convert import cps_convert_program
+from L2.cps_to_python import Block, cps_to_python_program, cps_to_python_term
+from util.sequential_name_generator import SequentialNameGenerator
+
+
+def separately(program: L2.Program) -> str:
+    return to_ast_program(cps_convert_program(program, SequentialNameGenerator()))
+
+
+def k(value: Identifier, block: Block) -> None:
+    block.append(ast.Return(value=ast.Name(id=value, ctx=ast.Load())))
+
+
+def test_cps_to_python_term():
+    term = L2.Apply(target=L2.Reference(name="f"), arguments=[L2.Immediate(value=1)])
+
+    actual = cps_to_python_term(term, k, SequentialNameGenerator())
+
+    expected = "\n".join(
+        [
+            "def k0(t0):",
+            "    return t0",
+            "t1 = 1",
+            "return f(t1, k0)",
+        ]
+    )
+
+    assert ast.unparse(ast.fix_missing_locations(ast.Module(body=actual))) == expected
+
+
+def test_cps_to_python_program_every_term():
+    program = L2.Program(
+        parameters=["x"],
+        body=L2.Let(
+            bindings=[
+                (
+                    "f",
+                    L2.Abstract(
+                        parameters=["y"],
+                        body=L2.Primitive(operator="*", left=L2.Reference(name="y"), right=L2.Immediate(value=2)),
+                    ),
+                ),
+                ("cell", L2.Allocate(count=1)),
+            ],
+            body=L2.Begin(
+                effects=[L2.Store(base=L2.Reference(name="cell"), index=0, value=L2.Reference(name="x"))],
+                value=L2.Branch(
+                    operator="<",
+                    left=L2.Load(base=L2.Reference(name="cell"), index=0),
+                    right=L2.Immediate(value=0),
+                    consequent=L2.Primitive(operator="-", left=L2.Immediate(value=0), right=L2.Reference(name="x")),
+                    otherwise=L2.Apply(
+                        target=L2.Reference(name="f"),
+                        arguments=[
+                            L2.Primitive(operator="+", left=L2.Reference(name="x"), right=L2.Immediate(value=1))
+                        ],
+                    ),
+                ),
+            ),
+        ),
+    )
+
+    module = cps_to_python_program(program, SequentialNameGenerator())
+
+    assert module == separately(program)
+    for argument, expected in [(-3, 3), (3, 8)]:
+        namespace: dict[str, object] = {}
+        exec(module, namespace)
+        assert namespace["l1"](argument) == expected  # pyright: ignore[reportCallIssue]
+
+
+def test_cps_to_python_program_deep():
+    body: L2.Term = L2.Reference(name="x")
+    for _ in range(10_000):
+        body = L2.Branch(
+            operator="==",
+            left=L2.Primitive(operator="+", left=body, right=L2.Immediate(value=1)),
+            right=L2.Immediate(value=0),
+            consequent=L2.Immediate(value=0),
+            otherwise=L2.Reference(name="x"),
+        )
+
+    module = cps_to_python_program(L2.Program(parameters=["x"], body=body), SequentialNameGenerator())
+
+    assert module.count("if t") == 10_000
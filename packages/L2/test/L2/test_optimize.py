@@ -1,9 +1,23 @@
-from L2.optimize import optimize_program
+from collections import Counter
+
+import pytest
+from L2.optimize import CostModel, inline_program, inline_term, optimize_program, optimize_term
 from L2.syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
     Immediate,
+    Let,
+    Load,
     Primitive,
     Program,
+    Reference,
+    Store,
+    Term,
 )
+from util.sequential_name_generator import SequentialNameGenerator
 
 
 def test_optimize_program():
@@ -24,3 +38,462 @@ def test_optimize_program():
     actual = optimize_program(program)
 
     assert actual == expected
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    [
+        pytest.param(
+            Primitive(operator="-", left=Immediate(value=1), right=Immediate(value=3)),
+            Immediate(value=-2),
+            id="subtract",
+        ),
+        pytest.param(
+            Primitive(operator="*", left=Immediate(value=6), right=Immediate(value=7)),
+            Immediate(value=42),
+            id="multiply",
+        ),
+        pytest.param(
+            Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1)),
+            Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1)),
+            id="primitive-unknown",
+        ),
+        pytest.param(
+            Branch(
+                operator="<",
+                left=Immediate(value=1),
+                right=Immediate(value=2),
+                consequent=Reference(name="x"),
+                otherwise=Reference(name="y"),
+            ),
+            Reference(name="x"),
+            id="less-taken",
+        ),
+        pytest.param(
+            Branch(
+                operator="<",
+                left=Immediate(value=2),
+                right=Immediate(value=1),
+                consequent=Reference(name="x"),
+                otherwise=Reference(name="y"),
+            ),
+            Reference(name="y"),
+            id="less-not-taken",
+        ),
+        pytest.param(
+            Branch(
+                operator="==",
+                left=Immediate(value=1),
+                right=Immediate(value=1),
+                consequent=Reference(name="x"),
+                otherwise=Reference(name="y"),
+            ),
+            Reference(name="x"),
+            id="equal-taken",
+        ),
+        pytest.param(
+            Branch(
+                operator="==",
+                left=Immediate(value=1),
+                right=Immediate(value=2),
+                consequent=Reference(name="x"),
+                otherwise=Reference(name="y"),
+            ),
+            Reference(name="y"),
+            id="equal-not-taken",
+        ),
+        pytest.param(
+            Let(
+                bindings=[("a", Immediate(value=2)), ("b", Reference(name="x"))],
+                body=Primitive(operator="*", left=Reference(name="a"), right=Reference(name="b")),
+            ),
+            Primitive(operator="*", left=Immediate(value=2), right=Reference(name="x")),
+            id="propagate",
+        ),
+        pytest.param(
+            Let(
+                bindings=[("a", Abstract(parameters=["y"], body=Reference(name="y"))), ("b", Allocate(count=1))],
+                body=Reference(name="x"),
+            ),
+            Reference(name="x"),
+            id="unused-pure",
+        ),
+        pytest.param(
+            Let(
+                bindings=[
+                    ("a", Apply(target=Reference(name="f"), arguments=[])),
+                    ("b", Load(base=Reference(name="c"), index=0)),
+                ],
+                body=Reference(name="x"),
+            ),
+            Let(bindings=[("a", Apply(target=Reference(name="f"), arguments=[]))], body=Reference(name="x")),
+            id="unused-effect",
+        ),
+        pytest.param(
+            Begin(
+                effects=[
+                    Reference(name="x"),
+                    Store(base=Reference(name="c"), index=0, value=Immediate(value=1)),
+                    Primitive(operator="+", left=Reference(name="x"), right=Reference(name="y")),
+                ],
+                value=Reference(name="y"),
+            ),
+            Begin(
+                effects=[Store(base=Reference(name="c"), index=0, value=Immediate(value=1))], value=Reference(name="y")
+            ),
+            id="begin",
+        ),
+        pytest.param(
+            Begin(effects=[Immediate(value=0)], value=Load(base=Reference(name="c"), index=0)),
+            Load(base=Reference(name="c"), index=0),
+            id="begin-pure",
+        ),
+        pytest.param(
+            Let(
+                bindings=[("a", Immediate(value=1))],
+                body=Abstract(
+                    parameters=["x"],
+                    body=Branch(
+                        operator="<",
+                        left=Reference(name="x"),
+                        right=Reference(name="a"),
+                        consequent=Reference(name="a"),
+                        otherwise=Reference(name="x"),
+                    ),
+                ),
+            ),
+            Abstract(
+                parameters=["x"],
+                body=Branch(
+                    operator="<",
+                    left=Reference(name="x"),
+                    right=Immediate(value=1),
+                    consequent=Immediate(value=1),
+                    otherwise=Reference(name="x"),
+                ),
+            ),
+            id="abstract",
+        ),
+    ],
+)
+def test_optimize_program_terms(term: Term, expected: Term):
+    assert optimize_program(Program(parameters=["x", "y", "c", "f"], body=term)).body == expected
+
+
+def test_optimize_program_shadowing():
+    # a parameter hides the constant of the same name; references are counted by name, so the binding stays
+    term = Let(
+        bindings=[("a", Immediate(value=1))],
+        body=Apply(
+            target=Abstract(parameters=["a"], body=Reference(name="a")),
+            arguments=[Reference(name="a")],
+        ),
+    )
+
+    expected = Let(
+        bindings=[("a", Immediate(value=1))],
+        body=Apply(
+            target=Abstract(parameters=["a"], body=Reference(name="a")),
+            arguments=[Immediate(value=1)],
+        ),
+    )
+
+    assert optimize_program(Program(parameters=[], body=term)).body == expected
+
+
+def test_optimize_program_rounds():
+    # the Branch folds once b is known, which leaves a unused; a copy chain goes in one round
+    term = Let(
+        bindings=[("a", Apply(target=Reference(name="f"), arguments=[]))],
+        body=Let(
+            bindings=[("b", Primitive(operator="+", left=Immediate(value=1), right=Immediate(value=2)))],
+            body=Let(
+                bindings=[("c", Reference(name="b"))],
+                body=Let(
+                    bindings=[("d", Reference(name="c"))],
+                    body=Branch(
+                        operator="==",
+                        left=Reference(name="d"),
+                        right=Immediate(value=3),
+                        consequent=Reference(name="x"),
+                        otherwise=Reference(name="a"),
+                    ),
+                ),
+            ),
+        ),
+    )
+
+    expected = Let(bindings=[("a", Apply(target=Reference(name="f"), arguments=[]))], body=Reference(name="x"))
+
+    assert optimize_program(Program(parameters=["x", "f"], body=term)).body == expected
+
+
+def test_optimize_term_uses():
+    # a dropped value gives up its references, so a binding used only there goes too
+    term = Let(
+        bindings=[("a", Allocate(count=1))],
+        body=Let(bindings=[("b", Load(base=Reference(name="a"), index=0))], body=Reference(name="x")),
+    )
+
+    uses = Counter(["a", "x"])
+
+    assert optimize_term(term, uses) == Reference(name="x")
+    assert +uses == Counter(["x"])
+
+
+def test_optimize_program_unchanged():
+    program = Program(
+        parameters=["x"],
+        body=Begin(
+            effects=[Store(base=Reference(name="x"), index=0, value=Immediate(value=1))],
+            value=Apply(target=Reference(name="x"), arguments=[Load(base=Reference(name="x"), index=0)]),
+        ),
+    )
+
+    assert optimize_program(program) is program
+
+
+def test_optimize_program_deep():
+    body: Term = Reference(name="x")
+    for index in range(10_000):
+        body = Let(
+            bindings=[(f"a{index}", Immediate(value=index))],
+            body=Primitive(operator="+", left=Reference(name=f"a{index}"), right=body),
+        )
+
+    actual = optimize_program(Program(parameters=["x"], body=body))
+
+    depth = 0
+    term = actual.body
+    while isinstance(term, Primitive):
+        assert term.left == Immediate(value=9_999 - depth)
+        term, depth = term.right, depth + 1
+
+    assert (term, depth) == (Reference(name="x"), 10_000)
+
+
+def increment(name: str) -> Abstract:
+    return Abstract(
+        parameters=[name], body=Primitive(operator="+", left=Reference(name=name), right=Immediate(value=1))
+    )
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    [
+        pytest.param(
+            Apply(target=increment("a"), arguments=[Immediate(value=2)]),
+            Immediate(value=3),
+            id="beta",
+        ),
+        pytest.param(
+            Apply(target=Abstract(parameters=[], body=Reference(name="x")), arguments=[]),
+            Reference(name="x"),
+            id="beta-nullary",
+        ),
+        pytest.param(
+            Let(
+                bindings=[("f", increment("a"))],
+                body=Primitive(
+                    operator="*",
+                    left=Apply(target=Reference(name="f"), arguments=[Reference(name="x")]),
+                    right=Apply(target=Reference(name="f"), arguments=[Reference(name="y")]),
+                ),
+            ),
+            Primitive(
+                operator="*",
+                left=Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1)),
+                right=Primitive(operator="+", left=Reference(name="y"), right=Immediate(value=1)),
+            ),
+            id="copy",
+        ),
+        pytest.param(
+            # make_adder from add_complex
+            Let(
+                bindings=[
+                    (
+                        "make",
+                        Abstract(
+                            parameters=["a"],
+                            body=Abstract(
+                                parameters=["b"],
+                                body=Primitive(operator="+", left=Reference(name="a"), right=Reference(name="b")),
+                            ),
+                        ),
+                    )
+                ],
+                body=Let(
+                    bindings=[("adder", Apply(target=Reference(name="make"), arguments=[Reference(name="x")]))],
+                    body=Apply(target=Reference(name="adder"), arguments=[Reference(name="y")]),
+                ),
+            ),
+            Primitive(operator="+", left=Reference(name="x"), right=Reference(name="y")),
+            id="curried",
+        ),
+        pytest.param(
+            # the arguments are still evaluated, in order, before the body
+            Let(
+                bindings=[
+                    (
+                        "f",
+                        Abstract(
+                            parameters=["a", "b"],
+                            body=Begin(
+                                effects=[Store(base=Reference(name="c"), index=0, value=Reference(name="a"))],
+                                value=Reference(name="b"),
+                            ),
+                        ),
+                    )
+                ],
+                body=Apply(
+                    target=Reference(name="f"),
+                    arguments=[
+                        Apply(target=Reference(name="g"), arguments=[]),
+                        Load(base=Reference(name="c"), index=0),
+                    ],
+                ),
+            ),
+            Let(
+                bindings=[
+                    ("a", Apply(target=Reference(name="g"), arguments=[])),
+                    ("b", Load(base=Reference(name="c"), index=0)),
+                ],
+                body=Begin(
+                    effects=[Store(base=Reference(name="c"), index=0, value=Reference(name="a"))],
+                    value=Reference(name="b"),
+                ),
+            ),
+            id="effects",
+        ),
+        pytest.param(
+            Let(
+                bindings=[("f", increment("a"))],
+                body=Apply(target=Reference(name="f"), arguments=[]),
+            ),
+            Let(
+                bindings=[("f", increment("a"))],
+                body=Apply(target=Reference(name="f"), arguments=[]),
+            ),
+            id="arity",
+        ),
+        pytest.param(
+            Let(
+                bindings=[("f", Apply(target=Reference(name="g"), arguments=[]))],
+                body=Apply(target=Reference(name="f"), arguments=[Reference(name="x")]),
+            ),
+            Let(
+                bindings=[("f", Apply(target=Reference(name="g"), arguments=[]))],
+                body=Apply(target=Reference(name="f"), arguments=[Reference(name="x")]),
+            ),
+            id="unknown",
+        ),
+        pytest.param(
+            Abstract(parameters=["f"], body=Apply(target=Reference(name="f"), arguments=[Reference(name="x")])),
+            Abstract(parameters=["f"], body=Apply(target=Reference(name="f"), arguments=[Reference(name="x")])),
+            id="parameter",
+        ),
+    ],
+)
+def test_inline_program_terms(term: Term, expected: Term):
+    program = Program(parameters=["x", "y", "c", "g"], body=term)
+
+    assert inline_program(program, SequentialNameGenerator()).body == expected
+
+
+def test_inline_program_threshold():
+    # a function used twice is copied only while its size is at most the threshold
+    twice = Primitive(
+        operator="+",
+        left=Apply(target=Reference(name="f"), arguments=[Reference(name="x")]),
+        right=Apply(target=Reference(name="f"), arguments=[Reference(name="y")]),
+    )
+    program = Program(parameters=["x", "y"], body=Let(bindings=[("f", increment("a"))], body=twice))
+
+    assert inline_program(program, SequentialNameGenerator(), CostModel(threshold=4)) is program
+    assert inline_program(program, SequentialNameGenerator(), CostModel(threshold=5)).body == Primitive(
+        operator="+",
+        left=Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1)),
+        right=Primitive(operator="+", left=Reference(name="y"), right=Immediate(value=1)),
+    )
+
+
+def test_inline_program_rounds():
+    # applying a function to itself inlines into the same call again, so rounds are capped
+    omega = Abstract(parameters=["x"], body=Apply(target=Reference(name="x"), arguments=[Reference(name="x")]))
+    program = Program(
+        parameters=[],
+        body=Let(bindings=[("f", omega)], body=Apply(target=Reference(name="f"), arguments=[Reference(name="f")])),
+    )
+
+    assert inline_program(program, SequentialNameGenerator(), CostModel(rounds=3)) == program
+
+
+def test_cost_model_size():
+    term = Apply(target=increment("a"), arguments=[Immediate(value=1)])
+
+    assert CostModel().size(term) == 3 + 2 + 4
+    assert CostModel(apply=1, abstract=1, other=0).size(term) == 2
+
+
+def every_kind(x: str, y: str, z: str) -> Term:
+    # a term of every kind, for copying
+    return Let(
+        bindings=[(y, Allocate(count=1))],
+        body=Begin(
+            effects=[Store(base=Reference(name=y), index=0, value=Abstract(parameters=[z], body=Reference(name=z)))],
+            value=Branch(
+                operator="<",
+                left=Load(base=Reference(name=y), index=0),
+                right=Immediate(value=1),
+                consequent=Apply(target=Reference(name="g"), arguments=[Reference(name=x)]),
+                otherwise=Primitive(operator="+", left=Reference(name=x), right=Reference(name="c")),
+            ),
+        ),
+    )
+
+
+def test_inline_term_copy():
+    # every call but the last gets a copy with fresh binders; free names are kept
+    f = Abstract(parameters=["x"], body=every_kind("x", "y", "z"))
+    term = Let(
+        bindings=[("f", f)],
+        body=Begin(
+            effects=[Apply(target=Reference(name="f"), arguments=[Reference(name="a")])],
+            value=Apply(target=Reference(name="f"), arguments=[Reference(name="b")]),
+        ),
+    )
+    uses = Counter(["f", "f"])
+
+    expected = Let(
+        bindings=[("f", f)],
+        body=Begin(
+            effects=[Let(bindings=[("x0", Reference(name="a"))], body=every_kind("x0", "y0", "z0"))],
+            value=Let(bindings=[("x", Reference(name="b"))], body=every_kind("x", "y", "z")),
+        ),
+    )
+
+    assert inline_term(term, uses, SequentialNameGenerator(), CostModel(threshold=100)) == expected
+    assert uses["f"] == 0
+    assert uses["x0"] == 2
+
+
+def test_inline_program_deep():
+    body: Term = Reference(name="x")
+    for index in range(10_000):
+        body = Apply(
+            target=Abstract(
+                parameters=[f"a{index}"],
+                body=Primitive(operator="+", left=Reference(name=f"a{index}"), right=body),
+            ),
+            arguments=[Immediate(value=index)],
+        )
+
+    actual = inline_program(Program(parameters=["x"], body=body), SequentialNameGenerator())
+
+    depth = 0
+    term = actual.body
+    while isinstance(term, Primitive):
+        assert term.left == Immediate(value=9_999 - depth)
+        term, depth = term.right, depth + 1
+
+    assert (term, depth) == (Reference(name="x"), 10_000)
@@ -0,0 +1,288 @@
+import pytest
+from L2.scalar_replace import scalar_replace_program, scalar_replace_term
+from L2.syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
+    Immediate,
+    Let,
+    Load,
+    Primitive,
+    Program,
+    Reference,
+    Store,
+    Term,
+)
+from util.sequential_name_generator import SequentialNameGenerator
+
+
+def cell(body: Term, count: int = 1) -> Let:
+    return Let(bindings=[("c", Allocate(count=count))], body=body)
+
+
+def store(value: Term, index: int = 0) -> Store:
+    return Store(base=Reference(name="c"), index=index, value=value)
+
+
+def load(index: int = 0) -> Load:
+    return Load(base=Reference(name="c"), index=index)
+
+
+def test_scalar_replace_program():
+    program = Program(
+        parameters=["x"],
+        body=cell(
+            Begin(
+                effects=[store(Reference(name="x")), store(Immediate(value=2), 1)],
+                value=Primitive(operator="*", left=load(), right=load(1)),
+            ),
+            count=2,
+        ),
+    )
+
+    expected = Program(
+        parameters=["x"],
+        body=Primitive(operator="*", left=Reference(name="x"), right=Immediate(value=2)),
+    )
+
+    assert scalar_replace_program(program, SequentialNameGenerator()) == expected
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    [
+        pytest.param(
+            cell(Begin(effects=[store(Apply(target=Reference(name="g"), arguments=[]))], value=load())),
+            Let(bindings=[("c0", Apply(target=Reference(name="g"), arguments=[]))], body=Reference(name="c0")),
+            id="split",
+        ),
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[
+                        Apply(target=Reference(name="g"), arguments=[]),
+                        store(Primitive(operator="+", left=Reference(name="x"), right=Reference(name="y"))),
+                    ],
+                    value=Primitive(operator="*", left=load(), right=load()),
+                )
+            ),
+            Begin(
+                effects=[Apply(target=Reference(name="g"), arguments=[])],
+                value=Let(
+                    bindings=[("c0", Primitive(operator="+", left=Reference(name="x"), right=Reference(name="y")))],
+                    body=Primitive(operator="*", left=Reference(name="c0"), right=Reference(name="c0")),
+                ),
+            ),
+            id="split-later",
+        ),
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[
+                        Branch(
+                            operator="<",
+                            left=Reference(name="x"),
+                            right=Reference(name="y"),
+                            consequent=store(Immediate(value=1)),
+                            otherwise=store(Immediate(value=1)),
+                        )
+                    ],
+                    value=load(),
+                )
+            ),
+            Immediate(value=1),
+            id="branch-agrees",
+        ),
+        pytest.param(
+            cell(Begin(effects=[store(Reference(name="x"))], value=Abstract(parameters=["a"], body=load()))),
+            Abstract(parameters=["a"], body=Reference(name="x")),
+            id="abstract-stored-once",
+        ),
+        pytest.param(
+            # fact.l2: the function loads itself before it is stored, so only the call outside it is forwarded
+            cell(
+                Begin(
+                    effects=[
+                        store(Abstract(parameters=["n"], body=Apply(target=load(), arguments=[Reference(name="n")])))
+                    ],
+                    value=Apply(target=load(), arguments=[Reference(name="x")]),
+                )
+            ),
+            cell(
+                Let(
+                    bindings=[
+                        ("c0", Abstract(parameters=["n"], body=Apply(target=load(), arguments=[Reference(name="n")])))
+                    ],
+                    body=Begin(
+                        effects=[store(Reference(name="c0"))],
+                        value=Apply(target=Reference(name="c0"), arguments=[Reference(name="x")]),
+                    ),
+                )
+            ),
+            id="recursive",
+        ),
+        pytest.param(
+            # the first Load reads the cell before it is stored
+            cell(
+                Primitive(
+                    operator="+",
+                    left=load(),
+                    right=Begin(effects=[store(Immediate(value=1))], value=load()),
+                )
+            ),
+            cell(
+                Primitive(
+                    operator="+",
+                    left=load(),
+                    right=Begin(effects=[store(Immediate(value=1))], value=Immediate(value=1)),
+                )
+            ),
+            id="before-store",
+        ),
+    ],
+)
+def test_scalar_replace_program_terms(term: Term, expected: Term):
+    program = Program(parameters=["x", "y", "g"], body=term)
+
+    assert scalar_replace_program(program, SequentialNameGenerator()).body == expected
+
+
+@pytest.mark.parametrize(
+    "term",
+    [
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[store(Immediate(value=1))],
+                    value=Apply(target=Reference(name="g"), arguments=[Reference(name="c")]),
+                )
+            ),
+            id="escapes",
+        ),
+        pytest.param(
+            cell(Begin(effects=[store(Immediate(value=1))], value=load(1))),
+            id="out-of-range",
+        ),
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[store(Immediate(value=1))],
+                    value=Let(
+                        bindings=[("f", Abstract(parameters=[], body=store(Immediate(value=2))))],
+                        body=Begin(effects=[Apply(target=Reference(name="f"), arguments=[])], value=load()),
+                    ),
+                )
+            ),
+            id="stored-in-abstract",
+        ),
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[
+                        Branch(
+                            operator="<",
+                            left=Reference(name="x"),
+                            right=Reference(name="y"),
+                            consequent=store(Immediate(value=1)),
+                            otherwise=store(Immediate(value=2)),
+                        )
+                    ],
+                    value=load(),
+                )
+            ),
+            id="branch-disagrees",
+        ),
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[store(Reference(name="x"))],
+                    value=Let(
+                        bindings=[("f", Abstract(parameters=[], body=load()))],
+                        body=Begin(effects=[store(Reference(name="y"))], value=Reference(name="f")),
+                    ),
+                )
+            ),
+            id="abstract-stored-twice",
+        ),
+        pytest.param(
+            cell(
+                Begin(
+                    effects=[
+                        Let(
+                            bindings=[("a", Apply(target=Reference(name="g"), arguments=[]))],
+                            body=store(Reference(name="a")),
+                        )
+                    ],
+                    value=load(),
+                )
+            ),
+            id="out-of-scope",
+        ),
+        pytest.param(
+            # only a Store in a Begin is split
+            cell(
+                Begin(
+                    effects=[store(Immediate(value=1))],
+                    value=Primitive(
+                        operator="+",
+                        left=store(Apply(target=Reference(name="g"), arguments=[])),
+                        right=load(),
+                    ),
+                )
+            ),
+            id="overwritten",
+        ),
+        pytest.param(
+            Begin(
+                effects=[
+                    Store(base=Reference(name="g"), index=0, value=Immediate(value=1)),
+                    Store(base=Apply(target=Reference(name="g"), arguments=[]), index=0, value=Immediate(value=1)),
+                ],
+                value=Load(base=Apply(target=Reference(name="g"), arguments=[]), index=0),
+            ),
+            id="not-a-cell",
+        ),
+    ],
+)
+def test_scalar_replace_program_unchanged(term: Term):
+    program = Program(parameters=["x", "y", "g"], body=term)
+
+    assert scalar_replace_program(program, SequentialNameGenerator()) is program
+
+
+def test_scalar_replace_term():
+    # a cell is removed in the round after its last Load is forwarded; its Stores become the value they evaluate to
+    term = cell(Begin(effects=[store(Reference(name="x"))], value=load()))
+    fresh = SequentialNameGenerator()
+
+    forwarded = scalar_replace_term(term, fresh)
+    assert forwarded == cell(Begin(effects=[store(Reference(name="x"))], value=Reference(name="x")))
+    assert scalar_replace_term(forwarded, fresh) == Begin(
+        effects=[Begin(effects=[Reference(name="x")], value=Immediate(value=0))],
+        value=Reference(name="x"),
+    )
+
+
+def test_scalar_replace_program_deep():
+    body: Term = Reference(name="x")
+    for index in range(10_000):
+        name = f"c{index}"
+        body = Let(
+            bindings=[(name, Allocate(count=1))],
+            body=Begin(
+                effects=[Store(base=Reference(name=name), index=0, value=Immediate(value=index))],
+                value=Primitive(operator="+", left=Load(base=Reference(name=name), index=0), right=body),
+            ),
+        )
+
+    actual = scalar_replace_program(Program(parameters=["x"], body=body), SequentialNameGenerator())
+
+    depth = 0
+    term = actual.body
+    while isinstance(term, Primitive):
+        assert term.left == Immediate(value=9_999 - depth)
+        term, depth = term.right, depth + 1
+
+    assert (term, depth) == (Reference(name="x"), 10_000)
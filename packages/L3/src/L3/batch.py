@@ -0,0 +1,58 @@
+import os
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import click
+
+# Several inputs are compiled by a pool of worker processes, each of which loads the passes and builds the parser
+# once and then writes the outputs of the inputs it is handed, going through the cache when there is one. A failed
+# input is reported by its message and does not stop the others.
+
+
+def _initialize(validate: bool, threads: int) -> None:
+    from util.construct import enable_validation
+    from util.parallel import set_workers
+
+    from .main import preload
+
+    enable_validation(validate)
+    set_workers(threads)
+    preload()
+
+
+def _compile(input: Path, **options: Any) -> str | None:
+    from .main import compile_path
+
+    try:
+        compile_path(input, None, **options)
+
+    except click.ClickException as error:
+        return error.format_message()
+
+    except (ValueError, OSError) as error:
+        return str(error)
+
+    return None
+
+
+def compile_batch(
+    inputs: Sequence[Path],
+    jobs: int | None,
+    validate: bool,
+    threads: int,
+    **options: Any,
+) -> Iterator[tuple[Path, str | None]]:
+    # each input with its error, if any, in the order of inputs
+    compile = partial(_compile, **options)
+    jobs = min(jobs or os.process_cpu_count() or 1, len(inputs))
+
+    if jobs == 1:
+        _initialize(validate, threads)
+        yield from zip(inputs, map(compile, inputs))
+        return
+
+    with ProcessPoolExecutor(jobs, initializer=_initialize, initargs=(validate, threads)) as pool:
+        yield from zip(inputs, pool.map(compile, inputs))
@@ -0,0 +1,129 @@
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from .pipeline import Options
+
+# Compiled modules are stored under a hash of everything that determines them: the source, the flags that change
+# the output and the compiler itself. The compiler is identified by the contents of its source files rather than by
+# a version number, so that an edited checkout never reads modules that an older compiler wrote. Entries are
+# evicted least recently used first, by modification time, which a hit refreshes, once the directory outgrows its
+# size bound, down to nine tenths of it. The directory is only scanned when a running estimate of its size, the size
+# at the last scan plus what this process has stored since, goes over the bound, so that a store doesn't cost a stat
+# of every entry. Every entry is written to a temporary file and renamed into place, every lookup appends one byte
+# to a hits or a misses file, and an entry that another process evicts mid-scan is skipped, so that the worker
+# processes of a batch can share one cache; what the others store shows up in the estimate at the next scan.
+
+# the packages whose code can change what l3 emits
+_COMPILER = ["L3", "L2", "L1", "L0", "util"]
+
+
+class Stats(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    size: int
+
+
+@cache
+def compiler_digest() -> str:
+    digest = hashlib.sha256()
+    for package in _COMPILER:
+        # found without importing it, which for util would import pydantic
+        spec = importlib.util.find_spec(package)
+        directories = spec.submodule_search_locations if spec is not None else None
+        for directory in directories or []:
+            for path in sorted(Path(directory).rglob("*.py")):
+                digest.update(path.relative_to(directory).as_posix().encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def cache_key(source: bytes, options: Options, input_format: str) -> str:
+    header = json.dumps([compiler_digest(), *options, input_format]).encode()
+    return hashlib.sha256(header + b"\0" + source).hexdigest()
+
+
+class Cache:
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self._size: int | None = None
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.py"
+
+    def _count(self, name: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / name).open("ab") as file:
+            file.write(b".")
+
+    def load(self, key: str, destination: Path) -> bool:
+        # copies the module stored under key to destination, if there is one
+        entry = self._entry(key)
+        try:
+            shutil.copyfile(entry, destination)
+            os.utime(entry)
+
+        except FileNotFoundError:
+            self._count("misses")
+            return False
+
+        self._count("hits")
+        return True
+
+    def store(self, key: str, module: Path) -> None:
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=entry.parent, delete=False) as file:
+            with module.open("rb") as source:
+                shutil.copyfileobj(source, file)
+            size = file.tell()
+        os.replace(file.name, entry)
+
+        if self._size is None or self._size + size > self.max_size:
+            self._evict()
+        else:
+            self._size += size
+
+    def _scan(self) -> list[tuple[Path, os.stat_result]]:
+        # every entry with its status, but for those removed since the directory was listed
+        entries: list[tuple[Path, os.stat_result]] = []
+        for entry in self.directory.glob("*/*.py"):
+            try:
+                entries.append((entry, entry.stat()))
+
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._scan(), key=lambda item: item[1].st_mtime)
+        size = sum(status.st_size for _, status in entries)
+        if size > self.max_size:
+            target = self.max_size * 9 // 10
+            for entry, status in entries:
+                if size <= target:
+                    break
+                entry.unlink(missing_ok=True)
+                size -= status.st_size
+        self._size = size
+
+    def stats(self) -> Stats:
+        def count(name: str) -> int:
+            path = self.directory / name
+            return path.stat().st_size if path.exists() else 0
+
+        sizes = [status.st_size for _, status in self._scan()]
+        return Stats(count("hits"), count("misses"), len(sizes), sum(sizes))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._size = None
@@ -1,6 +1,9 @@
 from collections import Counter
-from collections.abc import Mapping
-from functools import partial
+from collections.abc import Iterable, Mapping, Sequence
+
+from util.parallel import chunks, parallel, parallel_enabled
+from util.scope import Scope
+from util.traverse import Dispatch, Step, run, sequence
 
 from .syntax import (
     Abstract,
@@ -22,95 +25,150 @@ from .syntax import (
 
 type Context = Mapping[Identifier, None]
 
+# Checking reports every problem it finds rather than stopping at the first one: handlers append a message to
+# `diagnostics` and carry on, and check_term / check_program raise a single CheckError listing all of them. The
+# values of a Let or LetRec can be checked in parallel: each worker takes a run of them, with a copy of the scope and
+# a list of diagnostics of its own, and the lists are appended in order afterwards.
 
-def check_term(
-    term: Term,
-    context: Context,
-) -> None:
-    recur = partial(check_term, context=context)
 
-    match term:
-        case Let(bindings=bindings, body=body):
-            counts = Counter(name for name, _ in bindings)
-            duplicates = {name: count for name, count in counts.items() if count > 1}
-            if duplicates:
-                raise ValueError(f"duplicate binders: {duplicates}")
+class CheckError(ValueError):
+    def __init__(self, diagnostics: Sequence[str]) -> None:
+        super().__init__("\n".join(diagnostics))
+        self.diagnostics = [*diagnostics]
 
-            for _, value in bindings:
-                recur(value)
 
-            local = dict.fromkeys([name for name, _ in bindings])
-            recur(body, context={**context, **local})
+def _duplicates(names: Iterable[Identifier]) -> list[Identifier]:
+    return [name for name, count in Counter(names).items() if count > 1]
 
-        case LetRec(bindings=bindings, body=body):
-            counts = Counter(name for name, _ in bindings)
-            duplicates = {name: count for name, count in counts.items() if count > 1}
-            if duplicates:
-                raise ValueError(f"duplicate binders: {duplicates}")
 
-            local = dict.fromkeys([name for name, _ in bindings])
+_term = Dispatch[None]()
 
-            for name, value in bindings:
-                recur(value, context={**context, **local})
 
-            check_term(body, {**context, **local})
+def _values(terms: Sequence[Term], scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    if not parallel_enabled():
+        yield sequence(_term(term, scope, diagnostics) for term in terms)
+        return
 
-        case Reference(name=name):
-            if name not in context:
-                raise ValueError(f"unknown variable: {name}")
+    def chunk(terms: Sequence[Term], report: list[str]) -> Step[None]:
+        copy = Scope(scope)
+        yield sequence(_term(term, copy, report) for term in terms)
 
-        case Abstract(parameters=parameters, body=body):
-            counts = Counter(parameters)
-            duplicates = {name for name, count in counts.items() if count > 1}
-            if duplicates:
-                raise ValueError(f"duplicate parameters: {duplicates}")
+    parts = chunks(terms)
+    reports: list[list[str]] = [[] for _ in parts]
+    yield parallel(chunk(part, report) for part, report in zip(parts, reports))
+    for report in reports:
+        diagnostics.extend(report)
 
-            local = dict.fromkeys(parameters, None)
-            recur(body, context={**context, **local})
 
-        case Apply(target=target, arguments=arguments):
-            recur(target)
-            for argument in arguments:
-                recur(argument)
+@_term.register(Let)
+def _let(term: Let, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    if duplicates := _duplicates(name for name, _ in term.bindings):
+        diagnostics.append(f"duplicate binders: {', '.join(duplicates)}")
 
-        case Immediate(value=_value):
-            pass
+    yield _values([value for _, value in term.bindings], scope, diagnostics)
 
-        case Primitive(operator=_operator, left=left, right=right):
-            recur(left)
-            recur(right)
+    with scope.bind((name, None) for name, _ in term.bindings):
+        yield _term(term.body, scope, diagnostics)
 
-        case Branch(operator=_operator, left=left, right=right, consequent=consequent, otherwise=otherwise):
-            recur(left)
-            recur(right)
-            recur(consequent)
-            recur(otherwise)
 
-        case Allocate(count=_count):
-            pass
+@_term.register(LetRec)
+def _letrec(term: LetRec, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    if duplicates := _duplicates(name for name, _ in term.bindings):
+        diagnostics.append(f"duplicate binders: {', '.join(duplicates)}")
 
-        case Load(base=base, index=_index):
-            recur(base)
+    with scope.bind((name, None) for name, _ in term.bindings):
+        yield _values([value for _, value in term.bindings], scope, diagnostics)
+        yield _term(term.body, scope, diagnostics)
 
-        case Store(base=base, index=_index, value=value):
-            recur(base)
-            recur(value)
 
-        case Begin(effects=effects, value=value):  # pragma: no branch
-            for effect in effects:
-                recur(effect)
-            recur(value)
+@_term.register(Reference)
+def _reference(term: Reference, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    if term.name not in scope:
+        diagnostics.append(f"unknown variable: {term.name}")
 
 
-def check_program(
+@_term.register(Abstract)
+def _abstract(term: Abstract, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    if duplicates := _duplicates(term.parameters):
+        diagnostics.append(f"duplicate parameters: {', '.join(duplicates)}")
+
+    with scope.bind((parameter, None) for parameter in term.parameters):
+        yield _term(term.body, scope, diagnostics)
+
+
+@_term.register(Apply)
+def _apply(term: Apply, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    yield _term(term.target, scope, diagnostics)
+    yield sequence(_term(argument, scope, diagnostics) for argument in term.arguments)
+
+
+@_term.register(Immediate, Allocate)
+def _leaf(term: Immediate | Allocate, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    pass
+
+
+@_term.register(Primitive)
+def _primitive(term: Primitive, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    yield _term(term.left, scope, diagnostics)
+    yield _term(term.right, scope, diagnostics)
+
+
+@_term.register(Branch)
+def _branch(term: Branch, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    yield _term(term.left, scope, diagnostics)
+    yield _term(term.right, scope, diagnostics)
+    yield _term(term.consequent, scope, diagnostics)
+    yield _term(term.otherwise, scope, diagnostics)
+
+
+@_term.register(Load)
+def _load(term: Load, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    yield _term(term.base, scope, diagnostics)
+
+
+@_term.register(Store)
+def _store(term: Store, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    yield _term(term.base, scope, diagnostics)
+    yield _term(term.value, scope, diagnostics)
+
+
+@_term.register(Begin)
+def _begin(term: Begin, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+    yield sequence(_term(effect, scope, diagnostics) for effect in term.effects)
+    yield _term(term.value, scope, diagnostics)
+
+
+def diagnose_term(
+    term: Term,
+    context: Context,
+) -> list[str]:
+    diagnostics: list[str] = []
+    run(_term(term, Scope(context), diagnostics))
+    return diagnostics
+
+
+def diagnose_program(
     program: Program,
-) -> None:
+) -> list[str]:
     match program:
         case Program(parameters=parameters, body=body):  # pragma: no branch
-            counts = Counter(parameters)
-            duplicates = {name for name, count in counts.items() if count > 1}
-            if duplicates:
-                raise ValueError(f"duplicate parameters: {duplicates}")
+            diagnostics: list[str] = []
+            if duplicates := _duplicates(parameters):
+                diagnostics.append(f"duplicate parameters: {', '.join(duplicates)}")
+
+            return [*diagnostics, *diagnose_term(body, dict.fromkeys(parameters, None))]
+
 
-            local = dict.fromkeys(parameters, None)
-            check_term(body, context=local)
+def check_term(
+    term: Term,
+    context: Context,
+) -> None:
+    if diagnostics := diagnose_term(term, context):
+        raise CheckError(diagnostics)
+
+
+def check_program(
+    program: Program,
+) -> None:
+    if diagnostics := diagnose_program(program):
+        raise CheckError(diagnostics)
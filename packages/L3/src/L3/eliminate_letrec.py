@@ -1,67 +1,142 @@
-# noqa: F841
 from collections.abc import Mapping
-from functools import partial
 
 from L2 import syntax as L2
+from util.construct import construct
+from util.parallel import parallel
+from util.traverse import Dispatch, Step, run, sequence
 
 from . import syntax as L3
 
 type Context = Mapping[L3.Identifier, None]
 
+_term = Dispatch[L2.Term]()
+
+
+@_term.register(L3.Let)
+def _let(term: L3.Let, context: Context) -> Step[L2.Term]:
+    local = {name for name, _ in term.bindings}
+    values = yield parallel(_term(value, context) for _, value in term.bindings)
+    return construct(
+        L2.Let,
+        bindings=[(name, value) for (name, _), value in zip(term.bindings, values)],
+        body=(yield _term(term.body, {name: None for name in context if name not in local})),
+    )
+
+
+@_term.register(L3.LetRec)
+def _letrec(term: L3.LetRec, context: Context) -> Step[L2.Term]:
+    local = dict.fromkeys([name for name, _ in term.bindings])
+    values = yield parallel(_term(value, {**context, **local}) for _, value in term.bindings)
+    return construct(
+        L2.Let,
+        bindings=[(name, construct(L2.Allocate, count=1)) for name, _ in term.bindings],
+        body=construct(
+            L2.Begin,
+            effects=[
+                construct(
+                    L2.Store,
+                    base=construct(L2.Reference, name=name),
+                    index=0,
+                    value=value,
+                )
+                for (name, _), value in zip(term.bindings, values)
+            ],
+            value=(yield _term(term.body, {**context, **local})),
+        ),
+    )
+
+
+@_term.register(L3.Reference)
+def _reference(term: L3.Reference, context: Context) -> Step[L2.Term]:
+    if term.name in context:
+        return construct(L2.Load, base=construct(L2.Reference, name=term.name), index=0)
+
+    return construct(L2.Reference, name=term.name)
+
+
+@_term.register(L3.Abstract)
+def _abstract(term: L3.Abstract, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Abstract,
+        parameters=term.parameters,
+        body=(yield _term(term.body, {name: None for name in context if name not in term.parameters})),
+    )
+
+
+@_term.register(L3.Apply)
+def _apply(term: L3.Apply, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Apply,
+        target=(yield _term(term.target, context)),
+        arguments=(yield sequence(_term(argument, context) for argument in term.arguments)),
+    )
+
+
+@_term.register(L3.Immediate)
+def _immediate(term: L3.Immediate, context: Context) -> Step[L2.Term]:
+    return construct(L2.Immediate, value=term.value)
+
+
+@_term.register(L3.Primitive)
+def _primitive(term: L3.Primitive, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Primitive,
+        operator=term.operator,
+        left=(yield _term(term.left, context)),
+        right=(yield _term(term.right, context)),
+    )
+
+
+@_term.register(L3.Branch)
+def _branch(term: L3.Branch, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Branch,
+        operator=term.operator,
+        left=(yield _term(term.left, context)),
+        right=(yield _term(term.right, context)),
+        consequent=(yield _term(term.consequent, context)),
+        otherwise=(yield _term(term.otherwise, context)),
+    )
+
+
+@_term.register(L3.Allocate)
+def _allocate(term: L3.Allocate, context: Context) -> Step[L2.Term]:
+    return construct(L2.Allocate, count=term.count)
+
+
+@_term.register(L3.Load)
+def _load(term: L3.Load, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Load,
+        base=(yield _term(term.base, context)),
+        index=term.index,
+    )
+
+
+@_term.register(L3.Store)
+def _store(term: L3.Store, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Store,
+        base=(yield _term(term.base, context)),
+        index=term.index,
+        value=(yield _term(term.value, context)),
+    )
+
+
+@_term.register(L3.Begin)
+def _begin(term: L3.Begin, context: Context) -> Step[L2.Term]:
+    return construct(
+        L2.Begin,
+        effects=(yield sequence(_term(effect, context) for effect in term.effects)),
+        value=(yield _term(term.value, context)),
+    )
+
 
 def eliminate_letrec_term(
     term: L3.Term,
     context: Context,
 ) -> L2.Term:
-    recur = partial(eliminate_letrec_term, context=context)
-
-    match term:
-        case L3.Let(bindings=bindings, body=body):
-            pass
-
-        case L3.LetRec(bindings=bindings, body=body):
-            pass
-
-        case L3.Reference(name=name):
-            # if name is a recursive variable -> (Load (Reference name)))
-            # else (Reference name)
-            pass
-
-        case L3.Abstract(parameters=parameters, body=body):
-            pass
-
-        case L3.Apply(target=target, arguments=arguments):
-            pass
-
-        case L3.Immediate(value=value):
-            return L2.Immediate(value=value)
-
-        case L3.Primitive(operator=_operator, left=left, right=right):
-            pass
-
-        case L3.Branch(operator=operator, left=left, right=right, consequent=consequent, otherwise=otherwise):
-            return L2.Branch(
-                operator=operator,
-                left=recur(left),
-                right=recur(right),
-                consequent=recur(consequent),
-                otherwise=recur(otherwise),
-            )
-
-        case L3.Allocate(count=count):
-            return L2.Allocate(count=count)
-
-        case L3.Load(base=base, index=index):
-            return L2.Load(
-                base=recur(base),
-                index=index,
-            )
-
-        case L3.Store(base=base, index=_index, value=value):
-            pass
-
-        case L3.Begin(effects=effects, value=value):  # pragma: no branch
-            pass
+    return run(_term(term, context))
 
 
 def eliminate_letrec_program(
@@ -69,7 +144,8 @@ def eliminate_letrec_program(
 ) -> L2.Program:
     match program:
         case L3.Program(parameters=parameters, body=body):  # pragma: no branch
-            return L2.Program(
+            return construct(
+                L2.Program,
                 parameters=parameters,
                 body=eliminate_letrec_term(body, {}),
             )
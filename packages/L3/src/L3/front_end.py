@@ -0,0 +1,209 @@
+from collections import Counter
+from collections.abc import Callable, Iterable
+
+from L2 import syntax as L2
+from util.construct import construct
+from util.scope import Scope
+from util.sequential_name_generator import SequentialNameGenerator
+from util.traverse import Dispatch, Step, run, sequence
+
+from . import syntax as L3
+from .check import CheckError
+
+# check, uniqify and eliminate_letrec in one traversal, building the L2 tree straight from the L3 one. The scope maps
+# each name to its new one and whether a LetRec bound it, in which case a reference loads it from its cell. Names are
+# drawn from `fresh` in the order uniqify draws them and diagnostics are reported in the order check reports them, so
+# the result is the one the three passes would give. A program with diagnostics raises a CheckError once the whole
+# tree has been walked.
+
+type Fresh = Callable[[str], str]
+
+type Binding = tuple[L3.Identifier, bool]
+
+_term = Dispatch[L2.Term]()
+
+
+def _duplicates(names: Iterable[L3.Identifier], kind: str, diagnostics: list[str]) -> None:
+    if duplicates := [name for name, count in Counter(names).items() if count > 1]:
+        diagnostics.append(f"duplicate {kind}: {', '.join(duplicates)}")
+
+
+@_term.register(L3.Let)
+def _let(term: L3.Let, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh) -> Step[L2.Term]:
+    _duplicates((name for name, _ in term.bindings), "binders", diagnostics)
+    local = {name: fresh(name) for name, _ in term.bindings}
+    values = yield sequence(_term(value, scope, diagnostics, fresh) for _, value in term.bindings)
+
+    with scope.bind((name, (local[name], False)) for name, _ in term.bindings):
+        body = yield _term(term.body, scope, diagnostics, fresh)
+
+    return construct(
+        L2.Let,
+        bindings=[(local[name], value) for (name, _), value in zip(term.bindings, values)],
+        body=body,
+    )
+
+
+@_term.register(L3.LetRec)
+def _letrec(
+    term: L3.LetRec, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    _duplicates((name for name, _ in term.bindings), "binders", diagnostics)
+    local = {name: fresh(name) for name, _ in term.bindings}
+
+    with scope.bind((name, (local[name], True)) for name, _ in term.bindings):
+        values = yield sequence(_term(value, scope, diagnostics, fresh) for _, value in term.bindings)
+        body = yield _term(term.body, scope, diagnostics, fresh)
+
+    return construct(
+        L2.Let,
+        bindings=[(local[name], construct(L2.Allocate, count=1)) for name, _ in term.bindings],
+        body=construct(
+            L2.Begin,
+            effects=[
+                construct(
+                    L2.Store,
+                    base=construct(L2.Reference, name=local[name]),
+                    index=0,
+                    value=value,
+                )
+                for (name, _), value in zip(term.bindings, values)
+            ],
+            value=body,
+        ),
+    )
+
+
+@_term.register(L3.Reference)
+def _reference(
+    term: L3.Reference, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    match scope.get(term.name):
+        case None:
+            diagnostics.append(f"unknown variable: {term.name}")
+            return construct(L2.Reference, name=term.name)
+
+        case name, True:
+            return construct(L2.Load, base=construct(L2.Reference, name=name), index=0)
+
+        case name, False:  # pragma: no branch
+            return construct(L2.Reference, name=name)
+
+
+@_term.register(L3.Abstract)
+def _abstract(
+    term: L3.Abstract, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    _duplicates(term.parameters, "parameters", diagnostics)
+    local = {parameter: fresh(parameter) for parameter in term.parameters}
+
+    with scope.bind((parameter, (local[parameter], False)) for parameter in term.parameters):
+        body = yield _term(term.body, scope, diagnostics, fresh)
+
+    return construct(
+        L2.Abstract,
+        parameters=[local[parameter] for parameter in term.parameters],
+        body=body,
+    )
+
+
+@_term.register(L3.Apply)
+def _apply(term: L3.Apply, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh) -> Step[L2.Term]:
+    return construct(
+        L2.Apply,
+        target=(yield _term(term.target, scope, diagnostics, fresh)),
+        arguments=(yield sequence(_term(argument, scope, diagnostics, fresh) for argument in term.arguments)),
+    )
+
+
+@_term.register(L3.Immediate)
+def _immediate(
+    term: L3.Immediate, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    return construct(L2.Immediate, value=term.value)
+
+
+@_term.register(L3.Primitive)
+def _primitive(
+    term: L3.Primitive, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    return construct(
+        L2.Primitive,
+        operator=term.operator,
+        left=(yield _term(term.left, scope, diagnostics, fresh)),
+        right=(yield _term(term.right, scope, diagnostics, fresh)),
+    )
+
+
+@_term.register(L3.Branch)
+def _branch(
+    term: L3.Branch, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    return construct(
+        L2.Branch,
+        operator=term.operator,
+        left=(yield _term(term.left, scope, diagnostics, fresh)),
+        right=(yield _term(term.right, scope, diagnostics, fresh)),
+        consequent=(yield _term(term.consequent, scope, diagnostics, fresh)),
+        otherwise=(yield _term(term.otherwise, scope, diagnostics, fresh)),
+    )
+
+
+@_term.register(L3.Allocate)
+def _allocate(
+    term: L3.Allocate, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh
+) -> Step[L2.Term]:
+    return construct(L2.Allocate, count=term.count)
+
+
+@_term.register(L3.Load)
+def _load(term: L3.Load, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh) -> Step[L2.Term]:
+    return construct(
+        L2.Load,
+        base=(yield _term(term.base, scope, diagnostics, fresh)),
+        index=term.index,
+    )
+
+
+@_term.register(L3.Store)
+def _store(term: L3.Store, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh) -> Step[L2.Term]:
+    return construct(
+        L2.Store,
+        base=(yield _term(term.base, scope, diagnostics, fresh)),
+        index=term.index,
+        value=(yield _term(term.value, scope, diagnostics, fresh)),
+    )
+
+
+@_term.register(L3.Begin)
+def _begin(term: L3.Begin, scope: Scope[L3.Identifier, Binding], diagnostics: list[str], fresh: Fresh) -> Step[L2.Term]:
+    return construct(
+        L2.Begin,
+        effects=(yield sequence(_term(effect, scope, diagnostics, fresh) for effect in term.effects)),
+        value=(yield _term(term.value, scope, diagnostics, fresh)),
+    )
+
+
+def front_end_program(
+    program: L3.Program,
+) -> tuple[Fresh, L2.Program]:
+    fresh = SequentialNameGenerator()
+
+    match program:
+        case L3.Program(parameters=parameters, body=body):  # pragma: no branch
+            diagnostics: list[str] = []
+            _duplicates(parameters, "parameters", diagnostics)
+            local = {parameter: fresh(parameter) for parameter in parameters}
+            scope = Scope({parameter: (local[parameter], False) for parameter in parameters})
+            l2 = run(_term(body, scope, diagnostics, fresh))
+
+            if diagnostics:
+                raise CheckError(diagnostics)
+            return (
+                fresh,
+                construct(
+                    L2.Program,
+                    parameters=[local[parameter] for parameter in parameters],
+                    body=l2,
+                ),
+            )
@@ -0,0 +1,225 @@
+import weakref
+from collections.abc import Sequence
+
+from L1 import syntax as L1
+from L1.to_python import Emitted, to_ast_program
+from L1.to_python import _statement as _emit  # pyright: ignore[reportPrivateUsage]
+from L2 import syntax as L2
+from L2.cps_convert import Continuation, Fresh, Return, cps_convert_program
+from L2.cps_convert import _term as _cps  # pyright: ignore[reportPrivateUsage]
+from L2.optimize import optimize_program
+from util.construct import replace
+from util.interner import Interner
+from util.memo import Memo
+from util.scope import Scope
+from util.sequential_name_generator import SequentialNameGenerator
+from util.traverse import Dispatch, Step, run, sequence
+
+from .check import CheckError, diagnose_program
+from .check import _term as _check  # pyright: ignore[reportPrivateUsage]
+from .eliminate_letrec import Context as Letrecs
+from .eliminate_letrec import _term as _eliminate  # pyright: ignore[reportPrivateUsage]
+from .eliminate_letrec import eliminate_letrec_program
+from .syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
+    Identifier,
+    Immediate,
+    Let,
+    LetRec,
+    Load,
+    Primitive,
+    Program,
+    Reference,
+    Store,
+    Term,
+)
+from .uniqify import Context as Renaming
+from .uniqify import _term as _uniqify  # pyright: ignore[reportPrivateUsage]
+from .uniqify import uniqify_term
+
+# Recompiles successive versions of a program, redoing only the work under the parts that changed. The program is
+# hash-consed first, so an unchanged subtree is the same object as in the previous version, and every pass then runs
+# with a util.memo.Memo around its dispatch table: a pass's result for a subtree is reused when the subtree and the
+# part of its context that it can observe (the bindings of its free variables) are unchanged. CPS conversion is
+# memoized where the continuation is a named function, i.e. for function bodies and branch arms, and Python code
+# generation for the functions and branches it emits. Optimization still runs over the whole program.
+
+type Free = frozenset[Identifier]
+
+type Cache = dict[int, tuple[weakref.ref[Term], Free]]
+
+_free = Dispatch[Free]()
+
+
+def _free_variables(term: Term, cache: Cache) -> Step[Free]:
+    entry = cache.get(id(term))
+    if entry is not None and entry[0]() is term:
+        return entry[1]
+    return _cached(term, cache)
+
+
+def _cached(term: Term, cache: Cache) -> Step[Free]:
+    free = yield _free(term, cache)
+    key = id(term)
+    cache[key] = (weakref.ref(term, lambda _: cache.pop(key, None)), free)
+    return free
+
+
+def _union(frees: Sequence[Free]) -> Free:
+    return frozenset[Identifier]().union(*frees)
+
+
+@_free.register(Let)
+def _let(term: Let, cache: Cache) -> Step[Free]:
+    values = yield sequence(_free_variables(value, cache) for _, value in term.bindings)
+    body = yield _free_variables(term.body, cache)
+    return _union([*values, body - {name for name, _ in term.bindings}])
+
+
+@_free.register(LetRec)
+def _letrec(term: LetRec, cache: Cache) -> Step[Free]:
+    values = yield sequence(_free_variables(value, cache) for _, value in term.bindings)
+    body = yield _free_variables(term.body, cache)
+    return _union([*values, body]) - {name for name, _ in term.bindings}
+
+
+@_free.register(Reference)
+def _reference(term: Reference, cache: Cache) -> Step[Free]:
+    return frozenset([term.name])
+
+
+@_free.register(Abstract)
+def _abstract(term: Abstract, cache: Cache) -> Step[Free]:
+    return (yield _free_variables(term.body, cache)) - set(term.parameters)
+
+
+@_free.register(Apply)
+def _apply(term: Apply, cache: Cache) -> Step[Free]:
+    return _union((yield sequence(_free_variables(child, cache) for child in [term.target, *term.arguments])))
+
+
+@_free.register(Immediate, Allocate)
+def _leaf(term: Immediate | Allocate, cache: Cache) -> Step[Free]:
+    return frozenset()
+
+
+@_free.register(Primitive)
+def _primitive(term: Primitive, cache: Cache) -> Step[Free]:
+    return _union((yield sequence(_free_variables(child, cache) for child in [term.left, term.right])))
+
+
+@_free.register(Branch)
+def _branch(term: Branch, cache: Cache) -> Step[Free]:
+    children = [term.left, term.right, term.consequent, term.otherwise]
+    return _union((yield sequence(_free_variables(child, cache) for child in children)))
+
+
+@_free.register(Load)
+def _load(term: Load, cache: Cache) -> Step[Free]:
+    return (yield _free_variables(term.base, cache))
+
+
+@_free.register(Store)
+def _store(term: Store, cache: Cache) -> Step[Free]:
+    return _union((yield sequence(_free_variables(child, cache) for child in [term.base, term.value])))
+
+
+@_free.register(Begin)
+def _begin(term: Begin, cache: Cache) -> Step[Free]:
+    return _union((yield sequence(_free_variables(child, cache) for child in [*term.effects, term.value])))
+
+
+def free_variables(term: Term) -> Free:
+    return run(_free_variables(term, {}))
+
+
+class IncrementalCompiler:
+    def __init__(self, check: bool = True, optimize: bool = True) -> None:
+        self.check = check
+        self.optimize = optimize
+        self._interner = Interner()
+        self._free: Cache = {}
+        fresh = SequentialNameGenerator()
+        self.memos = {
+            name: Memo(fresh) for name in ["check", "uniqify", "eliminate_letrec", "cps_convert", "to_python"]
+        }
+
+    def compile(self, program: Program) -> str:
+        program = self._interner.intern(program)
+
+        if self.check:
+            with self.memos["check"].installed(_check, self._check):
+                if diagnostics := diagnose_program(program):
+                    raise CheckError(diagnostics)
+
+        memo = self.memos["uniqify"]
+        with memo.installed(_uniqify, self._uniqify):
+            local = {parameter: memo.fresh(parameter) for parameter in program.parameters}
+            l3 = replace(
+                program,
+                parameters=[local[parameter] for parameter in program.parameters],
+                body=uniqify_term(program.body, local, memo.fresh),
+            )
+
+        with self.memos["eliminate_letrec"].installed(_eliminate, self._eliminate_letrec):
+            l2 = eliminate_letrec_program(l3)
+
+        if self.optimize:
+            l2 = optimize_program(l2)
+
+        memo = self.memos["cps_convert"]
+        with memo.installed(_cps, self._cps_convert):
+            l1 = cps_convert_program(l2, memo.fresh)
+
+        with self.memos["to_python"].installed(_emit, self._to_python):
+            return to_ast_program(l1)
+
+    def clear(self) -> None:
+        self._interner.clear()
+        self._free.clear()
+        for memo in self.memos.values():
+            memo.clear()
+
+    def _check(self, term: Term, scope: Scope[Identifier, None], diagnostics: list[str]) -> Step[None]:
+        start = len(diagnostics)
+
+        def compute() -> Step[list[str]]:
+            yield _check.handle(term, scope, diagnostics)
+            return diagnostics[start:]
+
+        free = yield _free_variables(term, self._free)
+        key = frozenset(name for name in free if name not in scope)
+        diagnostics[start:] = yield self.memos["check"].step(term, key, compute)
+
+    def _uniqify(self, term: Term, context: Renaming, fresh: Fresh) -> Step[Term]:
+        free = yield _free_variables(term, self._free)
+        key = frozenset((name, context.get(name)) for name in free)
+        return (yield self.memos["uniqify"].step(term, key, lambda: _uniqify.handle(term, context, fresh)))
+
+    def _eliminate_letrec(self, term: Term, context: Letrecs) -> Step[L2.Term]:
+        free = yield _free_variables(term, self._free)
+        key = frozenset(name for name in free if name in context)
+        return (yield self.memos["eliminate_letrec"].step(term, key, lambda: _eliminate.handle(term, context)))
+
+    def _cps_convert(self, term: L2.Term, k: Continuation, fresh: Fresh) -> Step[L1.Statement]:
+        if not isinstance(k, Return):
+            return _cps.handle(term, k, fresh)
+        return self.memos["cps_convert"].step(term, k.target, lambda: _cps.handle(term, k, fresh))
+
+    def _to_python(self, statement: L1.Statement) -> Step[Emitted]:
+        match statement:
+            case L1.Abstract():
+                # keyed on the body, which is reused from CPS conversion even where the Abstract itself is rebuilt
+                key = (statement.destination, tuple(statement.parameters))
+                emitted, _ = yield self.memos["to_python"].step(statement.body, key, lambda: _emit.handle(statement))
+                return emitted, statement.then
+
+            case L1.Branch():
+                return (yield self.memos["to_python"].step(statement, None, lambda: _emit.handle(statement)))
+
+            case _:
+                return (yield _emit.handle(statement))
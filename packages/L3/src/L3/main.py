@@ -1,22 +1,72 @@
+from collections.abc import Callable, Sequence
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
 
 import click
-from L1.to_python import to_ast_program
-from L2.cps_convert import cps_convert_program
-from L2.optimize import optimize_program
 
-from .check import check_program
-from .eliminate_letrec import eliminate_letrec_program
-from .parse import parse_program
-from .uniqify import uniqify_program
+from .pipeline import LANGUAGES, Language, Options
 
+if TYPE_CHECKING:
+    from .cache import Cache
+    from .profiling import Profiler
 
-@click.command(
+# Pass modules (and pydantic with them) are imported by the stage that needs them rather than at module
+# scope, so that startup only pays for click; see test_main.py for the import-time budget.
+
+
+type InputFormat = Literal["auto", "l3", "json", "ir"]
+
+
+class _Main(click.Group):
+    # `l3 [OPTIONS] INPUT` is short for `l3 compile [OPTIONS] INPUT`
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = ["compile", *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(
+    cls=_Main,
     context_settings=dict(
         help_option_names=["-h", "--help"],
         max_content_width=120,
     ),
 )
+def main() -> None:
+    pass
+
+
+socket_option = click.option(
+    "--socket",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    envvar="L3_SOCKET",
+    help="Socket of the compile server (defaults to $XDG_RUNTIME_DIR/l3-<uid>.sock)",
+)
+
+
+def cache_options[F: Callable[..., Any]](command: F) -> F:
+    command = click.option(
+        "--cache-size",
+        type=click.IntRange(min=0),
+        default=256 << 20,
+        show_default=True,
+        envvar="L3_CACHE_SIZE",
+        help="Size in bytes beyond which the least recently used cache entries are evicted",
+    )(command)
+    return click.option(
+        "--cache-dir",
+        type=click.Path(file_okay=False, path_type=Path),
+        default=None,
+        envvar="L3_CACHE_DIR",
+        help="Directory of the compilation cache (defaults to no cache)",
+    )(command)
+
+
+@main.command(
+    "compile",
+    help="Compile each INPUT to Python. An INPUT may also be a directory, for every .l3 file under it, or a glob.",
+)
 @click.option(
     "--check/--no-check",
     default=True,
@@ -27,39 +77,438 @@ from .uniqify import uniqify_program
     "--optimize/--no-optimize",
     default=True,
     show_default=True,
-    help="Enable or disable optimization",
+    help="Enable or disable optimization (--no-optimize is -O0)",
+)
+@click.option(
+    "-O",
+    "level",
+    type=click.IntRange(0, 3),
+    default=1,
+    show_default=True,
+    help="Optimization level, from 0 (no optimizer passes) to 3",
+)
+@click.option(
+    "--inline-threshold",
+    type=click.IntRange(min=0),
+    default=16,
+    show_default=True,
+    help="Largest function, in the inliner's size units, copied into each of its call sites at -O2 and above",
+)
+@click.option(
+    "--emit",
+    type=click.Choice(LANGUAGES),
+    default="python",
+    show_default=True,
+    help="Stop once the program is in this language",
+)
+@click.option(
+    "--ir-format",
+    type=click.Choice(["json", "binary"]),
+    default="json",
+    show_default=True,
+    help="Format of an emitted IR; a binary IR is read back by giving it as INPUT",
+)
+@click.option(
+    "--fuse/--no-fuse",
+    default=True,
+    show_default=True,
+    help="Run fused passes: check, rename and eliminate letrec in one traversal, and CPS-convert L2 straight to Python",
+)
+@click.option(
+    "--via-l0/--no-via-l0",
+    default=False,
+    show_default=True,
+    help="Lower L1 to L0, with closures converted to records, before emitting Python",
+)
+@click.option(
+    "--validate/--no-validate",
+    default=False,
+    show_default=True,
+    envvar="L3_VALIDATE",
+    help="Re-validate every node the passes construct (slow; for debugging)",
+)
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    envvar="L3_THREADS",
+    help="Threads that check and lower the bindings of one program in parallel, in place of the fused front end "
+    "(pays off on free-threaded builds)",
+)
+@click.option(
+    "--input-format",
+    type=click.Choice(["auto", "l3", "json", "ir"]),
+    default="auto",
+    show_default=True,
+    help="Format of the input (auto detects .json and binary .ir of any level)",
+)
+@click.option(
+    "--parser",
+    type=click.Choice(["lark", "reader"]),
+    default="lark",
+    show_default=True,
+    help="Front end used to read the input",
+)
+@click.option(
+    "--stream/--no-stream",
+    default=False,
+    show_default=True,
+    help="Compile every program in INPUT to <OUTPUT stem>_<index><OUTPUT suffix>",
 )
 @click.option(
     "-o",
     "--output",
     type=click.Path(writable=True, dir_okay=False, path_type=Path),
     default=None,
-    help="Output file (defaults to <INPUT>.py)",
+    help="Output file of a single INPUT (defaults to <INPUT>.py, or <INPUT>.<EMIT>.json or .ir)",
 )
-@click.argument(
-    "input",
-    type=click.Path(exists=True, readable=True, dir_okay=False, path_type=Path),
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of processes compiling several inputs at once (defaults to the number of cores)",
+)
+@click.option(
+    "--server/--no-server",
+    default=True,
+    show_default=True,
+    help="Forward a single INPUT to `l3 serve` when it is running",
+)
+@socket_option
+@cache_options
+@click.option(
+    "--profile-passes/--no-profile-passes",
+    default=False,
+    show_default=True,
+    help="Report the time, peak memory and IR node counts of each stage of a single INPUT",
 )
-def main(
+@click.option(
+    "--profile-json",
+    type=click.Path(writable=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Also write the stage report as JSON to this file (implies --profile-passes)",
+)
+@click.argument("patterns", metavar="INPUT...", nargs=-1, required=True)
+def compile_files(
     output: Path | None,
+    jobs: int | None,
     check: bool,
     optimize: bool,
+    level: int,
+    inline_threshold: int,
+    emit: Language,
+    fuse: bool,
+    via_l0: bool,
+    ir_format: Literal["json", "binary"],
+    validate: bool,
+    threads: int,
+    input_format: InputFormat,
+    parser: Literal["lark", "reader"],
+    stream: bool,
+    server: bool,
+    socket: Path | None,
+    cache_dir: Path | None,
+    cache_size: int,
+    profile_passes: bool,
+    profile_json: Path | None,
+    patterns: tuple[str, ...],
+) -> None:
+    inputs = expand(patterns)
+    options = Options(check, level if optimize else 0, emit, via_l0, ir_format, fuse, inline_threshold)
+
+    if profile_passes or profile_json is not None:
+        if len(inputs) > 1:
+            raise click.UsageError("--profile-passes requires a single input")
+
+        from .profiling import Profiler
+
+        # the stages run here, rather than in the server, and every time, rather than out of the cache
+        profile = Profiler()
+        server = False
+        cache_dir = None
+    else:
+        profile = None
+
+    cache = None
+    if cache_dir is not None:
+        from .cache import Cache
+
+        cache = Cache(cache_dir, cache_size)
+
+    if stream and any(resolve_format(input, input_format) != "l3" for input in inputs):
+        raise click.UsageError("--stream requires surface syntax input")
+
+    if len(inputs) > 1:
+        if output is not None:
+            raise click.UsageError("--output requires a single input")
+
+        from .batch import compile_batch
+
+        failed = 0
+        for input, error in compile_batch(
+            inputs,
+            jobs,
+            validate,
+            threads,
+            options=options,
+            input_format=input_format,
+            parser=parser,
+            stream=stream,
+            cache=cache,
+        ):
+            if error is None:
+                click.echo(f"{input}: ok")
+            else:
+                failed += 1
+                click.echo(f"{input}: {error}", err=True)
+
+        if failed:
+            raise click.ClickException(f"{failed} of {len(inputs)} inputs failed")
+        return
+
+    [input] = inputs
+    if server:
+        from .serve import default_socket
+
+        socket = socket or default_socket()
+    else:
+        socket = None
+
+    from util.construct import enable_validation
+    from util.parallel import set_workers
+
+    enable_validation(validate)
+    set_workers(threads)
+
+    compile_path(input, output, options, input_format, parser, stream, cache, socket, validate, threads, profile)
+
+    if profile is not None:
+        click.echo(profile.table(), err=True)
+
+        if profile_json is not None:
+            import json
+
+            profile_json.write_text(json.dumps({"input": str(input), **profile.report()}, indent=2))
+
+
+def expand(patterns: Sequence[str]) -> list[Path]:
+    # each pattern is a file, a directory standing for every .l3 file under it, or a glob
+    import glob
+
+    inputs: list[Path] = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_file():
+            matches = [path]
+        elif path.is_dir():
+            matches = sorted(path.rglob("*.l3"))
+        else:
+            matches = [Path(match) for match in sorted(glob.glob(pattern, recursive=True)) if Path(match).is_file()]
+
+        if not matches:
+            raise click.UsageError(f"no input matches {pattern!r}")
+        inputs.extend(matches)
+
+    return inputs
+
+
+def resolve_format(input: Path, input_format: InputFormat) -> Literal["l3", "json", "ir"]:
+    match input_format, input.suffix:
+        case "auto", ".json":
+            return "json"
+
+        case "auto", ".ir":
+            return "ir"
+
+        case "auto", _:
+            return "l3"
+
+        case _:
+            return input_format
+
+
+def compile_path(
+    input: Path,
+    output: Path | None,
+    options: Options,
+    input_format: InputFormat,
+    parser: Literal["lark", "reader"],
+    stream: bool,
+    cache: Cache | None = None,
+    socket: Path | None = None,
+    validate: bool = False,
+    threads: int = 1,
+    profile: Profiler | None = None,
+) -> None:
+    # compiles input to output, or copies output from the cache, or has the server at socket compile it
+    from .pipeline import output_suffix
+
+    destination = output or input.with_suffix(output_suffix(options))
+
+    key = None
+    if cache is not None and not stream:
+        from .cache import cache_key
+
+        key = cache_key(input.read_bytes(), options, resolve_format(input, input_format))
+        if cache.load(key, destination):
+            return
+
+    # the server is sent text, and so does not take binary IR
+    input_format = resolve_format(input, input_format)
+    if (
+        socket is None
+        or input_format == "ir"
+        or not forward_path(socket, input, destination, options, validate, threads, input_format, parser, stream)
+    ):
+        compile_locally(input, destination, options, input_format, parser, stream, profile)
+
+    if cache is not None and key is not None:
+        cache.store(key, destination)
+
+
+def forward_path(
+    socket: Path,
+    input: Path,
+    destination: Path,
+    options: Options,
+    validate: bool,
+    threads: int,
+    input_format: Literal["l3", "json"],
+    parser: Literal["lark", "reader"],
+    stream: bool,
+) -> bool:
+    # False when no server is running
+    from .serve import forward
+
+    response = forward(
+        socket,
+        {
+            "source": input.read_text(),
+            "output": str(destination.absolute()),
+            "input_format": input_format,
+            "parser": parser,
+            "check": options.check,
+            "level": options.level,
+            "emit": options.emit,
+            "via_l0": options.via_l0,
+            "ir_format": options.ir_format,
+            "fuse": options.fuse,
+            "inline_threshold": options.inline_threshold,
+            "validate": validate,
+            "threads": threads,
+            "stream": stream,
+        },
+    )
+    if response is None:
+        return False
+
+    if response["status"]:
+        raise click.ClickException(response["message"])
+    return True
+
+
+def compile_locally(
     input: Path,
+    destination: Path,
+    options: Options,
+    input_format: InputFormat,
+    parser: Literal["lark", "reader"],
+    stream: bool,
+    profile: Profiler | None = None,
 ) -> None:
-    l3 = parse_program(input.read_text())
+    from .pipeline import write_output
+
+    if stream:
+        from .parse import iter_programs
+
+        with input.open() as file:
+            for index, l3 in enumerate(iter_programs(file, parser)):
+                module = compile_program(l3, options, profile)
+                write_output(destination.with_stem(f"{destination.stem}_{index}"), module)
+
+    else:
+        from .parse import load_program
+        from .pipeline import load_ir
+
+        run = profile.run if profile is not None else _call
+        match resolve_format(input, input_format):
+            case "ir":
+                program = run("parse", load_ir, input)
+
+            case text:
+                program = run("parse", load_program, input, text, parser)
+
+        module = compile_program(program, options, profile)
+
+        write_output(destination, module)
+
+
+@main.command(help="Compile the requests of `l3` in a process that stays loaded.")
+@socket_option
+@click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Exit after this many seconds without a request (defaults to never)",
+)
+def serve(socket: Path | None, idle_timeout: float | None) -> None:
+    from .serve import Server, default_socket
+
+    path = socket or default_socket()
+    with Server(path, idle_timeout) as server:
+        click.echo(f"serving on {path}")
+        server.serve_until_idle()
+
+
+@main.group(help="Inspect or empty the compilation cache.")
+def cache() -> None:
+    pass
+
+
+@cache.command(help="Show hit and miss counts and the size of the cache.")
+@cache_options
+def stats(cache_dir: Path | None, cache_size: int) -> None:
+    from .cache import Cache
+
+    if cache_dir is None:
+        raise click.UsageError("no cache directory; pass --cache-dir or set L3_CACHE_DIR")
+
+    hits, misses, entries, size = Cache(cache_dir, cache_size).stats()
+    click.echo(f"hits: {hits}")
+    click.echo(f"misses: {misses}")
+    click.echo(f"hit rate: {hits / (hits + misses) if hits + misses else 0:.1%}")
+    click.echo(f"entries: {entries}")
+    click.echo(f"size: {size} of {cache_size} bytes")
+
+
+@cache.command(help="Remove every entry and reset the counts.")
+@cache_options
+def clear(cache_dir: Path | None, cache_size: int) -> None:
+    from .cache import Cache
+
+    if cache_dir is None:
+        raise click.UsageError("no cache directory; pass --cache-dir or set L3_CACHE_DIR")
+
+    Cache(cache_dir, cache_size).clear()
+
 
-    if check:
-        check_program(l3)
+def preload() -> None:
+    # for processes that compile many programs: everything a compile needs is loaded once, up front
+    from . import pipeline
+    from .parse import parser, program_adapter
 
-    fresh, l3 = uniqify_program(l3)
+    pipeline.preload()
+    parser()
+    program_adapter()
 
-    l2 = eliminate_letrec_program(l3)
 
-    if optimize:
-        l2 = optimize_program(l2)
+def _call[**P, R](name: str, function: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+    return function(*args, **kwargs)
 
-    l1 = cps_convert_program(l2, fresh)
 
-    module = to_ast_program(l1)
+def compile_program(program: Any, options: Options, profile: Profiler | None = None) -> str | bytes:
+    from . import pipeline
 
-    (output or input.with_suffix(".py")).write_text(module)
+    return pipeline.compile_program(program, options, [profile.run] if profile is not None else [])
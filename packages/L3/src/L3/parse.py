@@ -1,18 +1,52 @@
-from collections.abc import Sequence
+import mmap
+import re
+from collections.abc import Iterator, Sequence
+from functools import cache
 from pathlib import Path
+from typing import Literal, TextIO
 
-from lark import Lark, Token, Transformer
-from lark.visitors import v_args  # pyright: ignore[reportUnknownVariableType]
+from pydantic import TypeAdapter
 
+from .standalone import (  # pyright: ignore[reportUnknownVariableType]
+    Lark,
+    Lark_StandAlone,
+    Token,
+    Transformer,
+    UnexpectedInput,
+    v_args,
+)
 from .syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
     Identifier,
+    Immediate,
     Let,
+    LetRec,
+    Load,
+    Primitive,
     Program,
+    Reference,
+    Store,
     Term,
 )
 
 
 class AstTransformer(Transformer[Token, Program | Term]):
+    def IDENTIFIER(
+        self,
+        token: Token,
+    ) -> Identifier:
+        return str(token)
+
+    def INTEGER(
+        self,
+        token: Token,
+    ) -> int:
+        return int(token)
+
     @v_args(inline=True)
     def program(
         self,
@@ -57,7 +91,7 @@ class AstTransformer(Transformer[Token, Program | Term]):
         bindings: Sequence[tuple[Identifier, Term]],
         body: Term,
     ) -> Term:
-        return Let(
+        return LetRec(
             bindings=bindings,
             body=body,
         )
@@ -76,16 +110,652 @@ class AstTransformer(Transformer[Token, Program | Term]):
     ) -> tuple[Identifier, Term]:
         return name, value
 
+    @v_args(inline=True)
+    def reference(
+        self,
+        name: Identifier,
+    ) -> Term:
+        return Reference(
+            name=name,
+        )
+
+    @v_args(inline=True)
+    def abstract(
+        self,
+        _lambda: Token,
+        parameters: Sequence[Identifier],
+        body: Term,
+    ) -> Term:
+        return Abstract(
+            parameters=parameters,
+            body=body,
+        )
+
+    @v_args(inline=True)
+    def apply(
+        self,
+        target: Term,
+        *arguments: Term,
+    ) -> Term:
+        return Apply(
+            target=target,
+            arguments=list(arguments),
+        )
+
+    @v_args(inline=True)
+    def immediate(
+        self,
+        value: int,
+    ) -> Term:
+        return Immediate(
+            value=value,
+        )
+
+    @v_args(inline=True)
+    def primitive(
+        self,
+        operator: Token,
+        left: Term,
+        right: Term,
+    ) -> Term:
+        return Primitive(
+            operator=operator.value,  # pyright: ignore[reportArgumentType]
+            left=left,
+            right=right,
+        )
+
+    @v_args(inline=True)
+    def branch(
+        self,
+        _if: Token,
+        operator: Token,
+        left: Term,
+        right: Term,
+        consequent: Term,
+        otherwise: Term,
+    ) -> Term:
+        return Branch(
+            operator=operator.value,  # pyright: ignore[reportArgumentType]
+            left=left,
+            right=right,
+            consequent=consequent,
+            otherwise=otherwise,
+        )
+
+    @v_args(inline=True)
+    def allocate(
+        self,
+        _allocate: Token,
+        count: int,
+    ) -> Term:
+        return Allocate(
+            count=count,
+        )
+
+    @v_args(inline=True)
+    def load(
+        self,
+        _load: Token,
+        base: Term,
+        index: int,
+    ) -> Term:
+        return Load(
+            base=base,
+            index=index,
+        )
+
+    @v_args(inline=True)
+    def store(
+        self,
+        _store: Token,
+        base: Term,
+        index: int,
+        value: Term,
+    ) -> Term:
+        return Store(
+            base=base,
+            index=index,
+            value=value,
+        )
+
+    @v_args(inline=True)
+    def begin(
+        self,
+        _begin: Token,
+        *terms: Term,
+    ) -> Term:
+        *effects, value = terms
+        return Begin(
+            effects=effects,
+            value=value,
+        )
+
+
+@cache
+def parser() -> Lark:
+    # standalone.py is pregenerated from L3.lark, so no grammar is compiled at runtime; regenerate it with
+    #   python -m lark.tools.standalone -s program -s term L3.lark -o standalone.py
+    # the transformer runs inline during LALR parsing, so no intermediate parse tree is built
+    return Lark_StandAlone(transformer=AstTransformer())
+
+
+def parse(source: str, start: Literal["program", "term"]) -> Program | Term:
+    # a syntax error is a ValueError, as it is from the reader, so that callers need not know lark's exceptions
+    try:
+        return parser().parse(source, start=start)  # pyright: ignore[reportUnknownMemberType, reportReturnType]
+
+    except UnexpectedInput as error:
+        raise ValueError(str(error).strip()) from None
+
 
 def parse_term(source: str) -> Term:
-    grammar = Path(__file__).with_name("L3.lark").read_text()
-    parser = Lark(grammar, start="term")
-    tree = parser.parse(source)  # pyright: ignore[reportUnknownMemberType]
-    return AstTransformer().transform(tree)  # pyright: ignore[reportReturnType]
+    return parse(source, "term")  # pyright: ignore[reportReturnType]
 
 
 def parse_program(source: str) -> Program:
-    grammar = Path(__file__).with_name("L3.lark").read_text()
-    parser = Lark(grammar, start="program")
-    tree = parser.parse(source)  # pyright: ignore[reportUnknownMemberType]
-    return AstTransformer().transform(tree)  # pyright: ignore[reportReturnType]
+    return parse(source, "program")  # pyright: ignore[reportReturnType]
+
+
+# A dependency-free, non-recursive alternative to the Lark front end. Tokens are matched directly
+# against a bytes-like buffer (including an mmap), and nodes are built with an explicit stack of
+# open forms, so nesting depth is bounded only by memory.
+
+type Buffer = str | bytes | bytearray | memoryview | mmap.mmap
+
+type Kind = Literal["program", "term", "parameters", "bindings", "binding", "comparison"]
+
+type Item = Term | Sequence[Identifier] | Sequence[tuple[Identifier, Term]] | tuple[Identifier, Term] | str
+
+_TOKEN = re.compile(rb"\s+|;[^\n]*|([()])|([^\s();]+)")
+_IDENTIFIER = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+_INTEGER = re.compile(r"-?[0-9]+")
+
+_LAMBDA = frozenset(["\\", "lambda", "λ"])
+_KEYWORDS = frozenset(["l3", "let", "letrec", "if", "allocate", "load", "store", "begin", *_LAMBDA])
+_OPERATORS = frozenset(["+", "-", "*"])
+_COMPARATORS = frozenset(["<", "=="])
+
+
+class _Form:
+    __slots__ = ("kind", "items", "offset")
+
+    def __init__(self, kind: Kind, offset: int) -> None:
+        self.kind: Kind = kind
+        self.items: list[Item] = []
+        self.offset = offset
+
+    def head(self) -> str | None:
+        match self.items:
+            case [str() as head, *_]:
+                return head
+
+            case _:
+                return None
+
+    def expects(self) -> Kind:
+        # the kind of the next nested form, determined by the enclosing form and its position
+        index = len(self.items)
+
+        match self.kind, self.head():
+            case "program", _:
+                return "parameters" if index == 1 else "term"
+
+            case "bindings", _:
+                return "binding"
+
+            case "term", "let" | "letrec" if index == 1:
+                return "bindings"
+
+            case "term", head if head in _LAMBDA and index == 1:
+                return "parameters"
+
+            case "term", "if" if index == 1:
+                return "comparison"
+
+            case _:
+                return "term"
+
+
+def _atom(form: _Form, text: str, offset: int) -> Item:
+    match form.kind, len(form.items):
+        case "program", 0:
+            if text != "l3":
+                raise ValueError(f"expected 'l3' at offset {offset}, found {text!r}")
+            return text
+
+        case "parameters", _:
+            return _identifier(text, offset)
+
+        case "binding", 0:
+            return _identifier(text, offset)
+
+        case "comparison", 0:
+            if text not in _COMPARATORS:
+                raise ValueError(f"expected comparator at offset {offset}, found {text!r}")
+            return text
+
+        case "term", 0 if text in _KEYWORDS or text in _OPERATORS:
+            return text
+
+        case "bindings", _:
+            raise ValueError(f"expected binding at offset {offset}, found {text!r}")
+
+        case _:
+            return _term(text, offset)
+
+
+def _identifier(text: str, offset: int) -> Identifier:
+    if not _IDENTIFIER.fullmatch(text):
+        raise ValueError(f"expected identifier at offset {offset}, found {text!r}")
+    return text
+
+
+def _term(text: str, offset: int) -> Term:
+    if _INTEGER.fullmatch(text):
+        return Immediate(value=int(text))
+
+    if text not in _KEYWORDS and _IDENTIFIER.fullmatch(text):
+        return Reference(name=text)
+
+    raise ValueError(f"unexpected {text!r} at offset {offset}")
+
+
+def _index(item: Item, offset: int) -> int:
+    match item:
+        case Immediate(value=value):
+            return value
+
+        case _:
+            raise ValueError(f"expected index in form at offset {offset}")
+
+
+def _close(form: _Form) -> Item:
+    match form.kind, form.items:
+        case "program", ["l3", list() as parameters, body]:
+            return Program(parameters=parameters, body=body)  # pyright: ignore[reportArgumentType]
+
+        case "parameters", parameters:
+            return parameters  # pyright: ignore[reportReturnType]
+
+        case "bindings", bindings:
+            return bindings  # pyright: ignore[reportReturnType]
+
+        case "binding", [str() as name, value]:
+            return name, value  # pyright: ignore[reportReturnType]
+
+        case "comparison", [str(), _, _]:
+            return form.items  # pyright: ignore[reportReturnType]
+
+        case "term", ["let", list() as bindings, body]:
+            return Let(bindings=bindings, body=body)  # pyright: ignore[reportArgumentType]
+
+        case "term", ["letrec", list() as bindings, body]:
+            return LetRec(bindings=bindings, body=body)  # pyright: ignore[reportArgumentType]
+
+        case "term", [str() as head, list() as parameters, body] if head in _LAMBDA:
+            return Abstract(parameters=parameters, body=body)  # pyright: ignore[reportArgumentType]
+
+        case "term", ["if", [str() as operator, left, right], consequent, otherwise]:
+            return Branch(
+                operator=operator,  # pyright: ignore[reportArgumentType]
+                left=left,  # pyright: ignore[reportArgumentType]
+                right=right,  # pyright: ignore[reportArgumentType]
+                consequent=consequent,  # pyright: ignore[reportArgumentType]
+                otherwise=otherwise,  # pyright: ignore[reportArgumentType]
+            )
+
+        case "term", ["allocate", count]:
+            return Allocate(count=_index(count, form.offset))
+
+        case "term", ["load", base, index]:
+            return Load(base=base, index=_index(index, form.offset))  # pyright: ignore[reportArgumentType]
+
+        case "term", ["store", base, index, value]:
+            return Store(base=base, index=_index(index, form.offset), value=value)  # pyright: ignore[reportArgumentType]
+
+        case "term", ["begin", *effects, value] if not isinstance(value, str):
+            return Begin(effects=effects, value=value)  # pyright: ignore[reportArgumentType]
+
+        case "term", [str() as operator, left, right] if operator in _OPERATORS:
+            return Primitive(operator=operator, left=left, right=right)  # pyright: ignore[reportArgumentType]
+
+        case "term", [target, *arguments] if not isinstance(target, str):
+            return Apply(target=target, arguments=arguments)  # pyright: ignore[reportArgumentType]
+
+        case _:
+            raise ValueError(f"malformed {form.kind} at offset {form.offset}")
+
+
+def read(source: Buffer, start: Literal["program", "term"]) -> Program | Term:
+    buffer = source.encode() if isinstance(source, str) else source
+    stack: list[_Form] = []
+    result: list[Item] = []
+
+    for match in _TOKEN.finditer(buffer):  # pyright: ignore[reportCallIssue, reportArgumentType]
+        parenthesis, atom = match.groups()
+        offset = match.start()
+
+        if parenthesis == b"(":
+            if stack:
+                kind = stack[-1].expects()
+            elif not result:
+                kind = start
+            else:
+                raise ValueError(f"unexpected '(' at offset {offset}")
+            stack.append(_Form(kind, offset))
+
+        elif parenthesis == b")":
+            if not stack:
+                raise ValueError(f"unexpected ')' at offset {offset}")
+            item = _close(stack.pop())
+            (stack[-1].items if stack else result).append(item)
+
+        elif atom is not None:
+            text = atom.decode()
+            if stack:
+                stack[-1].items.append(_atom(stack[-1], text, offset))
+            elif start == "term" and not result:
+                result.append(_term(text, offset))
+            else:
+                raise ValueError(f"unexpected {text!r} at offset {offset}")
+
+    if stack:
+        raise ValueError(f"unclosed form at offset {stack[-1].offset}")
+
+    match result:
+        case [item]:
+            return item  # pyright: ignore[reportReturnType]
+
+        case _:
+            raise ValueError(f"expected exactly one {start}")
+
+
+def read_term(source: Buffer) -> Term:
+    return read(source, "term")  # pyright: ignore[reportReturnType]
+
+
+def read_program(source: Buffer) -> Program:
+    return read(source, "program")  # pyright: ignore[reportReturnType]
+
+
+def read_program_file(path: Path) -> Program:
+    with path.open("rb") as file:
+        if path.stat().st_size == 0:
+            return read_program(b"")
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return read_program(buffer)
+
+
+# A document is a program read together with the span of every form in its source, so that after a text edit only the
+# smallest form enclosing the edit is read again and spliced into the previous program; every other node is reused as
+# the same object. A form is placed by its gap from the end of its previous sibling (or from the start of its parent),
+# so an edit changes the lengths of the forms around it and nothing else. Offsets are into the UTF-8 source, as in
+# the reader's error messages.
+
+
+class _Span:
+    __slots__ = ("kind", "length", "item", "items", "children")
+
+    def __init__(self, kind: Kind, length: int, item: Item, items: list[Item], children: list[_Child]) -> None:
+        self.kind: Kind = kind
+        self.length = length
+        self.item = item
+        self.items = items
+        self.children = children
+
+
+# gap, index in the parent's items, span
+type _Child = tuple[int, int, _Span]
+
+
+class _Open(_Form):
+    __slots__ = ("children", "end")
+
+    def __init__(self, kind: Kind, offset: int) -> None:
+        super().__init__(kind, offset)
+        self.children: list[_Child] = []
+        # of the last nested form
+        self.end = offset
+
+
+class Document:
+    __slots__ = ("source", "gap", "root")
+
+    def __init__(self, source: bytes, gap: int, root: _Span) -> None:
+        self.source = source
+        self.gap = gap
+        self.root = root
+
+    @property
+    def program(self) -> Program:
+        return self.root.item  # pyright: ignore[reportReturnType]
+
+
+def _read_form(buffer: bytes, kind: Kind, start: int, end: int, reuse: dict[int, _Span]) -> tuple[int, _Span]:
+    # reads the one form of the given kind in buffer[start:end]; a nested form that starts at an offset in `reuse` and
+    # is of the kind expected there is taken as is instead of being read again
+    stack: list[_Open] = []
+    result: tuple[int, _Span] | None = None
+    position = start
+
+    while position < end:
+        # every character starts a token, so this always matches
+        match = _TOKEN.match(buffer, position, end)
+        parenthesis, atom = match.groups()  # pyright: ignore[reportOptionalMemberAccess]
+        offset, position = match.span()  # pyright: ignore[reportOptionalMemberAccess]
+
+        if parenthesis == b"(":
+            if result is not None:
+                raise ValueError(f"unexpected '(' at offset {offset}")
+            if not stack:
+                stack.append(_Open(kind, offset))
+                continue
+
+            parent = stack[-1]
+            span = reuse.get(offset)
+            if span is None or span.kind != parent.expects():
+                stack.append(_Open(parent.expects(), offset))
+                continue
+
+            parent.children.append((offset - parent.end, len(parent.items), span))
+            parent.items.append(span.item)
+            parent.end = position = offset + span.length
+
+        elif parenthesis == b")":
+            if not stack:
+                raise ValueError(f"unexpected ')' at offset {offset}")
+            form = stack.pop()
+            span = _Span(form.kind, position - form.offset, _close(form), form.items, form.children)
+            if not stack:
+                result = form.offset - start, span
+                continue
+
+            parent = stack[-1]
+            parent.children.append((form.offset - parent.end, len(parent.items), span))
+            parent.items.append(span.item)
+            parent.end = position
+
+        elif atom is not None:
+            text = atom.decode()
+            if not stack:
+                raise ValueError(f"unexpected {text!r} at offset {offset}")
+            stack[-1].items.append(_atom(stack[-1], text, offset))
+
+    if stack:
+        raise ValueError(f"unclosed form at offset {stack[-1].offset}")
+
+    if result is None:
+        raise ValueError(f"expected exactly one {kind}")
+
+    return result
+
+
+def read_document(source: Buffer) -> Document:
+    buffer = source.encode() if isinstance(source, str) else bytes(source)
+    gap, root = _read_form(buffer, "program", 0, len(buffer), {})
+    return Document(buffer, gap, root)
+
+
+def reread_document(document: Document, start: int, end: int, text: str | bytes) -> Document:
+    # the document with source[start:end] replaced by text
+    if not 0 <= start <= end <= len(document.source):
+        raise ValueError(f"edit {start}:{end} outside of the document")
+
+    replacement = text.encode() if isinstance(text, str) else text
+    source = document.source[:start] + replacement + document.source[end:]
+    delta = len(replacement) - (end - start)
+
+    # the forms whose parentheses strictly enclose the edit, outermost first, with their offsets and their entries in
+    # their parents' children
+    path: list[tuple[_Span, int, int]] = []
+    span, offset, entry = document.root, document.gap, -1
+    while offset < start and end < offset + span.length:
+        path.append((span, offset, entry))
+        parent, previous = span, offset
+        # the only child that can enclose the edit is the last one to start before its end
+        for index, (gap, _, child) in enumerate(parent.children):
+            if previous + gap >= end:
+                break
+            span, offset, entry, previous = child, previous + gap, index, previous + gap + child.length
+        if span is parent:
+            break
+
+    # the edit may have unbalanced the innermost of them, e.g. by closing it early, so it is retried in the next one out
+    for depth in reversed(range(len(path))):
+        span, offset, _ = path[depth]
+        reuse: dict[int, _Span] = {}
+        previous = offset
+        for gap, _, child in span.children:
+            if previous + gap + child.length <= start:
+                reuse[previous + gap] = child
+            elif previous + gap >= end:
+                reuse[previous + gap + delta] = child
+            previous += gap + child.length
+
+        try:
+            _, spliced = _read_form(source, span.kind, offset, offset + span.length + delta, reuse)
+            for level in reversed(range(depth)):
+                parent, parent_offset, _ = path[level]
+                entry = path[level + 1][2]
+                gap, index, _ = parent.children[entry]
+                form = _Form(parent.kind, parent_offset)
+                form.items = [*parent.items]
+                form.items[index] = spliced.item
+                children = [*parent.children]
+                children[entry] = gap, index, spliced
+                spliced = _Span(parent.kind, parent.length + delta, _close(form), form.items, children)
+
+        except ValueError:
+            continue
+
+        return Document(source, document.gap, spliced)
+
+    return read_document(source)
+
+
+# JSON ASTs, as emitted by upstream generators and the examples' .json twins, are validated straight from
+# bytes into Program without going through the surface syntax.
+
+
+@cache
+def program_adapter() -> TypeAdapter[Program]:
+    return TypeAdapter(Program)
+
+
+def parse_program_json(source: str | bytes) -> Program:
+    return program_adapter().validate_json(source)
+
+
+type InputFormat = Literal["auto", "l3", "json"]
+
+type Parser = Literal["lark", "reader"]
+
+
+def load_program(path: Path, input_format: InputFormat = "auto", parser: Parser = "lark") -> Program:
+    if input_format == "auto":
+        input_format = "json" if path.suffix == ".json" else "l3"
+
+    match input_format, parser:
+        case "json", _:
+            return parse_program_json(path.read_bytes())
+
+        case _, "reader":
+            return read_program_file(path)
+
+        case _:
+            return parse_program(path.read_text())
+
+
+def parse_source(source: str, input_format: Literal["l3", "json"] = "l3", parser: Parser = "lark") -> Program:
+    match input_format, parser:
+        case "json", _:
+            return parse_program_json(source)
+
+        case _, "reader":
+            return read_program(source)
+
+        case _:
+            return parse_program(source)
+
+
+# Many programs concatenated in one stream are split on their top-level parentheses and each one is parsed as
+# soon as it is closed, so only the program being read is held in memory.
+
+_DELIMITER = re.compile(r"[();\n]")
+
+_SPACE = re.compile(r"\s*")
+
+
+def iter_programs(stream: TextIO, parser: Parser = "lark", chunk_size: int = 1 << 16) -> Iterator[Program]:
+    parse = read_program if parser == "reader" else parse_program
+    pending: list[str] = []
+    depth = 0
+    comment = False
+
+    while chunk := stream.read(chunk_size):
+        start = 0
+
+        for token in _DELIMITER.finditer(chunk):
+            delimiter = token.group()
+
+            if comment:
+                comment = delimiter != "\n"
+                if not comment and depth == 0:
+                    start = token.end()
+                continue
+
+            if depth == 0 and not _SPACE.fullmatch(chunk, start, token.start()):
+                raise ValueError(f"unexpected text between programs: {chunk[start : token.start()]!r}")
+
+            match delimiter:
+                case ";":
+                    comment = True
+
+                case "(":
+                    if depth == 0:
+                        start = token.start()
+                    depth += 1
+
+                case ")" if depth == 0:
+                    raise ValueError("unexpected ')' between programs")
+
+                case ")":
+                    depth -= 1
+                    if depth == 0:
+                        pending.append(chunk[start : token.end()])
+                        yield parse("".join(pending))
+                        pending.clear()
+                        start = token.end()
+
+                case _:
+                    if depth == 0:
+                        start = token.end()
+
+        if depth:
+            pending.append(chunk[start:])
+        elif not comment and not _SPACE.fullmatch(chunk, start):
+            raise ValueError(f"unexpected text between programs: {chunk[start:]!r}")
+
+    if depth:
+        raise ValueError("unclosed program at end of input")
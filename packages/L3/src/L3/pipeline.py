@@ -0,0 +1,338 @@
+from collections.abc import Callable, Sequence
+from functools import partial
+from pathlib import Path
+from typing import Any, Literal, NamedTuple
+
+import click
+
+# The stages of a compile, as a registered sequence of passes. Each pass names the language it reads and the one it
+# writes, and a compile starts from L3 and runs, in order, every enabled pass that reads the language the previous one
+# wrote, until it reaches the language to emit. The passes that rewrite a language in place all run before the compile
+# leaves it, so that an emitted L3 or L2 program is the one the later stages would have been given. A pass registered
+# first takes precedence: front_end does the work of check, uniqify and eliminate_letrec in one traversal, unless L3 is
+# to be emitted or --threads asks for more than one, and cps_to_python that of cps_convert and L1's to_python, so that
+# no L1 tree is built unless L1 or L0 is asked for. front_end draws names in traversal order, so it runs on one thread;
+# with more, check and eliminate_letrec spread the bindings of a Let over them instead, and uniqify keeps the names what
+# front_end would make. --no-fuse runs the separate passes instead (say, to profile them). L1 goes to Python directly
+# unless L0 is asked for. Optimizer passes are enabled by the -O level. Every pass runs through the hooks, each of which
+# is given the pass's name, a function that runs the rest of it and its input, so that a hook can time a pass, skip it
+# by returning its input, or answer it from a cache. Pass modules are imported when a pass first runs, so that importing
+# this stays cheap.
+#
+# An emitted IR can be written as JSON or in util.serialize's binary format, and a compile can resume from either:
+# it starts at the language of the program it is given. Such a program has been renamed already, so the names that
+# the later passes make up only have to avoid the ones in it.
+
+type Language = Literal["l3", "l2", "l1", "l0", "python"]
+
+LANGUAGES: list[Language] = ["l3", "l2", "l1", "l0", "python"]
+
+
+class Options(NamedTuple):
+    check: bool = True
+    level: int = 1
+    emit: Language = "python"
+    via_l0: bool = False
+    ir_format: Literal["json", "binary"] = "json"
+    fuse: bool = True
+    inline_threshold: int = 16
+
+
+class Context:
+    # what a pass leaves for later ones: the name generator, which uniqify replaces with one that has seen every name
+    # in the program
+    __slots__ = ("options", "fresh")
+
+    def __init__(self, options: Options) -> None:
+        from util.sequential_name_generator import SequentialNameGenerator
+
+        self.options = options
+        self.fresh: Callable[[str], str] = SequentialNameGenerator()
+
+
+class Pass(NamedTuple):
+    name: str
+    source: Language
+    target: Language
+    run: Callable[[Any, Context], Any]
+    enabled: Callable[[Options], bool]
+
+
+type Hook = Callable[[str, Callable[[Any], Any], Any], Any]
+
+PASSES: list[Pass] = []
+
+
+def _always(options: Options) -> bool:
+    return True
+
+
+def _checking(options: Options) -> bool:
+    return options.check
+
+
+def _fusing(options: Options) -> bool:
+    from util.parallel import parallel_enabled
+
+    return options.fuse and options.check and options.emit != "l3" and not parallel_enabled()
+
+
+def _fusing_back_end(options: Options) -> bool:
+    return options.fuse and options.emit == "python" and not options.via_l0
+
+
+def _via_l0(options: Options) -> bool:
+    return options.via_l0 or options.emit == "l0"
+
+
+def at_level(level: int) -> Callable[[Options], bool]:
+    def enabled(options: Options) -> bool:
+        return options.level >= level
+
+    return enabled
+
+
+def register[F: Callable[[Any, Context], Any]](
+    name: str,
+    source: Language,
+    target: Language,
+    enabled: Callable[[Options], bool] = _always,
+) -> Callable[[F], F]:
+    def decorator(run: F) -> F:
+        PASSES.append(Pass(name, source, target, run, enabled))
+        return run
+
+    return decorator
+
+
+@register("front_end", "l3", "l2", enabled=_fusing)
+def _front_end(program: Any, context: Context) -> Any:
+    from .check import CheckError
+    from .front_end import front_end_program
+
+    try:
+        context.fresh, program = front_end_program(program)
+
+    except CheckError as error:
+        raise click.ClickException(str(error)) from None
+    return program
+
+
+@register("check", "l3", "l3", enabled=_checking)
+def _check(program: Any, context: Context) -> Any:
+    from .check import diagnose_program
+
+    if diagnostics := diagnose_program(program):
+        raise click.ClickException("\n".join(diagnostics))
+    return program
+
+
+@register("uniqify", "l3", "l3")
+def _uniqify(program: Any, context: Context) -> Any:
+    from .uniqify import uniqify_program
+
+    context.fresh, program = uniqify_program(program)
+    return program
+
+
+@register("eliminate_letrec", "l3", "l2")
+def _eliminate_letrec(program: Any, context: Context) -> Any:
+    from .eliminate_letrec import eliminate_letrec_program
+
+    return eliminate_letrec_program(program)
+
+
+@register("optimize", "l2", "l2", enabled=at_level(1))
+def _optimize(program: Any, context: Context) -> Any:
+    from L2.optimize import optimize_program
+
+    return optimize_program(program)
+
+
+@register("scalar_replace", "l2", "l2", enabled=at_level(3))
+def _scalar_replace(program: Any, context: Context) -> Any:
+    from L2.scalar_replace import scalar_replace_program
+
+    return scalar_replace_program(program, context.fresh)
+
+
+@register("inline", "l2", "l2", enabled=at_level(2))
+def _inline(program: Any, context: Context) -> Any:
+    from L2.optimize import CostModel, inline_program
+
+    return inline_program(program, context.fresh, CostModel(threshold=context.options.inline_threshold))
+
+
+@register("cps_to_python", "l2", "python", enabled=_fusing_back_end)
+def _cps_to_python(program: Any, context: Context) -> Any:
+    from L2.cps_to_python import cps_to_python_program
+
+    return cps_to_python_program(program, context.fresh)
+
+
+@register("cps_convert", "l2", "l1")
+def _cps_convert(program: Any, context: Context) -> Any:
+    from L2.cps_convert import cps_convert_program
+
+    return cps_convert_program(program, context.fresh)
+
+
+@register("closure_convert", "l1", "l0", enabled=_via_l0)
+def _closure_convert(program: Any, context: Context) -> Any:
+    from L1.closure_convert import closure_convert_program
+
+    return closure_convert_program(program, context.fresh)
+
+
+@register("to_python", "l1", "python")
+def _l1_to_python(program: Any, context: Context) -> Any:
+    from L1.to_python import to_ast_program
+
+    return to_ast_program(program)
+
+
+@register("to_python", "l0", "python")
+def _l0_to_python(program: Any, context: Context) -> Any:
+    from L0.to_python import to_ast_program
+
+    return to_ast_program(program)
+
+
+def plan(options: Options, start: Language = "l3") -> list[Pass]:
+    if LANGUAGES.index(start) > LANGUAGES.index(options.emit):
+        raise click.UsageError(f"cannot emit {options.emit} from an {start} program")
+
+    language = start
+    passes: list[Pass] = []
+    for pass_ in PASSES:
+        if pass_.source != language or not pass_.enabled(options):
+            continue
+        if language == options.emit and pass_.target != language:
+            break
+        passes.append(pass_)
+        language = pass_.target
+    return passes
+
+
+def run_passes(program: Any, options: Options, hooks: Sequence[Hook] = ()) -> Any:
+    # the program in options.emit
+    context = Context(options)
+    if program.tag != "l3":
+        context.fresh = _avoiding(program)
+    for pass_ in plan(options, program.tag):
+        proceed: Callable[[Any], Any] = partial(pass_.run, context=context)
+        for hook in reversed(hooks):
+            proceed = partial(hook, pass_.name, proceed)
+        program = proceed(program)
+    return program
+
+
+def _avoiding(program: Any) -> Callable[[str], str]:
+    from pydantic import BaseModel
+    from util.sequential_name_generator import SequentialNameGenerator
+
+    taken: set[str] = set()
+    stack = [program]
+    while stack:
+        match stack.pop():
+            case BaseModel() as node:
+                stack.extend(getattr(node, name) for name in type(node).model_fields)
+
+            case list() | tuple() as items:
+                stack.extend(items)  # pyright: ignore[reportUnknownArgumentType]
+
+            case str() as name:
+                taken.add(name)
+
+            case _:
+                pass
+
+    generate = SequentialNameGenerator()
+
+    def fresh(candidate: str) -> str:
+        while (name := generate(candidate)) in taken:
+            pass
+        return name
+
+    return fresh
+
+
+def compile_program(program: Any, options: Options, hooks: Sequence[Hook] = ()) -> str | bytes:
+    # Python source, or the IR to emit as JSON or in the binary format
+    result = run_passes(program, options, hooks)
+    match options.emit, options.ir_format:
+        case "python", _:
+            return result
+
+        case _, "json":
+            return result.model_dump_json()
+
+        case _:
+            from util.serialize import dumps
+
+            return dumps(result)
+
+
+def output_suffix(options: Options) -> str:
+    match options.emit, options.ir_format:
+        case "python", _:
+            return ".py"
+
+        case emit, "json":
+            return f".{emit}.json"
+
+        case emit, "binary":  # pragma: no branch
+            return f".{emit}.ir"
+
+
+def write_output(path: Path, module: str | bytes) -> None:
+    if isinstance(module, bytes):
+        path.write_bytes(module)
+    else:
+        path.write_text(module)
+
+
+_SYNTAX = {"l3": "L3.syntax", "l2": "L2.syntax", "l1": "L1.syntax", "l0": "L0.syntax"}
+
+
+def _classes(tag: str) -> list[Any]:
+    import importlib
+
+    from pydantic import BaseModel
+
+    if tag not in _SYNTAX:
+        raise ValueError(f"serialized IR is not a program: {tag!r}")
+    return [
+        value
+        for value in vars(importlib.import_module(_SYNTAX[tag])).values()
+        if isinstance(value, type) and issubclass(value, BaseModel) and "tag" in value.model_fields
+    ]
+
+
+def load_ir(path: Path) -> Any:
+    # a program of any level in the binary format
+    from util.serialize import load_file
+
+    return load_file(path, _classes)
+
+
+def preload() -> None:
+    # imports every pass module
+    import importlib
+
+    for module in [
+        "L0.syntax",
+        "L0.to_python",
+        "L1.closure_convert",
+        "L1.to_python",
+        "L2.cps_convert",
+        "L2.cps_to_python",
+        "L2.optimize",
+        "L2.scalar_replace",
+        "L3.check",
+        "L3.eliminate_letrec",
+        "L3.front_end",
+        "L3.uniqify",
+        "util.serialize",
+    ]:
+        importlib.import_module(module)
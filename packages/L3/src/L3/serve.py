@@ -0,0 +1,166 @@
+import io
+import json
+import os
+import socket
+import socketserver
+import struct
+from pathlib import Path
+from typing import Literal, TypedDict
+
+import click
+
+# `l3 serve` keeps one process with the parser built and every pass imported, and compiles the requests that `l3`
+# forwards to it over a Unix socket, so a build that compiles many small programs pays for startup once. A request is
+# one line of JSON and so is its response. Requests are served one at a time, since the passes share process-wide
+# state such as the validation switch. The client side is imported at startup by `l3`, so it only uses the standard
+# library and the types here are plain dicts. The default socket may be in the shared /tmp, where another user could
+# bind it first, so a request is only sent to a server run by the same user.
+
+
+class Request(TypedDict):
+    source: str
+    output: str
+    input_format: Literal["l3", "json"]
+    parser: Literal["lark", "reader"]
+    check: bool
+    level: int
+    emit: Literal["l3", "l2", "l1", "l0", "python"]
+    via_l0: bool
+    ir_format: Literal["json", "binary"]
+    fuse: bool
+    inline_threshold: int
+    validate: bool
+    threads: int
+    stream: bool
+
+
+class Response(TypedDict, total=False):
+    # 0 on success, otherwise the exit status of the failed compile along with its message
+    status: int
+    message: str
+
+
+def default_socket() -> Path:
+    return Path(os.environ.get("XDG_RUNTIME_DIR", "/tmp")) / f"l3-{os.getuid()}.sock"
+
+
+def _connect(path: Path) -> socket.socket | None:
+    # None when no server is listening on path
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+
+    return client
+
+
+def _owned(client: socket.socket, path: Path) -> bool:
+    # whether the server on the other end runs as this user, by its credentials where the platform has them
+    if hasattr(socket, "SO_PEERCRED"):
+        credentials = client.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", credentials)
+        return uid == os.getuid()
+    return path.stat().st_uid == os.getuid()
+
+
+def forward(path: Path, request: Request) -> Response | None:
+    # None when no server of this user's is running
+    client = _connect(path)
+    if client is None:
+        return None
+    if not _owned(client, path):
+        client.close()
+        return None
+
+    with client, client.makefile("rb") as file:
+        client.sendall(json.dumps(request).encode() + b"\n")
+        line = file.readline()
+
+    # a server that hung up without answering is no server: the compile runs here instead
+    return json.loads(line) if line else None
+
+
+def compile_request(request: Request) -> None:
+    from util.construct import enable_validation
+    from util.parallel import set_workers
+
+    from .parse import iter_programs, parse_source
+    from .pipeline import Options, compile_program, write_output
+
+    enable_validation(request["validate"])
+    set_workers(request["threads"])
+    output = Path(request["output"])
+    options = Options(
+        request["check"],
+        request["level"],
+        request["emit"],
+        request["via_l0"],
+        request["ir_format"],
+        request["fuse"],
+        request["inline_threshold"],
+    )
+
+    if request["stream"]:
+        programs = iter_programs(io.StringIO(request["source"]), request["parser"])
+        for index, l3 in enumerate(programs):
+            module = compile_program(l3, options)
+            write_output(output.with_stem(f"{output.stem}_{index}"), module)
+
+    else:
+        l3 = parse_source(request["source"], request["input_format"], request["parser"])
+        module = compile_program(l3, options)
+        write_output(output, module)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            # a client that hung up without asking, such as one that found the server isn't its user's
+            return
+
+        response: Response
+        try:
+            compile_request(json.loads(line))
+            response = {"status": 0}
+
+        except click.ClickException as error:
+            response = {"status": error.exit_code, "message": error.format_message()}
+
+        except (ValueError, OSError) as error:
+            response = {"status": 1, "message": str(error)}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class Server(socketserver.UnixStreamServer):
+    def __init__(self, path: Path, idle_timeout: float | None = None) -> None:
+        if (client := _connect(path)) is not None:
+            client.close()
+            raise click.ClickException(f"already serving on {path}")
+        # left behind by a server that did not shut down cleanly
+        path.unlink(missing_ok=True)
+
+        from .main import preload
+
+        preload()
+
+        super().__init__(str(path), _Handler)
+        self.path = path
+        self.timeout = idle_timeout
+        self.idle = False
+
+    def handle_timeout(self) -> None:
+        self.idle = True
+
+    def serve_until_idle(self) -> None:
+        # serves until no request has come for idle_timeout seconds, or forever without one
+        try:
+            while not self.idle:
+                self.handle_request()
+
+        finally:
+            self.path.unlink(missing_ok=True)
@@ -1,7 +1,8 @@
 from collections.abc import Callable, Mapping
-from functools import partial
 
+from util.construct import replace
 from util.sequential_name_generator import SequentialNameGenerator
+from util.traverse import Dispatch, Step, run, sequence
 
 from .syntax import (
     Abstract,
@@ -22,50 +23,114 @@ from .syntax import (
 
 type Context = Mapping[str, str]
 
+type Fresh = Callable[[str], str]
+
+_term = Dispatch[Term]()
+
+
+@_term.register(Let)
+def _let(term: Let, context: Context, fresh: Fresh) -> Step[Term]:
+    local = {name: fresh(name) for name, _ in term.bindings}
+    values = yield sequence(_term(value, context, fresh) for _, value in term.bindings)
+    return replace(
+        term,
+        bindings=[(local[name], value) for (name, _), value in zip(term.bindings, values)],
+        body=(yield _term(term.body, {**context, **local}, fresh)),
+    )
+
+
+@_term.register(LetRec)
+def _letrec(term: LetRec, context: Context, fresh: Fresh) -> Step[Term]:
+    local = {name: fresh(name) for name, _ in term.bindings}
+    values = yield sequence(_term(value, {**context, **local}, fresh) for _, value in term.bindings)
+    return replace(
+        term,
+        bindings=[(local[name], value) for (name, _), value in zip(term.bindings, values)],
+        body=(yield _term(term.body, {**context, **local}, fresh)),
+    )
+
+
+@_term.register(Reference)
+def _reference(term: Reference, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(term, name=context[term.name])
 
-def uniqify_term(
-    term: Term,
-    context: Context,
-    fresh: Callable[[str], str],
-) -> Term:
-    _term = partial(uniqify_term, context=context, fresh=fresh)
 
-    match term:
-        case Let(bindings=bindings, body=body):
-            pass
+@_term.register(Abstract)
+def _abstract(term: Abstract, context: Context, fresh: Fresh) -> Step[Term]:
+    local = {parameter: fresh(parameter) for parameter in term.parameters}
+    return replace(
+        term,
+        parameters=[local[parameter] for parameter in term.parameters],
+        body=(yield _term(term.body, {**context, **local}, fresh)),
+    )
 
-        case LetRec(bindings=bindings, body=body):
-            pass
 
-        case Reference(name=name):
-            pass
+@_term.register(Apply)
+def _apply(term: Apply, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        target=(yield _term(term.target, context, fresh)),
+        arguments=(yield sequence(_term(argument, context, fresh) for argument in term.arguments)),
+    )
 
-        case Abstract(parameters=parameters, body=body):
-            pass
 
-        case Apply(target=target, arguments=arguments):
-            pass
+@_term.register(Immediate, Allocate)
+def _leaf(term: Immediate | Allocate, context: Context, fresh: Fresh) -> Step[Term]:
+    return term
 
-        case Immediate():
-            pass
 
-        case Primitive(operator=operator, left=left, right=right):
-            pass
+@_term.register(Primitive)
+def _primitive(term: Primitive, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _term(term.left, context, fresh)),
+        right=(yield _term(term.right, context, fresh)),
+    )
 
-        case Branch(operator=operator, left=left, right=right, consequent=consequent, otherwise=otherwise):
-            pass
 
-        case Allocate():
-            pass
+@_term.register(Branch)
+def _branch(term: Branch, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        left=(yield _term(term.left, context, fresh)),
+        right=(yield _term(term.right, context, fresh)),
+        consequent=(yield _term(term.consequent, context, fresh)),
+        otherwise=(yield _term(term.otherwise, context, fresh)),
+    )
 
-        case Load(base=base, index=index):
-            pass
 
-        case Store(base=base, index=index, value=value):
-            pass
+@_term.register(Load)
+def _load(term: Load, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        base=(yield _term(term.base, context, fresh)),
+    )
 
-        case Begin(effects=effects, value=value):  # pragma: no branch
-            pass
+
+@_term.register(Store)
+def _store(term: Store, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        base=(yield _term(term.base, context, fresh)),
+        value=(yield _term(term.value, context, fresh)),
+    )
+
+
+@_term.register(Begin)
+def _begin(term: Begin, context: Context, fresh: Fresh) -> Step[Term]:
+    return replace(
+        term,
+        effects=(yield sequence(_term(effect, context, fresh) for effect in term.effects)),
+        value=(yield _term(term.value, context, fresh)),
+    )
+
+
+def uniqify_term(
+    term: Term,
+    context: Context,
+    fresh: Fresh,
+) -> Term:
+    return run(_term(term, context, fresh))
 
 
 def uniqify_program(
@@ -73,15 +138,14 @@ def uniqify_program(
 ) -> tuple[Callable[[str], str], Program]:
     fresh = SequentialNameGenerator()
 
-    _term = partial(uniqify_term, fresh=fresh)
-
     match program:
         case Program(parameters=parameters, body=body):  # pragma: no branch
             local = {parameter: fresh(parameter) for parameter in parameters}
             return (
                 fresh,
-                Program(
+                replace(
+                    program,
                     parameters=[local[parameter] for parameter in parameters],
-                    body=_term(body, local),
+                    body=uniqify_term(body, local, fresh),
                 ),
             )
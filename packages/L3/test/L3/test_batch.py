@@ -0,0 +1,102 @@
+import shutil
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click.testing import CliRunner
+from L3.main import main
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+# example -> (arguments, result)
+RESULTS = {
+    "add_complex": ([5, 3], 8),
+    "add_simple": ([5, 3], 8),
+    "fact": ([5], 120),
+    "fib": ([10], 55),
+    "sum": ([5], 15),
+}
+
+
+def run(module: Path, arguments: list[int]) -> int:
+    namespace: dict[str, Any] = {}
+    exec(module.read_text(), namespace)
+    return namespace["l1"](*arguments)
+
+
+@pytest.fixture
+def examples(tmp_path: Path) -> Path:
+    for name in RESULTS:
+        shutil.copy(EXAMPLES / f"{name}.l3", tmp_path / f"{name}.l3")
+        shutil.copy(EXAMPLES / f"{name}.json", tmp_path / f"{name}.json")
+    return tmp_path
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_batch_directory(examples: Path, jobs: str):
+    result = CliRunner().invoke(main, ["--jobs", jobs, "--validate", str(examples)])
+
+    assert result.exit_code == 0, result.output
+    for name, (arguments, expected) in RESULTS.items():
+        assert f"{examples / name}.l3: ok" in result.output
+        assert run(examples / f"{name}.py", arguments) == expected
+
+
+def test_batch_globs(examples: Path):
+    result = CliRunner().invoke(main, ["-j", "1", str(examples / "f*.json"), str(examples / "sum.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [f"{examples / name}: ok" for name in ["fact.json", "fib.json", "sum.l3"]]
+
+
+def test_batch_stream(examples: Path):
+    (examples / "all.l3").write_text((EXAMPLES / "fact.l3").read_text() * 2)
+
+    result = CliRunner().invoke(main, ["-j", "1", "--stream", str(examples / "all.l3"), str(examples / "sum.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert run(examples / "all_1.py", [5]) == 120
+    assert run(examples / "sum_0.py", [5]) == 15
+
+
+def test_batch_errors(examples: Path):
+    (examples / "check.l3").write_text("(l3 (x) (+ x y))")
+    (examples / "syntax.l3").write_text("(l3 (x) (+ x 1)")
+
+    result = CliRunner().invoke(main, ["-j", "1", "--parser", "reader", str(examples)])
+
+    assert result.exit_code == 1
+    assert f"{examples / 'check.l3'}: unknown variable: y" in result.output
+    assert f"{examples / 'syntax.l3'}: unclosed form at offset 0" in result.output
+    assert "2 of 7 inputs failed" in result.output
+    assert run(examples / "fact.py", [5]) == 120
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_batch_errors_lark(examples: Path, jobs: str):
+    (examples / "syntax.l3").write_text("(l3 () (+ 1")
+
+    result = CliRunner().invoke(main, ["-j", jobs, str(examples)])
+
+    assert result.exit_code == 1
+    assert f"{examples / 'syntax.l3'}: Unexpected token" in result.output
+    assert "1 of 6 inputs failed" in result.output
+    assert run(examples / "fact.py", [5]) == 120
+
+
+@pytest.mark.parametrize(
+    ("arguments", "message"),
+    [
+        (["-o", "out.py", "fact.l3", "sum.l3"], "--output requires a single input"),
+        (["--stream", "fact.l3", "sum.json"], "--stream requires surface syntax input"),
+        (["fact.l3", "missing.l3"], "no input matches 'missing.l3'"),
+        (["*.l4"], "no input matches '*.l4'"),
+    ],
+)
+def test_batch_usage(examples: Path, monkeypatch: pytest.MonkeyPatch, arguments: list[str], message: str):
+    monkeypatch.chdir(examples)
+
+    result = CliRunner().invoke(main, arguments)
+
+    assert result.exit_code == 2
+    assert message in result.output
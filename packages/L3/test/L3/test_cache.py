@@ -0,0 +1,198 @@
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click.testing import CliRunner
+from L3 import cache
+from L3 import main as l3
+from L3.cache import Cache, Stats, cache_key, compiler_digest
+from L3.pipeline import Options
+from L3.main import main
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+
+def test_cache_key():
+    key = cache_key(b"(l3 () 0)", Options(), "l3")
+
+    assert key == cache_key(b"(l3 () 0)", Options(), "l3")
+    assert key != cache_key(b"(l3 () 1)", Options(), "l3")
+    assert key != cache_key(b"(l3 () 0)", Options(check=False), "l3")
+    assert key != cache_key(b"(l3 () 0)", Options(level=0), "l3")
+    assert key != cache_key(b"(l3 () 0)", Options(emit="l2"), "l3")
+    assert key != cache_key(b"(l3 () 0)", Options(via_l0=True), "l3")
+    assert key != cache_key(b"(l3 () 0)", Options(), "json")
+
+
+def test_compiler_digest(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    package = tmp_path / "l3_compiler_part"
+    package.mkdir()
+    (package / "__init__.py").write_text("x = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(cache, "_COMPILER", [*cache._COMPILER, "l3_compiler_part"])  # pyright: ignore[reportPrivateUsage]
+
+    def digest() -> str:
+        compiler_digest.cache_clear()
+        return compiler_digest()
+
+    try:
+        before = digest()
+        (package / "__init__.py").write_text("x = 2\n")
+        assert digest() != before
+
+    finally:
+        compiler_digest.cache_clear()
+
+
+def test_cache_load_store(tmp_path: Path):
+    cache = Cache(tmp_path / "cache", 1 << 20)
+    module, copy = tmp_path / "module.py", tmp_path / "copy.py"
+    module.write_text("x = 1\n")
+
+    assert not cache.load("ab" * 32, copy)
+    cache.store("ab" * 32, module)
+    assert cache.load("ab" * 32, copy)
+
+    assert copy.read_text() == "x = 1\n"
+    assert cache.stats() == Stats(hits=1, misses=1, entries=1, size=6)
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = Cache(tmp_path / "cache", 20)
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+
+    for index, key in enumerate(["aa", "bb", "cc"]):
+        cache.store(key * 32, module)
+        os.utime(cache.directory / key / f"{key * 32}.py", (index, index))
+
+    # a hit makes "aa" the most recently used, so "bb" goes first
+    assert cache.load("aa" * 32, tmp_path / "copy.py")
+    cache.store("dd" * 32, module)
+
+    assert sorted(path.name[:2] for path in cache.directory.glob("*/*.py")) == ["aa", "cc", "dd"]
+    assert cache.stats().size == 18
+
+
+def test_cache_scans_when_full(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # the directory is listed on the first store and then only once the estimate outgrows the bound
+    cache = Cache(tmp_path / "cache", 60)
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+    scans: list[Path] = []
+    glob = Path.glob
+
+    def counting(self: Path, pattern: str) -> Any:
+        scans.append(self)
+        return glob(self, pattern)
+
+    monkeypatch.setattr(Path, "glob", counting)
+
+    for index in range(10):
+        cache.store(f"{index:02}" * 32, module)
+    assert len(scans) == 1
+
+    cache.store("aa" * 32, module)
+    assert len(scans) == 2
+    # evicted down to nine tenths of the bound
+    assert cache.stats().size == 54
+
+
+def test_cache_entry_removed_by_another_process(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    cache = Cache(tmp_path / "cache", 0)
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+    glob = Path.glob
+
+    def vanishing(self: Path, pattern: str) -> Any:
+        # an entry listed and then evicted by another worker before it is looked at
+        return [*glob(self, pattern), self / "zz" / f"{'zz' * 32}.py"]
+
+    monkeypatch.setattr(Path, "glob", vanishing)
+
+    cache.store("ab" * 32, module)
+
+    assert cache.stats() == Stats(hits=0, misses=0, entries=0, size=0)
+
+
+def test_cache_size_zero(tmp_path: Path):
+    cache = Cache(tmp_path / "cache", 0)
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+
+    cache.store("ab" * 32, module)
+
+    assert cache.stats().entries == 0
+
+
+def test_cache_clear(tmp_path: Path):
+    cache = Cache(tmp_path / "cache", 1 << 20)
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+    cache.store("ab" * 32, module)
+
+    cache.clear()
+
+    assert cache.stats() == Stats(hits=0, misses=0, entries=0, size=0)
+
+
+def test_main_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("L3_CACHE_DIR", str(tmp_path / "cache"))
+    input = tmp_path / "fact.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text())
+
+    result = CliRunner().invoke(main, ["--no-server", str(input)])
+    assert result.exit_code == 0, result.output
+    expected = (tmp_path / "fact.py").read_text()
+    (tmp_path / "fact.py").unlink()
+
+    # a hit runs no pass at all
+    def fail(*_: object, **__: object) -> str:
+        raise AssertionError
+
+    monkeypatch.setattr(l3, "compile_program", fail)
+    result = CliRunner().invoke(main, ["--no-server", str(input)])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "fact.py").read_text() == expected
+
+    result = CliRunner().invoke(main, ["cache", "stats"])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[:3] == ["hits: 1", "misses: 1", "hit rate: 50.0%"]
+
+    result = CliRunner().invoke(main, ["cache", "clear"])
+    assert result.exit_code == 0, result.output
+    assert "hit rate: 0.0%" in CliRunner().invoke(main, ["cache", "stats"]).output
+
+
+def test_main_cache_batch(tmp_path: Path):
+    cache = tmp_path / "cache"
+    for name in ["fact", "sum"]:
+        (tmp_path / f"{name}.l3").write_text((EXAMPLES / f"{name}.l3").read_text())
+
+    for _ in range(2):
+        result = CliRunner().invoke(main, ["-j", "1", "--cache-dir", str(cache), str(tmp_path)])
+        assert result.exit_code == 0, result.output
+
+    assert Cache(cache, 0).stats()[:3] == (2, 2, 2)
+
+
+def test_main_cache_stream(tmp_path: Path):
+    input = tmp_path / "fact.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text())
+
+    result = CliRunner().invoke(main, ["--stream", "--cache-dir", str(tmp_path / "cache"), str(input)])
+
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "fact_0.py").exists()
+    assert Cache(tmp_path / "cache", 0).stats() == Stats(hits=0, misses=0, entries=0, size=0)
+
+
+@pytest.mark.parametrize("command", ["stats", "clear"])
+def test_main_cache_no_directory(monkeypatch: pytest.MonkeyPatch, command: str):
+    monkeypatch.delenv("L3_CACHE_DIR", raising=False)
+
+    result = CliRunner().invoke(main, ["cache", command])
+
+    assert result.exit_code == 2
+    assert "no cache directory" in result.output
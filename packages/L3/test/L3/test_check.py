@@ -1,5 +1,5 @@
 import pytest
-from L3.check import Context, check_program, check_term
+from L3.check import CheckError, Context, check_program, check_term, diagnose_program, diagnose_term
 from L3.syntax import (
     Abstract,
     Allocate,
@@ -14,7 +14,9 @@ from L3.syntax import (
     Program,
     Reference,
     Store,
+    Term,
 )
+from util.parallel import workers
 
 
 def test_check_term_let():
@@ -254,3 +256,114 @@ def test_check_program_duplicate_parameters():
 
     with pytest.raises(ValueError):
         check_program(program)
+
+
+def test_check_term_deep():
+    term: Term = Reference(name="x")
+    for _ in range(10_000):
+        term = Let(
+            bindings=[("x", term)], body=Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1))
+        )
+
+    check_term(term, {"x": None})
+
+    with pytest.raises(ValueError):
+        check_term(term, {})
+
+
+def test_check_term_all_diagnostics():
+    term = Let(
+        bindings=[
+            ("x", Reference(name="a")),
+            ("x", Immediate(value=0)),
+        ],
+        body=Apply(
+            target=Abstract(parameters=["y", "y"], body=Reference(name="b")),
+            arguments=[Reference(name="x"), Reference(name="c")],
+        ),
+    )
+
+    context: Context = {}
+
+    assert diagnose_term(term, context) == [
+        "duplicate binders: x",
+        "unknown variable: a",
+        "duplicate parameters: y",
+        "unknown variable: b",
+        "unknown variable: c",
+    ]
+
+    with pytest.raises(CheckError) as error:
+        check_term(term, context)
+
+    assert error.value.diagnostics == diagnose_term(term, context)
+    assert str(error.value) == "\n".join(error.value.diagnostics)
+
+
+def test_check_term_scope_restored():
+    term = Begin(
+        effects=[
+            Let(bindings=[("x", Immediate(value=0))], body=Reference(name="x")),
+            LetRec(bindings=[("y", Reference(name="y"))], body=Reference(name="y")),
+            Abstract(parameters=["z"], body=Reference(name="z")),
+        ],
+        value=Apply(target=Reference(name="x"), arguments=[Reference(name="y"), Reference(name="z")]),
+    )
+
+    context: Context = {}
+
+    assert diagnose_term(term, context) == [
+        "unknown variable: x",
+        "unknown variable: y",
+        "unknown variable: z",
+    ]
+
+
+def test_diagnose_program():
+    program = Program(
+        parameters=["x", "x"],
+        body=Reference(name="y"),
+    )
+
+    assert diagnose_program(program) == [
+        "duplicate parameters: x",
+        "unknown variable: y",
+    ]
+
+
+def test_check_term_wide_and_deep():
+    # every binder in scope at every level: copying the environment per binder would make this quadratic
+    names = [f"x{index}" for index in range(2_000)]
+    term: Term = Reference(name=names[0])
+    for name in names:
+        term = Let(bindings=[(name, Immediate(value=0))], body=term)
+    term = Abstract(parameters=names, body=term)
+
+    assert diagnose_term(term, {}) == []
+
+
+def test_diagnose_term_parallel():
+    # each value is checked on its own scope and list, and the lists are joined in binding order
+    term = LetRec(
+        bindings=[
+            (f"f{index}", Abstract(parameters=["x", "x"], body=Reference(name=f"f{index + 1}"))) for index in range(50)
+        ],
+        body=Let(
+            bindings=[
+                ("y", Reference(name="a")),
+                ("z", Let(bindings=[("w", Reference(name="b"))], body=Reference(name="w"))),
+            ],
+            body=Reference(name="w"),
+        ),
+    )
+
+    with workers(4):
+        diagnostics = diagnose_term(term, {})
+
+    assert diagnostics == [
+        *["duplicate parameters: x"] * 50,
+        "unknown variable: f50",
+        "unknown variable: a",
+        "unknown variable: b",
+        "unknown variable: w",
+    ]
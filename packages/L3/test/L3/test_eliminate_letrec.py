@@ -1,6 +1,7 @@
 from L2 import syntax as L2
 from L3 import syntax as L3
 from L3.eliminate_letrec import Context, eliminate_letrec_program, eliminate_letrec_term
+from util.parallel import workers
 
 
 def test_eliminate_letrec_term_let():
@@ -233,3 +234,27 @@ def test_eliminate_letrec_program():
     )
 
     assert actual == expected
+
+
+def test_eliminate_letrec_program_parallel():
+    program = L3.Program(
+        parameters=["x"],
+        body=L3.LetRec(
+            bindings=[
+                (
+                    f"f{index}",
+                    L3.Abstract(
+                        parameters=["y"],
+                        body=L3.Apply(target=L3.Reference(name=f"f{index + 1}"), arguments=[L3.Reference(name="x")]),
+                    ),
+                )
+                for index in range(50)
+            ],
+            body=L3.Let(bindings=[("z", L3.Reference(name="f0"))], body=L3.Reference(name="z")),
+        ),
+    )
+
+    with workers(4):
+        actual = eliminate_letrec_program(program)
+
+    assert actual == eliminate_letrec_program(program)
@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import pytest
+from L2 import syntax as L2
+from L3 import syntax as L3
+from L3.check import CheckError, diagnose_program
+from L3.eliminate_letrec import eliminate_letrec_program
+from L3.front_end import front_end_program
+from L3.parse import read_program
+from L3.uniqify import uniqify_program
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+
+def separately(program: L3.Program) -> tuple[list[str], L2.Program]:
+    fresh, l3 = uniqify_program(program)
+    return [fresh("t"), fresh("x")], eliminate_letrec_program(l3)
+
+
+def fused(program: L3.Program) -> tuple[list[str], L2.Program]:
+    fresh, l2 = front_end_program(program)
+    return [fresh("t"), fresh("x")], l2
+
+
+def test_front_end_program():
+    program = L3.Program(
+        parameters=["x"],
+        body=L3.LetRec(
+            bindings=[
+                (
+                    "f",
+                    L3.Abstract(
+                        parameters=["x"],
+                        body=L3.Apply(target=L3.Reference(name="f"), arguments=[L3.Reference(name="x")]),
+                    ),
+                )
+            ],
+            body=L3.Let(
+                bindings=[("f", L3.Reference(name="f"))],
+                body=L3.Apply(target=L3.Reference(name="f"), arguments=[L3.Reference(name="x")]),
+            ),
+        ),
+    )
+
+    fresh, actual = front_end_program(program)
+
+    expected = L2.Program(
+        parameters=["x0"],
+        body=L2.Let(
+            bindings=[("f0", L2.Allocate(count=1))],
+            body=L2.Begin(
+                effects=[
+                    L2.Store(
+                        base=L2.Reference(name="f0"),
+                        index=0,
+                        value=L2.Abstract(
+                            parameters=["x1"],
+                            body=L2.Apply(
+                                target=L2.Load(base=L2.Reference(name="f0"), index=0),
+                                arguments=[L2.Reference(name="x1")],
+                            ),
+                        ),
+                    )
+                ],
+                value=L2.Let(
+                    bindings=[("f1", L2.Load(base=L2.Reference(name="f0"), index=0))],
+                    body=L2.Apply(target=L2.Reference(name="f1"), arguments=[L2.Reference(name="x0")]),
+                ),
+            ),
+        ),
+    )
+
+    assert actual == expected
+    assert fresh("x") == "x2"
+
+
+@pytest.mark.parametrize("path", sorted(EXAMPLES.glob("*.l3")), ids=lambda path: path.stem)
+def test_front_end_program_examples(path: Path):
+    program = read_program(path.read_text())
+
+    assert fused(program) == separately(program)
+
+
+def test_front_end_program_every_term():
+    program = read_program(
+        """
+        (l3 (n)
+          (letrec ((loop (\\ (i acc)
+                           (if (< i n)
+                               (loop (+ i 1) (begin (store cell 0 acc) (load cell 0)))
+                               acc)))
+                   (cell (allocate 1)))
+            (let ((n 0) (loop loop))
+              (loop n 1))))
+        """
+    )
+
+    assert fused(program) == separately(program)
+
+
+def test_front_end_program_diagnostics():
+    program = L3.Program(
+        parameters=["x", "x"],
+        body=L3.Let(
+            bindings=[("y", L3.Reference(name="a")), ("y", L3.Immediate(value=0))],
+            body=L3.LetRec(
+                bindings=[("f", L3.Abstract(parameters=["z", "z"], body=L3.Reference(name="b")))] * 2,
+                body=L3.Reference(name="c"),
+            ),
+        ),
+    )
+
+    with pytest.raises(CheckError) as error:
+        front_end_program(program)
+
+    assert error.value.diagnostics == diagnose_program(program)
+    assert error.value.diagnostics[0] == "duplicate parameters: x"
+
+
+def test_front_end_program_deep():
+    term: L3.Term = L3.Reference(name="x")
+    for _ in range(10_000):
+        term = L3.LetRec(
+            bindings=[("x", L3.Abstract(parameters=[], body=term))],
+            body=L3.Primitive(operator="+", left=L3.Reference(name="x"), right=L3.Immediate(value=1)),
+        )
+    program = L3.Program(parameters=["x"], body=term)
+
+    _, l2 = front_end_program(program)
+
+    assert l2.parameters == ["x0"]
@@ -0,0 +1,175 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+from L3.check import CheckError
+from L3.incremental import IncrementalCompiler, free_variables
+from L3.main import compile_program
+from L3.parse import read_program
+from L3.pipeline import Options
+from L3.syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
+    Immediate,
+    Let,
+    LetRec,
+    Load,
+    Primitive,
+    Reference,
+    Store,
+    Term,
+)
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+# example -> (arguments, result)
+RESULTS = {
+    "add_complex": ([5, 3], 8),
+    "add_simple": ([5, 3], 8),
+    "fact": ([5], 120),
+    "fib": ([10], 55),
+    "sum": ([5], 15),
+}
+
+
+def run(module: str, arguments: list[int]) -> int:
+    namespace: dict[str, Any] = {}
+    exec(module, namespace)
+    return namespace["l1"](*arguments)
+
+
+def functions(count: int, edited: int | None = None) -> str:
+    values = " ".join(
+        f"(f{i} (\\ (y) (if (< y {i}) (+ y {100 if i == edited else i}) (f{max(i - 1, 0)} (- y 1)))))"
+        for i in range(count)
+    )
+    return f"(l3 (a) (letrec ({values}) (f{count - 1} a)))"
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    [
+        pytest.param(
+            Let(bindings=[("x", Reference(name="x")), ("y", Reference(name="z"))], body=Reference(name="y")),
+            {"x", "z"},
+            id="let",
+        ),
+        pytest.param(
+            LetRec(bindings=[("x", Reference(name="x")), ("y", Reference(name="z"))], body=Reference(name="y")),
+            {"z"},
+            id="letrec",
+        ),
+        pytest.param(
+            Abstract(parameters=["x"], body=Apply(target=Reference(name="x"), arguments=[Reference(name="y")])),
+            {"y"},
+            id="abstract",
+        ),
+        pytest.param(
+            Branch(
+                operator="<",
+                left=Reference(name="a"),
+                right=Immediate(value=0),
+                consequent=Load(base=Reference(name="b"), index=0),
+                otherwise=Allocate(count=1),
+            ),
+            {"a", "b"},
+            id="branch",
+        ),
+        pytest.param(
+            Begin(
+                effects=[Store(base=Reference(name="a"), index=0, value=Reference(name="b"))],
+                value=Primitive(operator="+", left=Reference(name="c"), right=Reference(name="a")),
+            ),
+            {"a", "b", "c"},
+            id="begin",
+        ),
+    ],
+)
+def test_free_variables(term: Term, expected: set[str]):
+    assert free_variables(term) == expected
+
+
+@pytest.mark.parametrize("name", RESULTS)
+def test_incremental_examples(name: str):
+    arguments, expected = RESULTS[name]
+    program = read_program((EXAMPLES / f"{name}.l3").read_text())
+    compiler = IncrementalCompiler()
+
+    module = compiler.compile(program)
+    assert run(module, arguments) == expected
+
+    # a second parse of the same text is hash-consed onto the first, so nothing is recomputed, except code generation
+    # for the continuations of top-level code, which CPS conversion rebuilds
+    assert compiler.compile(read_program((EXAMPLES / f"{name}.l3").read_text())) == module
+    assert all(memo.misses == 0 for stage, memo in compiler.memos.items() if stage != "to_python")
+
+
+def test_incremental_edit():
+    compiler = IncrementalCompiler()
+    compiler.compile(read_program(functions(50)))
+    cold = {name: memo.misses for name, memo in compiler.memos.items()}
+
+    module = compiler.compile(read_program(functions(50, edited=25)))
+
+    # the edited function and the spine above it are recomputed; everything else is reused
+    for name, memo in compiler.memos.items():
+        assert memo.hits > 0
+        assert memo.misses < cold[name] // 10
+
+    reference = compile_program(read_program(functions(50, edited=25)), Options())
+    for argument in [0, 20, 26, 30, 49]:
+        assert run(module, [argument]) == run(reference, [argument])
+
+
+def test_incremental_repeated_subtrees():
+    # the two inner lets are the same hash-consed node in the same context; sharing their renamed binder would let
+    # the second assignment to it overwrite the value that `f` closed over
+    source = """
+    (l3 ()
+      (let ((c (allocate 1)))
+        (begin
+          (store c 0 1)
+          (let ((f (let ((x (load c 0))) (\\ () x))))
+            (begin
+              (store c 0 2)
+              (let ((g (let ((x (load c 0))) (\\ () x))))
+                (+ (f) (* 10 (g)))))))))
+    """
+
+    assert run(IncrementalCompiler().compile(read_program(source)), []) == 21
+
+
+def test_incremental_options():
+    program = read_program((EXAMPLES / "fact.l3").read_text())
+
+    assert run(IncrementalCompiler(check=False, optimize=False).compile(program), [5]) == 120
+
+
+def test_incremental_check_errors():
+    compiler = IncrementalCompiler()
+
+    with pytest.raises(CheckError) as error:
+        compiler.compile(read_program("(l3 (x) (let ((y a)) (+ y b)))"))
+
+    assert error.value.diagnostics == ["unknown variable: a", "unknown variable: b"]
+
+    # diagnostics of reused subtrees are reported again
+    with pytest.raises(CheckError) as error:
+        compiler.compile(read_program("(l3 (x) (let ((y a)) (+ y c)))"))
+
+    assert error.value.diagnostics == ["unknown variable: a", "unknown variable: c"]
+    assert compiler.memos["check"].hits > 0
+
+
+def test_incremental_clear():
+    compiler = IncrementalCompiler()
+    program = read_program((EXAMPLES / "fact.l3").read_text())
+    compiler.compile(program)
+
+    compiler.clear()
+
+    assert run(compiler.compile(program), [5]) == 120
+    assert all(memo.hits == 0 for memo in compiler.memos.values())
@@ -0,0 +1,188 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click.testing import CliRunner
+from L3.main import main
+from util import parallel
+from util.parallel import set_workers
+
+# generous enough for a cold CI runner; a regression that imports the passes, pydantic or lark at startup
+# costs several times this
+STARTUP_BUDGET_US = 250_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times: dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        match line.removeprefix("import time:").split("|"):
+            case [_self, cumulative, name] if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+
+            case _:
+                pass
+
+    return times
+
+
+def test_main_startup_imports():
+    times = import_times("L3.main")
+
+    assert "click" in times
+    assert not {"lark", "pydantic", "L1", "L2", "L3.parse", "L3.check", "L3.standalone"} & times.keys()
+
+
+def test_main_startup_budget():
+    times = import_times("L3.main")
+
+    assert times["L3.main"] < STARTUP_BUDGET_US
+
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+# example -> (arguments, result)
+RESULTS = {
+    "add_complex": ([5, 3], 8),
+    "add_simple": ([5, 3], 8),
+    "fact": ([5], 120),
+    "fib": ([10], 55),
+    "sum": ([5], 15),
+}
+
+
+def run(module: Path, arguments: list[int]) -> int:
+    namespace: dict[str, Any] = {}
+    exec(module.read_text(), namespace)
+    return namespace["l1"](*arguments)
+
+
+@pytest.mark.parametrize("name", RESULTS)
+@pytest.mark.parametrize(
+    "options",
+    [
+        [],
+        ["--no-check", "--no-optimize"],
+        ["--parser", "reader"],
+        ["--validate"],
+    ],
+)
+def test_main_examples(tmp_path: Path, name: str, options: list[str]):
+    arguments, expected = RESULTS[name]
+    output = tmp_path / f"{name}.py"
+
+    result = CliRunner().invoke(main, [*options, "-o", str(output), str(EXAMPLES / f"{name}.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert run(output, arguments) == expected
+
+
+def test_main_threads(tmp_path: Path):
+    output = tmp_path / "fib.py"
+
+    try:
+        result = CliRunner().invoke(
+            main, ["--no-server", "--threads", "4", "-o", str(output), str(EXAMPLES / "fib.l3")]
+        )
+
+    finally:
+        set_workers(1)
+
+    assert result.exit_code == 0, result.output
+    assert run(output, [10]) == 55
+
+
+def test_main_threads_pool(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # the default, fused configuration still hands bindings to the pool
+    threads: list[str] = []
+    run_chunk = parallel._run  # pyright: ignore[reportPrivateUsage]
+
+    def record(steps: Any) -> Any:
+        threads.append(threading.current_thread().name)
+        return run_chunk(steps)
+
+    monkeypatch.setattr(parallel, "_run", record)
+    output = tmp_path / "fib.py"
+
+    try:
+        result = CliRunner().invoke(
+            main, ["--no-server", "--threads", "4", "-o", str(output), str(EXAMPLES / "fib.l3")]
+        )
+
+    finally:
+        set_workers(1)
+
+    assert result.exit_code == 0, result.output
+    assert threads
+    assert all(name.startswith("parallel") for name in threads)
+
+
+@pytest.mark.parametrize("name", RESULTS)
+def test_main_json(tmp_path: Path, name: str):
+    arguments, expected = RESULTS[name]
+    output = tmp_path / f"{name}.py"
+
+    result = CliRunner().invoke(main, ["-o", str(output), str(EXAMPLES / f"{name}.json")])
+
+    assert result.exit_code == 0, result.output
+    assert run(output, arguments) == expected
+
+
+def test_main_default_output(tmp_path: Path):
+    input = tmp_path / "fact.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text())
+
+    result = CliRunner().invoke(main, [str(input)])
+
+    assert result.exit_code == 0, result.output
+    assert run(tmp_path / "fact.py", [5]) == 120
+
+
+def test_main_stream(tmp_path: Path):
+    input = tmp_path / "all.l3"
+    input.write_text("\n".join((EXAMPLES / f"{name}.l3").read_text() for name in RESULTS))
+
+    result = CliRunner().invoke(main, ["--stream", str(input)])
+
+    assert result.exit_code == 0, result.output
+    for index, (arguments, expected) in enumerate(RESULTS.values()):
+        assert run(tmp_path / f"all_{index}.py", arguments) == expected
+
+
+@pytest.mark.parametrize("options", [[], ["--input-format", "json"]])
+def test_main_stream_json(options: list[str]):
+    result = CliRunner().invoke(main, ["--stream", *options, str(EXAMPLES / "fact.json")])
+
+    assert result.exit_code == 2
+    assert "--stream requires surface syntax input" in result.output
+
+
+def test_main_check_errors(tmp_path: Path):
+    input = tmp_path / "errors.l3"
+    input.write_text("(l3 (x x) (let ((y a)) (+ y b)))")
+
+    result = CliRunner().invoke(main, [str(input)])
+
+    assert result.exit_code == 1
+    assert "duplicate parameters: x\nunknown variable: a\nunknown variable: b" in result.output
+    assert not (tmp_path / "errors.py").exists()
+
+
+@pytest.mark.parametrize("parser", ["lark", "reader"])
+def test_main_deep(tmp_path: Path, parser: str):
+    input = tmp_path / "deep.l3"
+    input.write_text(f"(l3 (a) {'(+ 1 ' * 10_000}a{')' * 10_000})")
+
+    result = CliRunner().invoke(main, ["--parser", parser, str(input)])
+
+    assert result.exit_code == 0, result.output
+    assert run(tmp_path / "deep.py", [5]) == 10_005
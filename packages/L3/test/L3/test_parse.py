@@ -1,4 +1,22 @@
-from L3.parse import parse_program, parse_term
+import io
+from pathlib import Path
+from typing import Any, Literal
+
+import pytest
+from L3.parse import (
+    iter_programs,
+    load_program,
+    parse_program,
+    parse_program_json,
+    parse_term,
+    parser,
+    program_adapter,
+    read_document,
+    read_program,
+    read_program_file,
+    read_term,
+    reread_document,
+)
 from L3.syntax import (
     Abstract,
     Allocate,
@@ -295,3 +313,301 @@ def test_parse_program_identity():
     actual = parse_program(source)
 
     assert actual == expected
+
+
+def test_parse_program_comments():
+    source = """
+    (l3 (x) ; parameters
+        x)  ; body
+    """
+
+    expected = Program(
+        parameters=["x"],
+        body=Reference(name="x"),
+    )
+
+    actual = parse_program(source)
+
+    assert actual == expected
+
+
+def test_parse_parser_cached():
+    assert parser() is parser()
+
+
+# Reader
+TERMS = [
+    "(let () x)",
+    "(let ((x 0)) x)",
+    "(letrec () x)",
+    "(letrec ((x 0)) x)",
+    "x",
+    "(\\ (x) x)",
+    "(lambda (x y) x)",
+    "(λ () 0)",
+    "(x)",
+    "(x y z)",
+    "42",
+    "-7",
+    "(+ 1 2)",
+    "(- 3 2)",
+    "(* 2 3)",
+    "(if (< 1 2) 1 0)",
+    "(if (== 1 1) 1 0)",
+    "(allocate 0)",
+    "(load x 0)",
+    "(store x 0 1)",
+    "(begin x)",
+    "(begin x y z)",
+    "((f 1) (g 2) ; comment\n 3)",
+    "(lambdax 1)",
+    "(letter iffy)",
+    "(beginning l3x loader)",
+]
+
+EXAMPLES = sorted((Path(__file__).parents[2] / "examples").glob("*.l3"))
+
+
+@pytest.mark.parametrize("source", TERMS)
+def test_read_term_matches_parse_term(source: str):
+    assert read_term(source) == parse_term(source)
+
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=lambda path: path.name)
+def test_read_program_matches_parse_program(path: Path):
+    source = path.read_text()
+
+    assert read_program(source.encode()) == parse_program(source)
+    assert read_program_file(path) == parse_program(source)
+
+
+def test_read_term_deep():
+    depth = 100_000
+    source = "(let ((x 0)) " * depth + "x" + ")" * depth
+
+    term = read_term(source)
+
+    for _ in range(depth):
+        assert isinstance(term, Let)
+        term = term.body
+
+    assert term == Reference(name="x")
+
+
+def test_read_program_file_empty(tmp_path: Path):
+    path = tmp_path / "empty.l3"
+    path.write_text("")
+
+    with pytest.raises(ValueError):
+        read_program_file(path)
+
+
+@pytest.mark.parametrize("source", ["(l3 () (+ 1", "(l3 () $)"])
+def test_parse_program_syntax_error(source: str):
+    # lark's errors come out as ValueError, like the reader's
+    with pytest.raises(ValueError, match="at line 1"):
+        parse_program(source)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "",
+        "x",
+        "(l3 (x) x) (l3 (x) x)",
+        "(l3 (x) x) y",
+        "(l4 (x) x)",
+        "(l3 (1) x)",
+        "(l3 (x) x",
+        "(l3 (x) x))",
+        "(l3 x x)",
+        "(l3 (x) (let (x) x))",
+        "(l3 (x) (let ((x)) x))",
+        "(l3 (x) (if (+ x x) x x))",
+        "(l3 (x) (load x y))",
+        "(l3 (x) (begin))",
+        "(l3 (x) (-))",
+        "(l3 (x) (let ((x 0)) let))",
+    ],
+)
+def test_read_program_malformed(source: str):
+    with pytest.raises(ValueError):
+        read_program(source)
+
+
+# Documents
+@pytest.mark.parametrize("path", EXAMPLES, ids=lambda path: path.name)
+def test_read_document_matches_read_program(path: Path):
+    document = read_document(path.read_text())
+
+    assert document.program == read_program(path.read_bytes())
+    assert document.source == path.read_bytes()
+
+
+@pytest.mark.parametrize("source", ["", "x", "(l3 (x) x) (l3 (x) x)", "(l3 (x) x", "(l3 (x) x))", "(l3 (x) (-))"])
+def test_read_document_malformed(source: str):
+    with pytest.raises(ValueError):
+        read_document(source)
+
+
+def functions(count: int, edited: int | None = None) -> str:
+    values = " ".join(f"(f{i} (\\ (y) (+ y {100 if i == edited else i})))" for i in range(count))
+    return f"(l3 (a) (letrec ({values}) (f{count - 1} a)))"
+
+
+def test_reread_document_reuses_untouched_nodes():
+    document = read_document(functions(50))
+    offset = document.source.index(b"(+ y 25)") + len("(+ y ")
+
+    edited = reread_document(document, offset, offset + 2, "100")
+
+    assert edited.source == functions(50, edited=25).encode()
+    assert edited.program == read_program(functions(50, edited=25))
+    before, after = document.program.body, edited.program.body
+    assert isinstance(before, LetRec) and isinstance(after, LetRec)
+    assert [old is new for (_, old), (_, new) in zip(before.bindings, after.bindings)] == [i != 25 for i in range(50)]
+    assert before.body is after.body
+
+    # the previous document is left as it was
+    assert document.program == read_program(functions(50))
+
+
+@pytest.mark.parametrize(
+    ("source", "old", "new"),
+    [
+        pytest.param("(l3 (x) (+ x 1))", "1", "2", id="atom"),
+        pytest.param("(l3 (x) (let ((y 1) (z 2)) y))", " (z", " (w 3) (z", id="binding"),
+        pytest.param("(l3 (x) (let ((y 1) (z 2)) y))", "let", "letrec", id="head"),
+        pytest.param("(l3 (x) (let ((y 1)) (f y)))", "let", "begin", id="kind"),
+        pytest.param("(l3 (x) (f (g x)))", "(g x)", "(g x) (h x)", id="sibling"),
+        pytest.param("(l3 (x) (f (g x y)))", "x y", "x) (h y", id="split"),
+        pytest.param("(l3 (x) (f (g x)))", "g x", "g (h x)", id="nested"),
+        pytest.param("(l3 (x) x) ; comment", "comment", "remark", id="outside"),
+    ],
+)
+def test_reread_document_matches_read_program(source: str, old: str, new: str):
+    start = source.index(old)
+    edited = source[:start] + new + source[start + len(old) :]
+
+    document = reread_document(read_document(source), start, start + len(old), new.encode())
+
+    assert document.program == read_program(edited)
+    assert document.source == edited.encode()
+
+
+@pytest.mark.parametrize(
+    ("source", "start", "end", "text"),
+    [
+        pytest.param("(l3 (x) (f (g x)))", 15, 15, ")(", id="unbalanced"),
+        pytest.param("(l3 (x) (f (g x)))", 15, 15, ") y", id="trailing"),
+        pytest.param("(l3 (x) (f (g x)))", 15, 16, "", id="unclosed"),
+        pytest.param("(l3 (x) x)", 0, 0, "(l3 (y) y) ", id="root"),
+        pytest.param("(l3 (x) x)", 5, 20, "", id="range"),
+    ],
+)
+def test_reread_document_malformed(source: str, start: int, end: int, text: str):
+    with pytest.raises(ValueError):
+        reread_document(read_document(source), start, end, text)
+
+
+def test_parse_standalone_up_to_date():
+    lark = pytest.importorskip("lark")
+
+    grammar = (Path(__file__).parents[2] / "src" / "L3" / "L3.lark").read_text()
+    expected = lark.Lark(grammar, start=["program", "term"], parser="lalr")
+    actual = parser()
+
+    def rules(parser: Any) -> list[tuple[str, ...]]:
+        return sorted(
+            (str(rule.origin.name), *(str(symbol.name) for symbol in rule.expansion)) for rule in parser.rules
+        )
+
+    def terminals(parser: Any) -> list[tuple[str, str, int]]:
+        return sorted((str(terminal.name), terminal.pattern.value, terminal.priority) for terminal in parser.terminals)
+
+    # regenerate standalone.py if this fails; see L3.parse.parser
+    assert rules(actual) == rules(expected)
+    assert terminals(actual) == terminals(expected)
+
+
+# JSON
+@pytest.mark.parametrize("path", EXAMPLES, ids=lambda path: path.name)
+def test_parse_program_json_matches_parse_program(path: Path):
+    source = path.with_suffix(".json").read_bytes()
+
+    assert parse_program_json(source) == parse_program(path.read_text())
+
+
+def test_parse_program_json_adapter_cached():
+    assert program_adapter() is program_adapter()
+
+
+def test_load_program_formats(tmp_path: Path):
+    path = EXAMPLES[0]
+    expected = parse_program(path.read_text())
+
+    renamed = tmp_path / "program.txt"
+    renamed.write_bytes(path.with_suffix(".json").read_bytes())
+
+    assert load_program(path) == expected
+    assert load_program(path, parser="reader") == expected
+    assert load_program(path.with_suffix(".json")) == expected
+    assert load_program(renamed, input_format="json") == expected
+
+
+# Streams
+STREAM = """
+; first (
+(l3 (x) x)
+(l3 (x y) ; second )
+    (+ x y))
+
+(l3 ()
+    (let ((z 0)) z))   ; third
+"""
+
+
+@pytest.mark.parametrize("parser", ["lark", "reader"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_programs(parser: Literal["lark", "reader"], chunk_size: int):
+    actual = list(iter_programs(io.StringIO(STREAM), parser, chunk_size))
+
+    expected = [
+        Program(parameters=["x"], body=Reference(name="x")),
+        Program(
+            parameters=["x", "y"],
+            body=Primitive(operator="+", left=Reference(name="x"), right=Reference(name="y")),
+        ),
+        Program(parameters=[], body=Let(bindings=[("z", Immediate(value=0))], body=Reference(name="z"))),
+    ]
+
+    assert actual == expected
+
+
+def test_iter_programs_incremental():
+    stream = io.StringIO(STREAM)
+    programs = iter_programs(stream, chunk_size=16)
+
+    next(programs)
+
+    assert stream.tell() < len(STREAM)
+
+
+def test_iter_programs_empty():
+    assert list(iter_programs(io.StringIO(" ; nothing"))) == []
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "x (l3 (x) x)",
+        "(l3 (x) x) x",
+        "(l3 (x) x) x ; comment",
+        "(l3 (x) x) x\n",
+        ")",
+        "(l3 (x) x",
+    ],
+)
+def test_iter_programs_malformed(source: str):
+    with pytest.raises(ValueError):
+        list(iter_programs(io.StringIO(source)))
@@ -0,0 +1,214 @@
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import click
+import pytest
+from click.testing import CliRunner
+from L0 import syntax as L0
+from L1 import syntax as L1
+from L2 import syntax as L2
+from L3 import syntax as L3
+from L3.main import main
+from L3.parse import read_program
+from L3.pipeline import Language, Options, compile_program, load_ir, plan, run_passes
+from util.serialize import dumps
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+
+def names(options: Options) -> list[str]:
+    return [pass_.name for pass_ in plan(options)]
+
+
+@pytest.mark.parametrize(
+    ("options", "expected"),
+    [
+        (Options(), ["front_end", "optimize", "cps_to_python"]),
+        (Options(fuse=False), ["check", "uniqify", "eliminate_letrec", "optimize", "cps_convert", "to_python"]),
+        (Options(check=False, level=0), ["uniqify", "eliminate_letrec", "cps_to_python"]),
+        (Options(level=2), ["front_end", "optimize", "inline", "cps_to_python"]),
+        (Options(level=3, emit="l2"), ["front_end", "optimize", "scalar_replace", "inline"]),
+        (Options(level=3, emit="l3"), ["check", "uniqify"]),
+        (Options(emit="l2"), ["front_end", "optimize"]),
+        (Options(level=0, emit="l1"), ["front_end", "cps_convert"]),
+        (
+            Options(level=0, emit="l0", fuse=False),
+            ["check", "uniqify", "eliminate_letrec", "cps_convert", "closure_convert"],
+        ),
+        (Options(level=0, via_l0=True), ["front_end", "cps_convert", "closure_convert", "to_python"]),
+    ],
+)
+def test_plan(options: Options, expected: list[str]):
+    assert names(options) == expected
+
+
+@pytest.mark.parametrize(
+    ("emit", "cls"),
+    [("l3", L3.Program), ("l2", L2.Program), ("l1", L1.Program), ("l0", L0.Program), ("python", str)],
+)
+def test_run_passes_emit(emit: Language, cls: type):
+    program = read_program((EXAMPLES / "fact.l3").read_text())
+
+    assert isinstance(run_passes(program, Options(emit=emit)), cls)
+
+
+@pytest.mark.parametrize("path", sorted(EXAMPLES.glob("*.l3")), ids=lambda path: path.stem)
+@pytest.mark.parametrize("level", [0, 1, 2, 3])
+def test_run_passes_fused(path: Path, level: int):
+    program = read_program(path.read_text())
+
+    assert run_passes(program, Options(level=level)) == run_passes(program, Options(level=level, fuse=False))
+
+
+def test_run_passes_hooks():
+    program = read_program((EXAMPLES / "fact.l3").read_text())
+    calls: list[str] = []
+    cache: dict[str, Any] = {}
+
+    def record(name: str, run: Callable[[Any], Any], program: Any) -> Any:
+        calls.append(name)
+        return run(program)
+
+    def skip_check(name: str, run: Callable[[Any], Any], program: Any) -> Any:
+        return program if name == "check" else run(program)
+
+    def cached(name: str, run: Callable[[Any], Any], program: Any) -> Any:
+        if name not in cache:
+            cache[name] = run(program)
+        return cache[name]
+
+    hooks = [record, skip_check, cached]
+    module = run_passes(program, Options(), hooks)
+
+    # hooks run outermost first, so the second compile is still recorded, but answered from the cache
+    assert run_passes(program, Options(), hooks) == module
+    assert calls == names(Options()) * 2
+    assert "check" not in cache
+
+
+@pytest.mark.parametrize("source", ["(l3 (x x) y)", "(l3 () (let ((a 1) (a 2)) (\\ (b b) c)))"])
+def test_run_passes_fused_diagnostics(source: str):
+    program = read_program(source)
+
+    with pytest.raises(click.ClickException) as fused:
+        run_passes(program, Options())
+    with pytest.raises(click.ClickException) as separate:
+        run_passes(program, Options(fuse=False))
+
+    assert fused.value.message == separate.value.message
+
+
+def test_compile_program_json():
+    program = read_program((EXAMPLES / "fact.l3").read_text())
+
+    emitted = compile_program(program, Options(emit="l3"))
+
+    assert L3.Program.model_validate_json(emitted) == run_passes(program, Options(emit="l3"))
+
+
+def run(module: Path, entry: str, arguments: list[int]) -> int:
+    namespace: dict[str, Any] = {}
+    exec(module.read_text(), namespace)
+    return namespace[entry](*arguments)
+
+
+@pytest.mark.parametrize("level", ["0", "1", "2", "3"])
+def test_main_levels(tmp_path: Path, level: str):
+    output = tmp_path / "fact.py"
+
+    result = CliRunner().invoke(main, ["--no-server", f"-O{level}", "-o", str(output), str(EXAMPLES / "fact.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert run(output, "l1", [5]) == 120
+
+
+@pytest.mark.parametrize("threshold", ["0", "16"])
+def test_main_inline_threshold(tmp_path: Path, threshold: str):
+    output = tmp_path / "add_complex.py"
+
+    result = CliRunner().invoke(
+        main,
+        ["--no-server", "-O2", "--inline-threshold", threshold, "-o", str(output), str(EXAMPLES / "add_complex.l3")],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert run(output, "l1", [5, 3]) == 8
+
+
+def test_main_via_l0(tmp_path: Path):
+    output = tmp_path / "fib.py"
+
+    result = CliRunner().invoke(main, ["--no-server", "--via-l0", "-o", str(output), str(EXAMPLES / "fib.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert run(output, "l0", [10]) == 55
+
+
+@pytest.mark.parametrize(
+    ("emit", "cls"),
+    [("l3", L3.Program), ("l2", L2.Program), ("l1", L1.Program), ("l0", L0.Program)],
+)
+def test_main_emit(tmp_path: Path, emit: str, cls: type[Any]):
+    input = tmp_path / "fact.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text())
+
+    result = CliRunner().invoke(main, ["--no-server", "--emit", emit, str(input)])
+
+    assert result.exit_code == 0, result.output
+    cls.model_validate_json((tmp_path / f"fact.{emit}.json").read_text())
+
+
+def test_main_emit_l3_round_trip(tmp_path: Path):
+    # emitted L3 is a JSON AST, and so can be compiled in turn
+    input = tmp_path / "sum.l3"
+    input.write_text((EXAMPLES / "sum.l3").read_text())
+
+    for arguments in [["--emit", "l3", str(input)], [str(tmp_path / "sum.l3.json")]]:
+        result = CliRunner().invoke(main, ["--no-server", *arguments])
+        assert result.exit_code == 0, result.output
+
+    assert run(tmp_path / "sum.l3.py", "l1", [5]) == 15
+
+
+@pytest.mark.parametrize("emit", ["l3", "l2", "l1", "l0"])
+def test_main_resume_from_ir(tmp_path: Path, emit: str):
+    input = tmp_path / "fib.l3"
+    input.write_text((EXAMPLES / "fib.l3").read_text())
+
+    result = CliRunner().invoke(main, ["--no-server", "--emit", emit, "--ir-format", "binary", str(input)])
+    assert result.exit_code == 0, result.output
+
+    result = CliRunner().invoke(main, ["--no-server", str(tmp_path / f"fib.{emit}.ir")])
+    assert result.exit_code == 0, result.output
+
+    assert run(tmp_path / f"fib.{emit}.py", "l0" if emit == "l0" else "l1", [10]) == 55
+
+
+def test_run_passes_resume_avoids_names():
+    # uniqify renames t to t0, which CPS conversion would otherwise make up again
+    l2 = run_passes(read_program("(l3 (t) (+ t ((\\ (x) x) 1)))"), Options(emit="l2"))
+    module = run_passes(l2, Options())
+
+    namespace: dict[str, Any] = {}
+    exec(module, namespace)
+    assert namespace["l1"](2) == 3
+
+
+def test_main_emit_before_input(tmp_path: Path):
+    input = tmp_path / "fact.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text())
+    CliRunner().invoke(main, ["--no-server", "--emit", "l1", "--ir-format", "binary", str(input)])
+
+    result = CliRunner().invoke(main, ["--no-server", "--emit", "l2", str(tmp_path / "fact.l1.ir")])
+
+    assert result.exit_code == 2
+    assert "cannot emit l2 from an l1 program" in result.output
+
+
+def test_load_ir_not_a_program(tmp_path: Path):
+    path = tmp_path / "term.ir"
+    path.write_bytes(dumps(L2.Immediate(value=1)))
+
+    with pytest.raises(ValueError, match="not a program: 'immediate'"):
+        load_ir(path)
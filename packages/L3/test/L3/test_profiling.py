@@ -0,0 +1,139 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from L3.main import compile_program, main
+from L3.parse import read_program
+from L3.pipeline import Options
+from L3.profiling import Profiler, Stage, count_nodes
+from L3.syntax import Immediate, Let, Reference
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+STAGES = ["parse", "check", "uniqify", "eliminate_letrec", "optimize", "cps_convert", "to_python"]
+
+FUSED = ["parse", "front_end", "optimize", "cps_to_python"]
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        pytest.param(Let(bindings=[("x", Immediate(value=1))], body=Reference(name="x")), 3, id="let"),
+        pytest.param((lambda name: name, Reference(name="x")), 1, id="tuple"),
+        pytest.param(["unknown variable: x"], None, id="diagnostics"),
+        pytest.param("l1 = None", None, id="python"),
+    ],
+)
+def test_count_nodes(value: object, expected: int | None):
+    assert count_nodes(value) == expected
+
+
+def test_profiler_stages():
+    profile = Profiler()
+    program = read_program((EXAMPLES / "fact.l3").read_text())
+
+    compile_program(program, Options(level=0, fuse=False), profile)
+
+    assert [stage.name for stage in profile.stages] == [name for name in STAGES if name not in {"parse", "optimize"}]
+    check, uniqify, *_, to_python = profile.stages
+    assert check.nodes_in == uniqify.nodes_in == uniqify.nodes_out == count_nodes(program)
+    assert check.nodes_out == count_nodes(program) and to_python.nodes_out is None
+    assert all(stage.seconds >= 0 and stage.peak_bytes > 0 for stage in profile.stages)
+
+
+def test_profiler_already_tracing():
+    profile = Profiler()
+
+    tracemalloc.start()
+    try:
+        profile.run("allocate", lambda count: [object() for _ in range(count)], 1000)
+        assert tracemalloc.is_tracing()
+
+    finally:
+        tracemalloc.stop()
+
+    [stage] = profile.stages
+    assert stage.peak_bytes >= 1000 * 16
+
+
+def test_profiler_error():
+    profile = Profiler()
+
+    def fail() -> None:
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        profile.run("fail", fail)
+
+    assert not profile.stages
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiler_report():
+    profile = Profiler()
+    profile.stages = [Stage("a", 0.5, 100, None, 3), Stage("b", 0.25, 300, 3, None)]
+
+    assert profile.table().splitlines() == [
+        "stage                time (ms)    peak (KiB)    nodes in   nodes out",
+        "a                       500.00           0.1           -           3",
+        "b                       250.00           0.3           3           -",
+        "total                   750.00",
+    ]
+    assert profile.report() == {
+        "stages": [
+            {"name": "a", "seconds": 0.5, "peak_bytes": 100, "nodes_in": None, "nodes_out": 3},
+            {"name": "b", "seconds": 0.25, "peak_bytes": 300, "nodes_in": 3, "nodes_out": None},
+        ],
+        "seconds": 0.75,
+        "peak_bytes": 300,
+    }
+
+
+def test_main_profile_passes(tmp_path: Path):
+    result = CliRunner().invoke(main, ["--profile-passes", "-o", str(tmp_path / "fact.py"), str(EXAMPLES / "fact.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert [line.split()[0] for line in result.output.splitlines()] == ["stage", *FUSED, "total"]
+
+
+def test_main_profile_json(tmp_path: Path):
+    report = tmp_path / "profile.json"
+
+    result = CliRunner().invoke(
+        main,
+        [
+            "--no-fuse",
+            "--profile-json",
+            str(report),
+            "--cache-dir",
+            str(tmp_path),
+            "-o",
+            str(tmp_path / "fact.py"),
+            str(EXAMPLES / "fact.l3"),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    data = json.loads(report.read_text())
+    assert data["input"] == str(EXAMPLES / "fact.l3")
+    assert [stage["name"] for stage in data["stages"]] == STAGES
+    assert data["stages"][0]["nodes_out"] == count_nodes(read_program((EXAMPLES / "fact.l3").read_text()))
+
+
+def test_main_profile_stream(tmp_path: Path):
+    input = tmp_path / "all.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text() * 2)
+
+    result = CliRunner().invoke(main, ["--stream", "--profile-passes", str(input)])
+
+    assert result.exit_code == 0, result.output
+    assert [line.split()[0] for line in result.output.splitlines()].count("front_end") == 2
+
+
+def test_main_profile_single_input():
+    result = CliRunner().invoke(main, ["--profile-passes", str(EXAMPLES / "fact.l3"), str(EXAMPLES / "sum.l3")])
+
+    assert result.exit_code == 2
+    assert "--profile-passes requires a single input" in result.output
@@ -0,0 +1,202 @@
+import os
+import socket
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import click
+import pytest
+from click.testing import CliRunner
+from L3 import serve
+from L3.main import main
+from L3.serve import Request, Server
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+
+def run(module: Path, arguments: list[int]) -> int:
+    namespace: dict[str, Any] = {}
+    exec(module.read_text(), namespace)
+    return namespace["l1"](*arguments)
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[list[Request]]:
+    # the requests the server has compiled
+    handled: list[Request] = []
+    compile_request = serve.compile_request
+
+    def record(request: Request) -> None:
+        handled.append(request)
+        compile_request(request)
+
+    monkeypatch.setattr(serve, "compile_request", record)
+    monkeypatch.setenv("L3_SOCKET", str(tmp_path / "l3.sock"))
+
+    stop = threading.Event()
+    with Server(tmp_path / "l3.sock", idle_timeout=0.01) as instance:
+
+        def loop() -> None:
+            while not stop.is_set():
+                instance.handle_request()
+
+        thread = threading.Thread(target=loop)
+        thread.start()
+        yield handled
+        stop.set()
+        thread.join()
+
+
+@pytest.mark.parametrize(
+    ("name", "options"),
+    [
+        ("fact.l3", []),
+        ("fact.l3", ["--parser", "reader", "--no-optimize"]),
+        ("fact.json", []),
+    ],
+)
+def test_serve_compiles(tmp_path: Path, server: list[Request], name: str, options: list[str]):
+    output = tmp_path / "fact.py"
+
+    result = CliRunner().invoke(main, [*options, "-o", str(output), str(EXAMPLES / name)])
+
+    assert result.exit_code == 0, result.output
+    assert run(output, [5]) == 120
+    assert [request["output"] for request in server] == [str(output)]
+
+
+def test_serve_stream(tmp_path: Path, server: list[Request]):
+    input = tmp_path / "all.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text() * 2)
+
+    result = CliRunner().invoke(main, ["--stream", str(input)])
+
+    assert result.exit_code == 0, result.output
+    assert run(tmp_path / "all_0.py", [5]) == run(tmp_path / "all_1.py", [5]) == 120
+    assert len(server) == 1
+
+
+@pytest.mark.parametrize(
+    ("source", "output", "message"),
+    [
+        ("(l3 (x) (+ x y))", "errors.py", "unknown variable: y"),
+        ("(l3 (x) (+ x 1)", "errors.py", "unclosed form"),
+        ("(l3 (x) x)", "missing/errors.py", "No such file or directory"),
+    ],
+)
+def test_serve_errors(tmp_path: Path, server: list[Request], source: str, output: str, message: str):
+    input = tmp_path / "errors.l3"
+    input.write_text(source)
+
+    result = CliRunner().invoke(main, ["--parser", "reader", "-o", str(tmp_path / output), str(input)])
+
+    assert result.exit_code == 1
+    assert message in result.output
+    assert len(server) == 1
+
+
+def test_serve_errors_lark(tmp_path: Path, server: list[Request]):
+    input = tmp_path / "errors.l3"
+    input.write_text("(l3 () (+ 1")
+
+    result = CliRunner().invoke(main, ["-o", str(tmp_path / "errors.py"), str(input)])
+
+    assert result.exit_code == 1
+    assert "Unexpected token" in result.output
+    assert len(server) == 1
+
+
+def test_serve_no_reply(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # a server that hangs up without answering is treated as none
+    path = tmp_path / "l3.sock"
+    monkeypatch.setenv("L3_SOCKET", str(path))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(str(path))
+        listener.listen()
+
+        def hang_up() -> None:
+            connection, _ = listener.accept()
+            with connection:
+                connection.recv(1 << 16)
+
+        thread = threading.Thread(target=hang_up)
+        thread.start()
+        output = tmp_path / "fact.py"
+        result = CliRunner().invoke(main, ["-o", str(output), str(EXAMPLES / "fact.l3")])
+        thread.join()
+
+    assert result.exit_code == 0, result.output
+    assert run(output, [5]) == 120
+
+
+def test_serve_no_server(tmp_path: Path, server: list[Request]):
+    result = CliRunner().invoke(main, ["--no-server", "-o", str(tmp_path / "fact.py"), str(EXAMPLES / "fact.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert not server
+
+
+def test_serve_already_serving(tmp_path: Path, server: list[Request]):
+    with pytest.raises(click.ClickException, match="already serving"):
+        Server(tmp_path / "l3.sock")
+
+
+def test_serve_stale_socket(tmp_path: Path):
+    path = tmp_path / "l3.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(path))
+
+    result = CliRunner().invoke(main, ["serve", "--socket", str(path), "--idle-timeout", "0"])
+
+    assert result.exit_code == 0, result.output
+    assert f"serving on {path}" in result.output
+    assert not path.exists()
+
+
+def test_serve_default_socket(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.delenv("L3_SOCKET", raising=False)
+
+    result = CliRunner().invoke(main, ["serve", "--idle-timeout", "0"])
+
+    assert result.exit_code == 0, result.output
+    assert str(tmp_path) in result.output
+
+
+def test_serve_binary_ir(tmp_path: Path, server: list[Request]):
+    input = tmp_path / "fact.l3"
+    input.write_text((EXAMPLES / "fact.l3").read_text())
+
+    for arguments in [["--emit", "l2", "--ir-format", "binary", str(input)], [str(tmp_path / "fact.l2.ir")]]:
+        result = CliRunner().invoke(main, arguments)
+        assert result.exit_code == 0, result.output
+
+    # the binary input is compiled here rather than sent
+    assert run(tmp_path / "fact.l2.py", [5]) == 120
+    assert len(server) == 1
+
+
+@pytest.mark.parametrize("credentials", [True, False])
+def test_serve_other_user(tmp_path: Path, server: list[Request], monkeypatch: pytest.MonkeyPatch, credentials: bool):
+    # a server run by someone else is never sent the source
+    if not credentials:
+        monkeypatch.delattr(socket, "SO_PEERCRED")
+    monkeypatch.setattr(os, "getuid", lambda: os.geteuid() + 1)
+    output = tmp_path / "fact.py"
+
+    result = CliRunner().invoke(main, ["-o", str(output), str(EXAMPLES / "fact.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert run(output, [5]) == 120
+    assert not server
+
+
+def test_serve_same_user_without_credentials(tmp_path: Path, server: list[Request], monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delattr(socket, "SO_PEERCRED")
+    output = tmp_path / "fact.py"
+
+    result = CliRunner().invoke(main, ["-o", str(output), str(EXAMPLES / "fact.l3")])
+
+    assert result.exit_code == 0, result.output
+    assert len(server) == 1
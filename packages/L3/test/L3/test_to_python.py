@@ -0,0 +1,161 @@
+import ast
+
+import pytest
+from L3.syntax import (
+    Abstract,
+    Allocate,
+    Apply,
+    Begin,
+    Branch,
+    Immediate,
+    Let,
+    LetRec,
+    Load,
+    Primitive,
+    Program,
+    Reference,
+    Store,
+    Term,
+)
+from L3.to_python import to_ast_program, to_ast_term
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    [
+        pytest.param(
+            Let(bindings=[("x", Immediate(value=1)), ("y", Reference(name="x"))], body=Reference(name="y")),
+            "((x := 1), (y := x), y)[-1]",
+            id="let",
+        ),
+        pytest.param(
+            LetRec(
+                bindings=[
+                    (
+                        "f",
+                        Abstract(
+                            parameters=["n"], body=Apply(target=Reference(name="f"), arguments=[Reference(name="n")])
+                        ),
+                    )
+                ],
+                body=Reference(name="f"),
+            ),
+            "((f := None), (f := (lambda n: f(n))), f)[-1]",
+            id="letrec",
+        ),
+        pytest.param(
+            Reference(name="x"),
+            "x",
+            id="reference",
+        ),
+        pytest.param(
+            Abstract(parameters=["x", "y"], body=Reference(name="x")),
+            "lambda x, y: x",
+            id="abstract",
+        ),
+        pytest.param(
+            Apply(target=Reference(name="f"), arguments=[Immediate(value=1), Reference(name="x")]),
+            "f(1, x)",
+            id="apply",
+        ),
+        pytest.param(
+            Immediate(value=42),
+            "42",
+            id="immediate",
+        ),
+        pytest.param(
+            Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1)),
+            "x + 1",
+            id="add",
+        ),
+        pytest.param(
+            Primitive(operator="-", left=Reference(name="x"), right=Immediate(value=1)),
+            "x - 1",
+            id="subtract",
+        ),
+        pytest.param(
+            Primitive(operator="*", left=Reference(name="x"), right=Immediate(value=1)),
+            "x * 1",
+            id="multiply",
+        ),
+        pytest.param(
+            Branch(
+                operator="<",
+                left=Reference(name="x"),
+                right=Immediate(value=1),
+                consequent=Immediate(value=2),
+                otherwise=Immediate(value=3),
+            ),
+            "2 if x < 1 else 3",
+            id="less",
+        ),
+        pytest.param(
+            Branch(
+                operator="==",
+                left=Reference(name="x"),
+                right=Immediate(value=1),
+                consequent=Immediate(value=2),
+                otherwise=Immediate(value=3),
+            ),
+            "2 if x == 1 else 3",
+            id="equal",
+        ),
+        pytest.param(
+            Allocate(count=2),
+            "[None, None]",
+            id="allocate",
+        ),
+        pytest.param(
+            Load(base=Reference(name="x"), index=1),
+            "x.__getitem__(1)",
+            id="load",
+        ),
+        pytest.param(
+            Store(base=Reference(name="x"), index=1, value=Immediate(value=2)),
+            "(x.__setitem__(1, 2), 0)[-1]",
+            id="store",
+        ),
+        pytest.param(
+            Begin(
+                effects=[Store(base=Reference(name="x"), index=0, value=Immediate(value=1))], value=Reference(name="x")
+            ),
+            "((x.__setitem__(0, 1), 0)[-1], x)[-1]",
+            id="begin",
+        ),
+    ],
+)
+def test_to_ast_term(term: Term, expected: str):
+    assert ast.unparse(to_ast_term(term)) == expected
+
+
+def test_to_ast_program():
+    program = Program(
+        parameters=["x"], body=Primitive(operator="+", left=Reference(name="x"), right=Immediate(value=1))
+    )
+
+    expected = "\n".join(
+        [
+            "def l3(x):",
+            "    return x + 1",
+            "if __name__ == '__main__':",
+            "    import sys",
+            "    print(l3(int(sys.argv[1])))",
+        ]
+    )
+
+    assert to_ast_program(program) == expected
+
+
+def test_to_ast_term_deep():
+    term: Term = Reference(name="x")
+    for _ in range(10_000):
+        term = Primitive(operator="+", left=term, right=Immediate(value=1))
+
+    actual = to_ast_term(term)
+
+    depth = 0
+    while isinstance(actual, ast.BinOp):
+        actual, depth = actual.left, depth + 1
+
+    assert depth == 10_000
+    assert isinstance(actual, ast.Name)
@@ -1,4 +1,4 @@
-from L3.syntax import Apply, Immediate, Let, Reference
+from L3.syntax import Apply, Immediate, Let, Primitive, Reference
 from L3.uniqify import Context, uniqify_term
 from util.sequential_name_generator import SequentialNameGenerator
 
@@ -59,3 +59,21 @@ def test_uniqify_term_let():
     )
 
     assert actual == expected
+
+
+def test_uniqify_shares_unchanged_subtrees():
+    left = Primitive(operator="+", left=Immediate(value=1), right=Immediate(value=2))
+    term = Primitive(operator="*", left=left, right=Reference(name="x"))
+
+    context: Context = {"x": "x"}
+    fresh = SequentialNameGenerator()
+    actual = uniqify_term(term, context, fresh)
+
+    assert actual is term
+
+    context = {"x": "x0"}
+    actual = uniqify_term(term, context, fresh)
+
+    assert actual == Primitive(operator="*", left=left, right=Reference(name="x0"))
+    assert isinstance(actual, Primitive)
+    assert actual.left is left
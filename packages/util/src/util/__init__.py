@@ -1,5 +1,9 @@
+from .arena import Arena
+from .interner import Interner
 from .sequential_name_generator import SequentialNameGenerator
 
 __all__ = [
+    "Arena",
+    "Interner",
     "SequentialNameGenerator",
 ]
@@ -0,0 +1,210 @@
+from array import array
+from collections.abc import Sequence
+from enum import IntEnum
+from typing import Any, ClassVar, Protocol, Self
+
+# A columnar store for the frozen pydantic IRs in L0-L3. Each node is a tag (an index into the table of node
+# classes) plus a fixed run of slots, one per field. A slot is a kind byte and a 64-bit payload: a child node
+# index, an immediate, an index into the interned identifier table, or an index into the span table for
+# sequences and tuples, whose items are again runs of slots. Nodes are allocated in pre-order, so every child
+# has a larger index than its parent.
+
+
+class Kind(IntEnum):
+    NODE = 0
+    INT = 1
+    BIG = 2
+    STR = 3
+    LIST = 4
+    TUPLE = 5
+
+
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class Model(Protocol):
+    model_fields: ClassVar[dict[str, Any]]
+
+    @classmethod
+    def model_construct(cls, _fields_set: set[str] | None = None, **values: Any) -> Self: ...
+
+
+class Arena:
+    def __init__(self) -> None:
+        self.classes: list[type[Model]] = []
+        self.class_ids: dict[type[Model], int] = {}
+        self.class_fields: list[tuple[str, ...]] = []
+        self.names: list[str] = []
+        self.name_ids: dict[str, int] = {}
+
+        self.tags = array("B")
+        self.offsets = array("Q")
+        self.kinds = array("B")
+        self.payloads = array("q")
+        self.span_starts = array("Q")
+        self.span_lengths = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def intern(self, name: str) -> int:
+        index = self.name_ids.get(name)
+        if index is None:
+            index = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def _class_id(self, cls: type[Model]) -> int:
+        index = self.class_ids.get(cls)
+        if index is None:
+            index = self.class_ids[cls] = len(self.classes)
+            self.classes.append(cls)
+            self.class_fields.append(tuple(name for name in cls.model_fields if name != "tag"))
+        return index
+
+    def _reserve(self, count: int) -> int:
+        start = len(self.kinds)
+        self.kinds.frombytes(bytes(count))
+        self.payloads.frombytes(bytes(self.payloads.itemsize * count))
+        return start
+
+    def _allocate(self, node: Model, pending: list[tuple[int, Model]]) -> int:
+        tag = self._class_id(type(node))
+        index = len(self.tags)
+        self.tags.append(tag)
+        self.offsets.append(self._reserve(len(self.class_fields[tag])))
+        pending.append((index, node))
+        return index
+
+    def _fill(self, start: int, values: Sequence[Any], pending: list[tuple[int, Model]]) -> None:
+        for slot, value in enumerate(values, start):
+            match value:
+                case str():
+                    self.kinds[slot], self.payloads[slot] = Kind.STR, self.intern(value)
+
+                case bool():
+                    raise TypeError(f"unsupported field value: {value!r}")
+
+                case int() if _INT_MIN <= value <= _INT_MAX:
+                    self.kinds[slot], self.payloads[slot] = Kind.INT, value
+
+                case int():
+                    self.kinds[slot], self.payloads[slot] = Kind.BIG, self.intern(str(value))
+
+                case list() | tuple():
+                    span = len(self.span_starts)
+                    items = self._reserve(len(value))  # pyright: ignore[reportUnknownArgumentType]
+                    self.span_starts.append(items)
+                    self.span_lengths.append(len(value))  # pyright: ignore[reportUnknownArgumentType]
+                    self.kinds[slot], self.payloads[slot] = Kind.LIST if isinstance(value, list) else Kind.TUPLE, span
+                    self._fill(items, value, pending)  # pyright: ignore[reportUnknownArgumentType]
+
+                case _ if hasattr(type(value), "model_fields"):
+                    self.kinds[slot], self.payloads[slot] = Kind.NODE, self._allocate(value, pending)
+
+                case _:
+                    raise TypeError(f"unsupported field value: {value!r}")
+
+    def add(self, root: Model) -> Node:
+        pending: list[tuple[int, Model]] = []
+        index = self._allocate(root, pending)
+
+        while pending:
+            node_index, node = pending.pop()
+            fields = self.class_fields[self.tags[node_index]]
+            self._fill(self.offsets[node_index], [getattr(node, name) for name in fields], pending)
+
+        return Node(self, index)
+
+    def _decode(self, slot: int, built: dict[int, Any] | None) -> Any:
+        payload = self.payloads[slot]
+
+        match self.kinds[slot]:
+            case Kind.NODE:
+                return Node(self, payload) if built is None else built[payload]
+
+            case Kind.INT:
+                return payload
+
+            case Kind.BIG:
+                return int(self.names[payload])
+
+            case Kind.STR:
+                return self.names[payload]
+
+            case kind:
+                start, length = self.span_starts[payload], self.span_lengths[payload]
+                items = [self._decode(item, built) for item in range(start, start + length)]
+                return items if kind == Kind.LIST else tuple(items)
+
+    def _children(self, slot: int) -> list[int]:
+        payload = self.payloads[slot]
+
+        match self.kinds[slot]:
+            case Kind.NODE:
+                return [payload]
+
+            case Kind.LIST | Kind.TUPLE:
+                start = self.span_starts[payload]
+                return [
+                    child for item in range(start, start + self.span_lengths[payload]) for child in self._children(item)
+                ]
+
+            case _:
+                return []
+
+    def to_model(self, index: int) -> Any:
+        # collect the subtree with an explicit stack, then build it children-first (descending index order)
+        subtree: list[int] = []
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            subtree.append(node)
+            start = self.offsets[node]
+            for slot in range(start, start + len(self.class_fields[self.tags[node]])):
+                stack.extend(self._children(slot))
+
+        built: dict[int, Any] = {}
+        for node in sorted(subtree, reverse=True):
+            tag = self.tags[node]
+            start = self.offsets[node]
+            values = {name: self._decode(slot, built) for slot, name in enumerate(self.class_fields[tag], start)}
+            built[node] = self.classes[tag].model_construct(**values)
+
+        return built[index]
+
+
+class Node:
+    # the slots are underscored so that they don't hide fields of the same name, such as the index of a Load
+    __slots__ = ("_arena", "_index")
+
+    def __init__(self, arena: Arena, index: int) -> None:
+        self._arena = arena
+        self._index = index
+
+    def __repr__(self) -> str:
+        return f"Node({self.type.__name__}, {self._index})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Node) and self._arena is other._arena and self._index == other._index
+
+    def __hash__(self) -> int:
+        return hash((id(self._arena), self._index))
+
+    @property
+    def type(self) -> type[Model]:
+        return self._arena.classes[self._arena.tags[self._index]]
+
+    @property
+    def tag(self) -> str:
+        return self.type.model_fields["tag"].default
+
+    def __getattr__(self, name: str) -> Any:
+        arena = self._arena
+        fields = arena.class_fields[arena.tags[self._index]]
+        if name not in fields:
+            raise AttributeError(name)
+        return arena._decode(arena.offsets[self._index] + fields.index(name), None)  # pyright: ignore[reportPrivateUsage]
+
+    def to_model(self) -> Any:
+        return self._arena.to_model(self._index)
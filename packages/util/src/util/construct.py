@@ -0,0 +1,54 @@
+import os
+from typing import Any, cast
+
+from .arena import Model
+
+# Passes build new nodes only from nodes that were already validated, so by default they skip pydantic validation
+# and use model_construct. Full validation can be turned back on for debugging with L3_VALIDATE=1 (or the l3
+# --validate flag), which makes every internal construction go through the model's validating constructor.
+
+_validate = os.environ.get("L3_VALIDATE", "") not in {"", "0"}
+
+
+def validation_enabled() -> bool:
+    return _validate
+
+
+def enable_validation(enabled: bool = True) -> None:
+    global _validate
+    _validate = enabled
+
+
+def construct[T: Model](cls: type[T], /, **fields: Any) -> T:
+    if _validate:
+        return cast(Any, cls)(**fields)
+
+    return cls.model_construct(**fields)
+
+
+def _same(old: Any, new: Any) -> bool:
+    if old is new:
+        return True
+
+    match new:
+        case list() | tuple():
+            return (
+                type(old) is type(new)  # pyright: ignore[reportUnknownArgumentType]
+                and len(old) == len(new)  # pyright: ignore[reportUnknownArgumentType]
+                and all(map(_same, old, new))  # pyright: ignore[reportUnknownArgumentType]
+            )
+
+        case _ if hasattr(type(new), "model_fields"):
+            return False
+
+        case _:
+            return old == new
+
+
+def replace[T: Model](node: T, /, **fields: Any) -> T:
+    # copy-on-write: when no field actually changes (child nodes compared by identity, everything else by value) the
+    # node itself is returned, so unchanged subtrees stay shared between a pass's input and its output
+    if all(_same(getattr(node, name), value) for name, value in fields.items()):
+        return node
+
+    return construct(type(node), **{name: getattr(node, name) for name in type(node).model_fields} | fields)
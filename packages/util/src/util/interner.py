@@ -0,0 +1,128 @@
+from typing import Any, cast
+
+from .arena import Model
+
+# Hash-consing for the frozen pydantic IRs in L0-L3. An Interner hands out one canonical object per structurally
+# distinct node, so for interned nodes `a is b` coincides with `a == b`, repeated subterms share memory, and memo
+# tables can be keyed by `id(node)`. Each canonical node's structural hash is computed once, from its fields and
+# its children's hashes, and kept alongside it.
+
+
+class Interner:
+    def __init__(self) -> None:
+        self._table: dict[tuple[Any, ...], Model] = {}
+        self._hashes: dict[int, int] = {}
+        self._fields: dict[type[Model], tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, node: object) -> bool:
+        return id(node) in self._hashes
+
+    def hash(self, node: Model) -> int:
+        return self._hashes[id(self.intern(node))]
+
+    def _names(self, cls: type[Model]) -> tuple[str, ...]:
+        names = self._fields.get(cls)
+        if names is None:
+            names = self._fields[cls] = tuple(name for name in cls.model_fields if name != "tag")
+        return names
+
+    def _canonical(self, value: Any) -> tuple[Any, Any, int]:
+        # returns the canonical value, its table key (identity-based for nodes) and its structural hash
+        match value:
+            case list() | tuple():
+                items = [self._canonical(item) for item in cast(list[Any], value)]
+                canonical = [item for item, _, _ in items]
+                kind = type(cast(object, value))
+                return (
+                    canonical if kind is list else tuple(canonical),
+                    (kind, *(key for _, key, _ in items)),
+                    hash((kind.__name__, *(hashed for _, _, hashed in items))),
+                )
+
+            case _ if hasattr(type(value), "model_fields"):
+                node = self.intern(value)
+                return node, id(node), self._hashes[id(node)]
+
+            case _:
+                return value, value, hash(value)
+
+    def _lookup(self, cls: type[Model], fields: dict[str, Any], existing: Model | None) -> Model:
+        names = self._names(cls)
+        if any(name not in fields for name in names):
+            return cls(**fields)  # let pydantic report the missing fields
+
+        values = {name: self._canonical(fields[name]) for name in names}
+        key = (cls, *(key for _, key, _ in values.values()))
+
+        node = self._table.get(key)
+        if node is None:
+            canonical = {name: value for name, (value, _, _) in values.items()}
+            if existing is None:
+                node = cls(**canonical)
+            elif all(canonical[name] is getattr(existing, name) for name in names):
+                node = existing
+            else:
+                node = cls.model_construct(**canonical)
+
+            self._table[key] = node
+            self._hashes[id(node)] = hash((cls.__qualname__, *(hashed for _, _, hashed in values.values())))
+
+        return node
+
+    def __call__[T: Model](self, cls: type[T], /, **fields: Any) -> T:
+        return cast(T, self._lookup(cls, fields, None))
+
+    def intern[T: Model](self, root: T) -> T:
+        if id(root) in self._hashes:
+            return root
+
+        # post-order with an explicit stack, so that children are canonical before their parent is looked up
+        done: dict[int, Model] = {}
+        stack: list[tuple[Model, bool]] = [(root, False)]
+
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in done or id(node) in self._hashes:
+                continue
+
+            names = self._names(type(node))
+
+            if not expanded:
+                stack.append((node, True))
+                for name in names:
+                    stack.extend((child, False) for child in _children(getattr(node, name)))
+                continue
+
+            fields = {name: _replace(getattr(node, name), done) for name in names}
+            done[id(node)] = self._lookup(type(node), fields, node)
+
+        return cast(T, done.get(id(root), root))
+
+    def clear(self) -> None:
+        self._table.clear()
+        self._hashes.clear()
+
+
+def _children(value: Any) -> list[Model]:
+    match value:
+        case list() | tuple():
+            return [child for item in cast(list[Any], value) for child in _children(item)]
+
+        case _ if hasattr(type(value), "model_fields"):
+            return [value]
+
+        case _:
+            return []
+
+
+def _replace(value: Any, done: dict[int, Model]) -> Any:
+    match value:
+        case list() | tuple():
+            items = [_replace(item, done) for item in cast(list[Any], value)]
+            return items if isinstance(value, list) else tuple(items)
+
+        case _:
+            return done.get(id(value), value)
@@ -0,0 +1,87 @@
+from collections.abc import Callable, Generator, Hashable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from .parallel import serial
+from .traverse import Dispatch, Step
+
+# Memoizes a pass from one compilation of a program to the next. Results are kept per position in the tree rather
+# than per node, so that a subtree that occurs twice still gets two results, each with its own fresh names. The engine
+# runs steps depth first and one at a time, so a memoized step's position is its parent's position and the number of
+# memoized steps the parent has started before it; editing one subtree leaves the positions everywhere else in place.
+# A result is reused when the node at its position is the same object as last time and its context key is equal.
+#
+# Fresh names are pooled per position as well: the i-th name a position asks for is the one it got last time, so a
+# recomputed binder keeps its name and the results below it, which refer to that name, stay valid. Pools are disjoint
+# and every name in them comes from the same generator, so names are still unique across the whole program.
+
+
+class Memo:
+    def __init__(self, fresh: Callable[[str], str]) -> None:
+        # of the last run
+        self.hits = 0
+        self.misses = 0
+        self._fresh = fresh
+        self._positions: dict[tuple[int, int], int] = {}
+        self._entries: dict[int, tuple[object, Hashable, Any]] = {}
+        self._pools: dict[int, list[tuple[str, str]]] = {}
+        # one frame per memoized step in progress: its position, the children it has started and the names it has used
+        self._frames: list[list[int]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @contextmanager
+    def installed[R](self, dispatch: Dispatch[R], around: Callable[..., Step[R]]) -> Iterator[None]:
+        self.hits = self.misses = 0
+        self._frames = [[0, 0, 0]]
+        dispatch.around = around
+        try:
+            # positions are handed out in the order steps start, which parallel regions would scramble
+            with serial():
+                yield
+
+        finally:
+            dispatch.around = None
+
+    def step[R](self, node: object, key: Hashable, compute: Callable[[], Step[R]]) -> Generator[Any, Any, R]:
+        parent = self._frames[-1]
+        position = self._positions.setdefault((parent[0], parent[1]), len(self._positions) + 1)
+        parent[1] += 1
+
+        entry = self._entries.get(position)
+        if entry is not None and entry[0] is node and entry[1] == key:
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        self._frames.append([position, 0, 0])
+        try:
+            result = yield compute()
+
+        finally:
+            self._frames.pop()
+
+        self._entries[position] = (node, key, result)
+        return result
+
+    def fresh(self, name: str) -> str:
+        frame = self._frames[-1]
+        pool = self._pools.setdefault(frame[0], [])
+        index = frame[2]
+        frame[2] += 1
+
+        if index < len(pool) and pool[index][0] == name:
+            return pool[index][1]
+
+        fresh = self._fresh(name)
+        if index < len(pool):
+            pool[index] = (name, fresh)
+        else:
+            pool.append((name, fresh))
+        return fresh
+
+    def clear(self) -> None:
+        self._positions.clear()
+        self._entries.clear()
+        self._pools.clear()
@@ -0,0 +1,81 @@
+import threading
+from collections.abc import Generator, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any
+
+from .traverse import Step, run, sequence
+
+# Runs independent steps of a pass, such as the bindings of one Let, on a pool of threads. The pool is off until
+# `set_workers` (the l3 --threads flag) asks for more than one worker. Only the outermost parallel region of a
+# compile fans out: a region reached on a worker, or under `serial`, runs its steps in order, so that a worker never
+# waits on tasks queued behind it. util.memo runs its passes under `serial`, since its positions are the order in
+# which steps start. Each worker runs its step on an engine stack of its own; the steps overlap on a free-threaded
+# build and only interleave under the GIL.
+
+_pool: ThreadPoolExecutor | None = None
+_workers = 1
+
+_local = threading.local()
+
+
+def set_workers(workers: int) -> None:
+    global _pool, _workers
+    if workers == _workers:
+        return
+
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = ThreadPoolExecutor(workers, thread_name_prefix="parallel") if workers > 1 else None
+    _workers = workers
+
+
+@contextmanager
+def workers(count: int) -> Iterator[None]:
+    # set_workers for the length of a block, and back to the count before it afterwards
+    previous = _workers
+    set_workers(count)
+    try:
+        yield
+
+    finally:
+        set_workers(previous)
+
+
+def parallel_enabled() -> bool:
+    # whether a parallel region entered here would fan out
+    return _pool is not None and not getattr(_local, "serial", False)
+
+
+@contextmanager
+def serial() -> Iterator[None]:
+    previous = getattr(_local, "serial", False)
+    _local.serial = True
+    try:
+        yield
+
+    finally:
+        _local.serial = previous
+
+
+def chunks[T](items: Sequence[T]) -> list[Sequence[T]]:
+    # items split into one run of neighbours per worker, or all of them at once when the pool is off
+    count = min(len(items), _workers) if parallel_enabled() else 1
+    size, extra = divmod(len(items), count) if count else (0, 0)
+    bounds = [index * size + min(index, extra) for index in range(count + 1)]
+    return [items[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _run[R](steps: Sequence[Step[R]]) -> list[R]:
+    with serial():
+        return run(sequence(steps))
+
+
+def parallel[R](steps: Iterable[Step[R]]) -> Generator[Any, Any, list[R]]:
+    # like sequence, with the steps spread over the pool when it is enabled; a step must then not share mutable state
+    # with its siblings, and all of them are created up front. Each worker takes a run of neighbouring steps, so that
+    # a wide Let costs a handful of tasks rather than one per binding.
+    if _pool is None or not parallel_enabled():
+        return (yield sequence(steps))
+
+    return [result for results in _pool.map(_run, chunks(list(steps))) for result in results]
@@ -0,0 +1,38 @@
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import contextmanager
+
+# A lexical environment for passes that walk a term depth first. Copying the enclosing environment into a new dict
+# at every binder costs O(depth x names) on deeply nested programs; a Scope instead keeps one stack of values per
+# name, and `bind` pushes onto the stacks of the names it binds and pops them again on exit. Extending and
+# restoring the environment therefore cost O(1) per bound name, and lookups see the innermost binding.
+
+
+class Scope[K, V](Mapping[K, V]):
+    def __init__(self, bindings: Mapping[K, V] | None = None) -> None:
+        self._stacks: dict[K, list[V]] = {key: [value] for key, value in (bindings or {}).items()}
+
+    def __getitem__(self, key: K) -> V:
+        return self._stacks[key][-1]
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._stacks)
+
+    def __len__(self) -> int:
+        return len(self._stacks)
+
+    @contextmanager
+    def bind(self, bindings: Iterable[tuple[K, V]]) -> Iterator[None]:
+        keys: list[K] = []
+        for key, value in bindings:
+            self._stacks.setdefault(key, []).append(value)
+            keys.append(key)
+
+        try:
+            yield
+
+        finally:
+            for key in reversed(keys):
+                stack = self._stacks[key]
+                stack.pop()
+                if not stack:
+                    del self._stacks[key]
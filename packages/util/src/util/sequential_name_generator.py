@@ -1,11 +1,15 @@
+import threading
 from collections import defaultdict
 
 
 class SequentialNameGenerator:
+    # shared by the passes of one compile, which may run on several threads
     def __init__(self) -> None:
         self._counters: dict[str, int] = defaultdict[str, int](int)
+        self._lock = threading.Lock()
 
     def __call__(self, candidate: str) -> str:
-        current: int = self._counters[candidate]
-        self._counters[candidate] += 1
+        with self._lock:
+            current: int = self._counters[candidate]
+            self._counters[candidate] += 1
         return f"{candidate}{current}"
@@ -0,0 +1,212 @@
+import mmap
+from collections.abc import Buffer, Callable, Iterable
+from enum import IntEnum
+from pathlib import Path
+from typing import Any
+
+from .arena import Model
+
+# A compact binary format for the frozen pydantic IRs in L0-L3. After a magic number come a table of the node classes
+# that occur, each as its tag and field names, and a table of the distinct strings, which holds every identifier and
+# operator once. The tree follows in pre-order: each value is one byte, and a node is just the byte of its class
+# followed by its fields. An integer is followed by its zigzag varint, a string by the varint index of its entry and
+# a sequence by its varint length and its items. Nodes are built with model_construct, without validation, straight
+# from the buffer, which may be a memory map of the file; both directions keep their own stack, so any depth is fine.
+
+MAGIC = b"LIR\x01"
+
+
+class Kind(IntEnum):
+    INT = 0
+    STR = 1
+    LIST = 2
+    TUPLE = 3
+    # the first of the bytes that stand for node classes
+    NODE = 4
+
+
+_MAX_CLASSES = 256 - Kind.NODE
+
+type _Build = Callable[[list[Any]], Any]
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_str(out: bytearray, value: str) -> None:
+    data = value.encode()
+    _write_varint(out, len(data))
+    out += data
+
+
+def dumps(root: Model) -> bytes:
+    classes: dict[type[Model], int] = {}
+    fields: list[tuple[str, ...]] = []
+    strings: dict[str, int] = {}
+    body = bytearray()
+
+    stack: list[Any] = [root]
+    while stack:
+        match stack.pop():
+            case str() as value:
+                body.append(Kind.STR)
+                _write_varint(body, strings.setdefault(value, len(strings)))
+
+            case bool() as value:
+                raise TypeError(f"unsupported field value: {value!r}")
+
+            case int() as value:
+                body.append(Kind.INT)
+                _write_varint(body, value << 1 if value >= 0 else ~value << 1 | 1)
+
+            case list() | tuple() as items:
+                body.append(Kind.LIST if isinstance(items, list) else Kind.TUPLE)
+                _write_varint(body, len(items))  # pyright: ignore[reportUnknownArgumentType]
+                stack.extend(reversed(items))  # pyright: ignore[reportUnknownArgumentType]
+
+            case value if hasattr(type(value), "model_fields"):
+                cls = type(value)
+                index = classes.get(cls)
+                if index is None:
+                    if len(classes) == _MAX_CLASSES:
+                        raise TypeError(f"more than {_MAX_CLASSES} node classes")
+                    index = classes[cls] = len(classes)
+                    fields.append(tuple(name for name in cls.model_fields if name != "tag"))
+                body.append(Kind.NODE + index)
+                stack.extend(getattr(value, name) for name in reversed(fields[index]))
+
+            case value:
+                raise TypeError(f"unsupported field value: {value!r}")
+
+    out = bytearray(MAGIC)
+    _write_varint(out, len(classes))
+    for cls, names in zip(classes, fields):
+        _write_str(out, cls.model_fields["tag"].default)
+        _write_varint(out, len(names))
+        for name in names:
+            _write_str(out, name)
+    _write_varint(out, len(strings))
+    for value in strings:
+        _write_str(out, value)
+    return bytes(out + body)
+
+
+def _read_varint(data: memoryview, position: int) -> tuple[int, int]:
+    value = shift = 0
+    while (byte := data[position]) & 0x80:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        position += 1
+    return value | byte << shift, position + 1
+
+
+def _read_str(data: memoryview, position: int) -> tuple[str, int]:
+    length, position = _read_varint(data, position)
+    if position + length > len(data):
+        raise IndexError
+    return str(data[position : position + length], "utf-8"), position + length
+
+
+def _node(cls: type[Model], names: tuple[str, ...]) -> _Build:
+    def build(items: list[Any]) -> Any:
+        return cls.model_construct(**dict(zip(names, items)))
+
+    return build
+
+
+def _header(
+    data: memoryview, classes: Callable[[str], Iterable[type[Model]]]
+) -> tuple[int, list[tuple[_Build, int]], list[str]]:
+    # the position of the tree, along with the builder and field count of each node class and the strings
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("not a serialized IR")
+
+    entries: list[tuple[str, tuple[str, ...]]] = []
+    count, position = _read_varint(data, len(MAGIC))
+    for _ in range(count):
+        tag, position = _read_str(data, position)
+        length, position = _read_varint(data, position)
+        names: list[str] = []
+        for _ in range(length):
+            name, position = _read_str(data, position)
+            names.append(name)
+        entries.append((tag, tuple(names)))
+    if not entries:
+        raise ValueError("serialized IR has no nodes")
+
+    # the root is the first node written, so its class comes first
+    known = {cls.model_fields["tag"].default: cls for cls in classes(entries[0][0])}
+    nodes: list[tuple[_Build, int]] = []
+    for tag, names in entries:
+        cls = known.get(tag)
+        if cls is None or names != tuple(name for name in cls.model_fields if name != "tag"):
+            raise ValueError(f"serialized IR has an unknown node: {tag!r}")
+        nodes.append((_node(cls, names), len(names)))
+
+    strings: list[str] = []
+    count, position = _read_varint(data, position)
+    for _ in range(count):
+        string, position = _read_str(data, position)
+        strings.append(string)
+    return position, nodes, strings
+
+
+def _root(items: list[Any]) -> Any:
+    return items[0]
+
+
+def loads(buffer: Buffer, classes: Callable[[str], Iterable[type[Model]]]) -> Any:
+    # classes maps the tag of the root to the node classes of its IR
+    with memoryview(buffer) as data:
+        try:
+            position, nodes, strings = _header(data, classes)
+
+            # a node or sequence being read: its builder, the number of its items and the items read so far
+            stack: list[tuple[_Build, int, list[Any]]] = [(_root, 1, [])]
+            while True:
+                build, count, items = stack[-1]
+                if len(items) == count:
+                    stack.pop()
+                    value = build(items)
+                    if not stack:
+                        break
+                    stack[-1][2].append(value)
+                    continue
+
+                kind = data[position]
+                if kind >= Kind.NODE:
+                    build, count = nodes[kind - Kind.NODE]
+                    stack.append((build, count, []))
+                    position += 1
+                    continue
+
+                value, position = _read_varint(data, position + 1)
+                match kind:
+                    case Kind.INT:
+                        items.append(~(value >> 1) if value & 1 else value >> 1)
+
+                    case Kind.STR:
+                        items.append(strings[value])
+
+                    case Kind.LIST:
+                        stack.append((list, value, []))
+
+                    case _:  # Kind.TUPLE
+                        stack.append((tuple, value, []))
+
+        except IndexError as error:
+            raise ValueError("serialized IR is truncated or corrupt") from error
+
+        if position != len(data):
+            raise ValueError("serialized IR has trailing data")
+        return value
+
+
+def load_file(path: Path, classes: Callable[[str], Iterable[type[Model]]]) -> Any:
+    # reads straight from a memory map of the file
+    with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return loads(mapped, classes)
@@ -0,0 +1,68 @@
+from collections.abc import Callable, Generator, Iterable
+from types import GeneratorType
+from typing import Any
+
+from .arena import Model
+
+# An explicit-stack engine for the passes over L0-L3. A handler never calls itself on a child: it is a generator that
+# `yield`s the child's step and is sent back the child's result. `run` keeps the suspended handlers on a list, so the
+# Python call stack stays flat however deeply the tree is nested. A step is either such a generator or a result that
+# needed no further traversal. Handlers are looked up by the node's tag in a `Dispatch` table.
+
+type Step[R] = Generator[Any, Any, R] | R
+
+
+def run[R](step: Step[R]) -> R:
+    if not isinstance(step, GeneratorType):
+        return step  # pyright: ignore[reportReturnType]
+
+    stack: list[Generator[Any, Any, Any]] = [step]
+    value: Any = None
+
+    while True:
+        try:
+            child = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            value = stop.value
+            continue
+
+        if isinstance(child, GeneratorType):
+            stack.append(child)  # pyright: ignore[reportUnknownArgumentType]
+            value = None
+        else:
+            value = child
+
+
+def sequence[R](steps: Iterable[Step[R]]) -> Generator[Any, Any, list[R]]:
+    # runs the steps one after another, in order; pass a generator expression so that each step is only created once
+    # the previous one has finished
+    results: list[R] = []
+    for step in steps:
+        results.append((yield step))
+    return results
+
+
+class Dispatch[R]:
+    def __init__(self) -> None:
+        self.handlers: dict[str, Callable[..., Step[R]]] = {}
+        # while set, every call goes through `around` instead, which may invoke the handler itself; see util.memo
+        self.around: Callable[..., Step[R]] | None = None
+
+    def register[F: Callable[..., Any]](self, *classes: type[Model]) -> Callable[[F], F]:
+        def decorator(handler: F) -> F:
+            for cls in classes:
+                self.handlers[cls.model_fields["tag"].default] = handler
+            return handler
+
+        return decorator
+
+    def __call__(self, node: Any, *arguments: Any) -> Step[R]:
+        if self.around is not None:
+            return self.around(node, *arguments)
+        return self.handlers[node.tag](node, *arguments)
+
+    def handle(self, node: Any, *arguments: Any) -> Step[R]:
+        return self.handlers[node.tag](node, *arguments)
@@ -0,0 +1,125 @@
+from collections.abc import Sequence
+from typing import Annotated, Literal
+
+import pytest
+from pydantic import BaseModel, Field
+from util.arena import Arena, Node
+
+
+type Tree = Annotated[Leaf | Branch | Cell, Field(discriminator="tag")]
+
+
+class Leaf(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    name: str
+    value: int
+
+
+class Branch(BaseModel, frozen=True):
+    tag: Literal["branch"] = "branch"
+    bindings: Sequence[tuple[str, Tree]]
+    children: Sequence[Tree]
+    body: Tree
+
+
+class Cell(BaseModel, frozen=True):
+    # fields named like the slots of a Node, as L2's Load and Store have an index
+    tag: Literal["cell"] = "cell"
+    arena: str
+    index: int
+
+
+def tree() -> Branch:
+    return Branch(
+        bindings=[("x", Leaf(name="x", value=1)), ("y", Leaf(name="x", value=-(1 << 70)))],
+        children=[Leaf(name="z", value=3)],
+        body=Branch(bindings=[], children=[], body=Leaf(name="x", value=1 << 62)),
+    )
+
+
+def test_arena_round_trip():
+    arena = Arena()
+
+    node = arena.add(tree())
+
+    assert node.to_model() == tree()
+    assert len(arena) == 6
+    assert len(arena.kinds) == len(arena.payloads)
+
+
+def test_arena_interns_names():
+    arena = Arena()
+
+    arena.add(tree())
+
+    assert sorted(arena.names) == sorted(["x", "y", "z", str(-(1 << 70))])
+
+
+def test_arena_view():
+    arena = Arena()
+
+    node = arena.add(tree())
+
+    assert node.tag == "branch"
+    assert node.type is Branch
+    assert isinstance(node.body, Node)
+    assert node.body.body.value == 1 << 62
+    assert node.bindings[1][0] == "y"
+    assert node.bindings[1][1].value == -(1 << 70)
+    assert node.children[0].to_model() == Leaf(name="z", value=3)
+    assert repr(node) == "Node(Branch, 0)"
+
+    with pytest.raises(AttributeError):
+        node.missing
+
+
+def test_arena_view_fields_named_like_slots():
+    arena = Arena()
+
+    node = arena.add(Branch(bindings=[], children=[Leaf(name="x", value=1)], body=Cell(arena="a", index=5)))
+
+    assert (node.body.arena, node.body.index) == ("a", 5)
+
+
+def test_arena_view_identity():
+    arena = Arena()
+
+    node = arena.add(tree())
+
+    assert node.body == node.body
+    assert hash(node.body) == hash(node.body)
+    assert node.body != node
+    assert node != Arena().add(tree())
+    assert node != 0
+
+
+def test_arena_many_roots():
+    arena = Arena()
+
+    first = arena.add(Leaf(name="a", value=0))
+    second = arena.add(tree())
+
+    assert first.to_model() == Leaf(name="a", value=0)
+    assert second.to_model() == tree()
+
+
+def test_arena_deep():
+    depth = 50_000
+    node = Leaf(name="x", value=0)
+    for _ in range(depth):
+        node = Branch.model_construct(bindings=[], children=[], body=node)
+
+    arena = Arena()
+    root = arena.add(node)
+
+    assert len(arena) == depth + 1
+    assert root.body.body.tag == "branch"
+    assert isinstance(root.to_model(), Branch)
+
+
+@pytest.mark.parametrize("value", [True, 1.5])
+def test_arena_unsupported(value: object):
+    arena = Arena()
+
+    with pytest.raises(TypeError):
+        arena.add(Leaf.model_construct(name="x", value=value))
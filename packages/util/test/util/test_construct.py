@@ -0,0 +1,65 @@
+from collections.abc import Iterator
+from typing import Annotated, Literal
+
+import pytest
+from pydantic import BaseModel, Field, ValidationError
+from util.construct import construct, enable_validation, replace, validation_enabled
+
+
+class Leaf(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    name: Annotated[str, Field(min_length=1)]
+
+
+class Pair(BaseModel, frozen=True):
+    tag: Literal["pair"] = "pair"
+    items: list[Leaf]
+    extra: tuple[str, int] | None = None
+
+
+@pytest.fixture
+def validation() -> Iterator[None]:
+    enabled = validation_enabled()
+    yield
+    enable_validation(enabled)
+
+
+def test_construct_trusted(validation: None):
+    enable_validation(False)
+
+    assert construct(Leaf, name="x") == Leaf(name="x")
+    assert construct(Leaf, name="").name == ""
+
+
+def test_construct_validated(validation: None):
+    enable_validation()
+
+    assert validation_enabled()
+    assert construct(Leaf, name="x") == Leaf(name="x")
+
+    with pytest.raises(ValidationError):
+        construct(Leaf, name="")
+
+
+def test_replace_unchanged():
+    leaf = Leaf(name="x")
+    pair = Pair(items=[leaf], extra=("a", 1))
+
+    assert replace(leaf, name="x") is leaf
+    assert replace(pair, items=[leaf], extra=("a", 1)) is pair
+
+
+def test_replace_changed():
+    leaf = Leaf(name="x")
+    other = Leaf(name="x")
+    pair = Pair(items=[leaf])
+
+    assert replace(leaf, name="y") == Leaf(name="y")
+
+    changed = replace(pair, items=[other])
+    assert changed is not pair
+    assert changed.items[0] is other
+
+    assert replace(pair, items=[leaf, leaf]) == Pair(items=[leaf, leaf])
+    assert replace(pair, extra=("a", 1)).extra == ("a", 1)
+    assert replace(Pair(items=[], extra=("a", 1)), extra=["a", 1]).extra == ["a", 1]
@@ -0,0 +1,115 @@
+from collections.abc import Sequence
+from typing import Annotated, Literal
+
+import pytest
+from pydantic import BaseModel, Field, ValidationError
+from util.interner import Interner
+
+type Tree = Annotated[Leaf | Branch, Field(discriminator="tag")]
+
+
+class Leaf(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    name: str
+
+
+class Branch(BaseModel, frozen=True):
+    tag: Literal["branch"] = "branch"
+    bindings: Sequence[tuple[str, Tree]]
+    children: Sequence[Tree]
+
+
+def tree() -> Branch:
+    return Branch(
+        bindings=[("x", Leaf(name="a")), ("y", Leaf(name="a"))],
+        children=[Branch(bindings=[], children=[Leaf(name="a")])],
+    )
+
+
+def test_interner_factory_shares_nodes():
+    interner = Interner()
+
+    first = interner(Leaf, name="a")
+    second = interner(Leaf, name="a")
+    other = interner(Leaf, name="b")
+
+    assert first is second
+    assert first is not other
+    assert first == Leaf(name="a")
+    assert len(interner) == 2
+
+
+def test_interner_factory_canonicalizes_children():
+    interner = Interner()
+
+    first = interner(Branch, bindings=[("x", Leaf(name="a"))], children=[])
+    second = interner(Branch, bindings=[("x", interner(Leaf, name="a"))], children=[])
+
+    assert first is second
+    assert first.bindings[0][1] is interner(Leaf, name="a")
+
+
+def test_interner_factory_validates():
+    interner = Interner()
+
+    with pytest.raises(ValidationError):
+        interner(Leaf)
+
+
+def test_interner_intern_tree():
+    interner = Interner()
+
+    node = interner.intern(tree())
+
+    assert node == tree()
+    assert interner.intern(tree()) is node
+    assert interner.intern(node) is node
+    assert node.bindings[0][1] is node.bindings[1][1]
+    assert node.bindings[0][1] is node.children[0].children[0]
+    assert node in interner
+    assert tree() not in interner
+
+
+def test_interner_intern_keeps_canonical_input():
+    interner = Interner()
+    leaf = Leaf(name="a")
+
+    assert interner.intern(leaf) is leaf
+    assert interner.intern(Branch(bindings=[], children=[leaf])).children[0] is leaf
+
+
+def test_interner_distinguishes_lists_and_tuples():
+    interner = Interner()
+
+    first = interner(Branch, bindings=[], children=[])
+    second = interner(Branch, bindings=(), children=[])
+
+    assert first is not second
+
+
+def test_interner_hash():
+    interner = Interner()
+
+    assert interner.hash(tree()) == interner.hash(tree())
+    assert interner.hash(Leaf(name="a")) != interner.hash(Leaf(name="b"))
+
+
+def test_interner_deep():
+    depth = 50_000
+    node: Tree = Leaf(name="x")
+    for _ in range(depth):
+        node = Branch.model_construct(bindings=[], children=[node])
+
+    interner = Interner()
+
+    assert interner.intern(node).children[0].children[0].tag == "branch"
+    assert len(interner) == depth + 1
+
+
+def test_interner_clear():
+    interner = Interner()
+    interner.intern(tree())
+
+    interner.clear()
+
+    assert len(interner) == 0
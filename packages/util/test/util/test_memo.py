@@ -0,0 +1,110 @@
+from collections.abc import Sequence
+from typing import Annotated, Literal
+
+import pytest
+from pydantic import BaseModel, Field
+from util.memo import Memo
+from util.sequential_name_generator import SequentialNameGenerator
+from util.traverse import Dispatch, Step, run, sequence
+
+type Tree = Annotated[Leaf | Branch, Field(discriminator="tag")]
+
+
+class Leaf(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    value: int
+
+
+class Branch(BaseModel, frozen=True):
+    tag: Literal["branch"] = "branch"
+    children: Sequence[Tree]
+
+
+# labels every node with a fresh name and scales the leaves
+label = Dispatch[str]()
+
+
+@label.register(Leaf)
+def _leaf(node: Leaf, scale: int, fresh: Memo) -> Step[str]:
+    return f"{fresh.fresh('l')}={node.value * scale}"
+
+
+@label.register(Branch)
+def _branch(node: Branch, scale: int, fresh: Memo) -> Step[str]:
+    children = yield sequence(label(child, scale, fresh) for child in node.children)
+    return f"{fresh.fresh('b')}({' '.join(children)})"
+
+
+def compile(memo: Memo, tree: Tree, scale: int = 1) -> str:
+    def around(node: Tree, scale: int, fresh: Memo) -> Step[str]:
+        return memo.step(node, scale, lambda: label.handle(node, scale, fresh))
+
+    with memo.installed(label, around):
+        return run(label(tree, scale, memo))
+
+
+def test_memo_reuses_unchanged_subtrees():
+    memo = Memo(SequentialNameGenerator())
+    left, right = Branch(children=[Leaf(value=1)]), Branch(children=[Leaf(value=2)])
+
+    assert compile(memo, Branch(children=[left, right])) == "b2(b0(l0=1) b1(l1=2))"
+    assert (memo.hits, memo.misses, len(memo)) == (0, 5, 5)
+
+    # the edited subtree and its ancestors are recomputed; the root keeps its name
+    assert compile(memo, Branch(children=[left, Leaf(value=3)])) == "b2(b0(l0=1) l2=3)"
+    assert (memo.hits, memo.misses) == (1, 2)
+
+    # results are matched by identity: equal but new objects are recomputed, with the same names
+    assert compile(memo, Branch(children=[left, Leaf(value=3)])) == "b2(b0(l0=1) l2=3)"
+    assert (memo.hits, memo.misses) == (1, 2)
+
+
+def test_memo_same_object_same_result():
+    memo = Memo(SequentialNameGenerator())
+    tree = Branch(children=[Leaf(value=1)])
+
+    assert compile(memo, tree) == compile(memo, tree)
+    assert (memo.hits, memo.misses) == (1, 0)
+
+
+def test_memo_context_key():
+    memo = Memo(SequentialNameGenerator())
+    tree = Branch(children=[Leaf(value=1)])
+
+    assert compile(memo, tree, 1) == "b0(l0=1)"
+    assert compile(memo, tree, 2) == "b0(l0=2)"
+    assert (memo.hits, memo.misses) == (0, 2)
+
+
+def test_memo_repeated_subtrees():
+    memo = Memo(SequentialNameGenerator())
+    leaf = Leaf(value=1)
+
+    # one result per position, so each occurrence gets its own names
+    assert compile(memo, Branch(children=[leaf, leaf])) == "b0(l0=1 l1=1)"
+    assert compile(memo, Branch(children=[leaf, leaf, leaf])) == "b0(l0=1 l1=1 l2=1)"
+    assert (memo.hits, memo.misses) == (2, 2)
+
+
+def test_memo_fresh_pool():
+    memo = Memo(SequentialNameGenerator())
+
+    with memo.installed(label, label.handle):
+        assert [memo.fresh("x"), memo.fresh("y")] == ["x0", "y0"]
+
+    with memo.installed(label, label.handle):
+        assert [memo.fresh("x"), memo.fresh("x"), memo.fresh("z")] == ["x0", "x1", "z0"]
+
+    memo.clear()
+
+    with memo.installed(label, label.handle):
+        assert memo.fresh("x") == "x2"
+
+
+def test_memo_uninstalled_on_error():
+    memo = Memo(SequentialNameGenerator())
+
+    with pytest.raises(KeyError), memo.installed(label, label.handle):
+        raise KeyError
+
+    assert label.around is None
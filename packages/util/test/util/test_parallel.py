@@ -0,0 +1,97 @@
+import threading
+from collections.abc import Iterator
+
+import pytest
+from util.parallel import chunks, parallel, parallel_enabled, serial, set_workers, workers
+from util.traverse import Step, run
+
+
+@pytest.fixture
+def pool() -> Iterator[None]:
+    with workers(4):
+        yield
+
+
+def square(value: int) -> Step[tuple[int, str]]:
+    yield from ()
+    return value * value, threading.current_thread().name
+
+
+def squares(values: list[int]) -> Step[list[tuple[int, str]]]:
+    return (yield parallel(square(value) for value in values))
+
+
+def test_parallel_disabled():
+    assert not parallel_enabled()
+    assert run(squares([1, 2, 3])) == [(1, "MainThread"), (4, "MainThread"), (9, "MainThread")]
+
+
+@pytest.mark.usefixtures("pool")
+def test_parallel_in_order():
+    results = run(squares(list(range(100))))
+
+    assert [value for value, _ in results] == [value * value for value in range(100)]
+    assert all(thread.startswith("parallel") for _, thread in results)
+
+
+@pytest.mark.usefixtures("pool")
+def test_parallel_nested_runs_serially():
+    def outer(values: list[int]) -> Step[tuple[bool, list[tuple[int, str]]]]:
+        return parallel_enabled(), (yield squares(values))
+
+    def regions() -> Step[list[tuple[bool, list[tuple[int, str]]]]]:
+        return (yield parallel(outer([value, value + 1]) for value in range(4)))
+
+    assert parallel_enabled()
+    for enabled, results in run(regions()):
+        # each inner region stays on the worker that reached it
+        assert not enabled
+        assert len({thread for _, thread in results}) == 1
+
+
+@pytest.mark.usefixtures("pool")
+def test_parallel_serial():
+    with serial():
+        assert not parallel_enabled()
+        assert {thread for _, thread in run(squares([1, 2, 3]))} == {"MainThread"}
+
+    assert parallel_enabled()
+
+
+@pytest.mark.usefixtures("pool")
+def test_parallel_error():
+    def fail(value: int) -> Step[int]:
+        yield from ()
+        if value == 3:
+            raise ValueError(value)
+        return value
+
+    def region() -> Step[list[int]]:
+        return (yield parallel(fail(value) for value in range(5)))
+
+    with pytest.raises(ValueError, match="3"):
+        run(region())
+
+
+@pytest.mark.usefixtures("pool")
+def test_set_workers_unchanged():
+    set_workers(4)
+
+    assert parallel_enabled()
+
+
+def test_chunks_disabled():
+    assert chunks([1, 2, 3]) == [[1, 2, 3]]
+
+
+@pytest.mark.usefixtures("pool")
+@pytest.mark.parametrize(
+    ("items", "expected"),
+    [
+        ([], []),
+        ([1, 2], [[1], [2]]),
+        (list(range(10)), [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]),
+    ],
+)
+def test_chunks(items: list[int], expected: list[list[int]]):
+    assert chunks(items) == expected
@@ -0,0 +1,43 @@
+import pytest
+from util.scope import Scope
+
+
+def test_scope_initial():
+    scope = Scope({"x": 1})
+
+    assert scope["x"] == 1
+    assert "y" not in scope
+    assert dict(scope) == {"x": 1}
+    assert len(Scope[str, int]()) == 0
+
+
+def test_scope_bind():
+    scope = Scope({"x": 1})
+
+    with scope.bind([("x", 2), ("y", 3)]):
+        assert dict(scope) == {"x": 2, "y": 3}
+
+        with scope.bind([("y", 4)]):
+            assert dict(scope) == {"x": 2, "y": 4}
+
+        assert dict(scope) == {"x": 2, "y": 3}
+
+    assert dict(scope) == {"x": 1}
+
+
+def test_scope_bind_repeated():
+    scope = Scope[str, int]()
+
+    with scope.bind([("x", 1), ("x", 2)]):
+        assert scope["x"] == 2
+
+    assert "x" not in scope
+
+
+def test_scope_bind_restores_on_error():
+    scope = Scope({"x": 1})
+
+    with pytest.raises(RuntimeError), scope.bind([("x", 2)]):
+        raise RuntimeError
+
+    assert dict(scope) == {"x": 1}
@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from util.sequential_name_generator import SequentialNameGenerator
+
+
+def test_sequential_name_generator():
+    fresh = SequentialNameGenerator()
+
+    assert [fresh("x"), fresh("y"), fresh("x")] == ["x0", "y0", "x1"]
+
+
+def test_sequential_name_generator_threads():
+    fresh = SequentialNameGenerator()
+
+    with ThreadPoolExecutor(8) as pool:
+        names = list(pool.map(lambda _: fresh("t"), range(10_000)))
+
+    assert sorted(names) == sorted(f"t{index}" for index in range(10_000))
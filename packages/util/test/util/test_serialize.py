@@ -0,0 +1,104 @@
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Annotated, Any, Literal
+
+import pytest
+from pydantic import BaseModel, Field
+from util import serialize
+from util.serialize import MAGIC, dumps, load_file, loads
+
+type Tree = Annotated[Leaf | Branch, Field(discriminator="tag")]
+
+
+class Leaf(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    name: str
+    value: int
+
+
+class Branch(BaseModel, frozen=True):
+    tag: Literal["branch"] = "branch"
+    bindings: Sequence[tuple[str, Tree]]
+    children: Sequence[Tree]
+    body: Tree
+
+
+class Other(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    name: str
+
+
+def classes(tag: str) -> list[type[BaseModel]]:
+    return [Leaf, Branch]
+
+
+def tree() -> Branch:
+    return Branch(
+        bindings=[("x", Leaf(name="x", value=1)), ("y", Leaf(name="x", value=-(1 << 70)))],
+        children=[Leaf(name="z", value=3)],
+        body=Branch(bindings=[], children=[], body=Leaf(name="x", value=1 << 62)),
+    )
+
+
+def test_serialize_round_trip():
+    assert loads(dumps(tree()), classes) == tree()
+
+
+def test_serialize_interns_strings():
+    data = dumps(Branch(bindings=[], children=[Leaf(name="identifier", value=0)] * 3, body=tree()))
+
+    assert data.count(b"identifier") == 1
+
+
+def test_serialize_deep():
+    node: Any = Leaf(name="x", value=0)
+    for _ in range(100_000):
+        node = Branch(bindings=[], children=[], body=node)
+
+    # pydantic compares trees recursively
+    data = dumps(node)
+    assert dumps(loads(data, classes)) == data
+
+
+def test_serialize_load_file(tmp_path: Path):
+    path = tmp_path / "tree.ir"
+    path.write_bytes(dumps(tree()))
+
+    assert load_file(path, classes) == tree()
+
+
+@pytest.mark.parametrize(
+    ("value", "message"),
+    [(True, "unsupported field value: True"), (1.5, "unsupported field value: 1.5")],
+)
+def test_serialize_unsupported(value: Any, message: str):
+    with pytest.raises(TypeError, match=message):
+        dumps(Leaf.model_construct(name="x", value=value))
+
+
+def test_serialize_too_many_classes(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(serialize, "_MAX_CLASSES", 1)
+
+    with pytest.raises(TypeError, match="more than 1 node classes"):
+        dumps(tree())
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        (b"{}", "not a serialized IR"),
+        (MAGIC + b"\0", "has no nodes"),
+        (dumps(tree())[:-1], "truncated"),
+        (MAGIC + b"\2\6br", "truncated"),
+        (dumps(tree()) + b"\0", "trailing data"),
+    ],
+)
+def test_serialize_malformed(data: bytes, message: str):
+    with pytest.raises(ValueError, match=message):
+        loads(data, classes)
+
+
+@pytest.mark.parametrize("known", [[Branch], [Branch, Other]])
+def test_serialize_unknown_node(known: list[type[BaseModel]]):
+    with pytest.raises(ValueError, match="unknown node: 'leaf'"):
+        loads(dumps(tree()), lambda tag: known)
@@ -0,0 +1,73 @@
+from collections.abc import Sequence
+from typing import Annotated, Literal
+
+import pytest
+from pydantic import BaseModel, Field
+from util.traverse import Dispatch, Step, run, sequence
+
+type Tree = Annotated[Leaf | Branch, Field(discriminator="tag")]
+
+
+class Leaf(BaseModel, frozen=True):
+    tag: Literal["leaf"] = "leaf"
+    value: int
+
+
+class Branch(BaseModel, frozen=True):
+    tag: Literal["branch"] = "branch"
+    children: Sequence[Tree]
+
+
+class Other(BaseModel, frozen=True):
+    tag: Literal["other"] = "other"
+
+
+total = Dispatch[int]()
+
+
+@total.register(Leaf)
+def _leaf(node: Leaf, scale: int) -> Step[int]:
+    return node.value * scale
+
+
+@total.register(Branch)
+def _branch(node: Branch, scale: int) -> Step[int]:
+    values = yield sequence(total(child, scale) for child in node.children)
+    return sum(values)
+
+
+def test_run_value():
+    assert run(3) == 3
+    assert run(total(Leaf(value=2), 3)) == 6
+
+
+def test_run_tree():
+    tree = Branch(children=[Leaf(value=1), Branch(children=[Leaf(value=2), Leaf(value=3)]), Branch(children=[])])
+
+    assert run(total(tree, 2)) == 12
+
+
+def test_run_deep():
+    tree: Tree = Leaf(value=1)
+    for _ in range(100_000):
+        tree = Branch.model_construct(children=[tree, Leaf(value=1)])
+
+    assert run(total(tree, 1)) == 100_001
+
+
+def test_run_propagates_errors():
+    with pytest.raises(KeyError):
+        run(total(Branch.model_construct(children=[Leaf(value=1), Other()]), 1))
+
+
+def test_sequence_is_lazy():
+    order: list[int] = []
+
+    def step(value: int) -> Step[int]:
+        order.append(value)
+        yield None
+        order.append(-value)
+        return value
+
+    assert run(sequence(step(value) for value in [1, 2])) == [1, 2]
+    assert order == [1, -1, 2, -2]